@@ -37,9 +37,11 @@ from whoosh.qparser import MultifieldParser, OrGroup
 
 from midiplayer.core.player.type import SONG_CHANGE_ACTIONS
 from midiplayer.core.utils.config import cfg
+from midiplayer.core.utils.resource_governor import governor
 from midiplayer.core.utils.utils import Utils
 
 MAX_INDEX_FILES = 200_000  # 最大索引文件数
+INDEX_PAUSE_CHECK_EVERY = 256  # 每写入这么多文件检查一次是否因播放而暂停
 MAX_CACHE_SIZE = 1000  # 最大缓存数量，LRU淘汰策略
 
 
@@ -157,7 +159,12 @@ class IndexBuilderTask(QRunnable):
                 os.makedirs(self.index_dir)
 
             ix = create_in(self.index_dir, SCHEMA)
-            writer = ix.writer(limitmb=256, procs=max(1, os.cpu_count() // 2))
+            # 播放期间开始的构建使用单进程、小内存，不与播放抢 CPU
+            writer = ix.writer(
+                **governor.index_writer_args(
+                    limitmb=256, procs=max(1, os.cpu_count() // 2)
+                )
+            )
 
             paths = list(self.dir_path.rglob("*.mid"))
             paths.extend(list(self.dir_path.rglob("*.midi")))
@@ -168,6 +175,8 @@ class IndexBuilderTask(QRunnable):
                 if total_count >= MAX_INDEX_FILES:
                     is_limit_reached = True
                     break
+                if total_count % INDEX_PAUSE_CHECK_EVERY == 0:
+                    self._wait_playback()
                 # 去除文件后缀名的影响
                 pure_name = path.stem
                 try:
@@ -189,6 +198,8 @@ class IndexBuilderTask(QRunnable):
                 logger.warning(msg)
                 self.signals.warning_message.emit(msg)
 
+            # 提交（合并段、写盘）是最重的一步，同样等到播放停止
+            self._wait_playback()
             logger.debug(f"Whoosh: 正在提交 {total_count} 个文件...")
             writer.commit()
             logger.debug("Whoosh: 索引构建完毕。")
@@ -215,6 +226,13 @@ class IndexBuilderTask(QRunnable):
             logger.opt(exception=e).error(f"创建 Whoosh 索引失败: {e}")
             self.signals.index_ready.emit(False)
 
+    def _wait_playback(self):
+        """播放优先模式下暂停构建，直到播放暂停或停止"""
+        if governor.active:
+            logger.debug("Whoosh: 正在播放，暂停索引构建")
+            governor.wait_released()
+            logger.debug("Whoosh: 播放已停止，继续索引构建")
+
 
 # --- 搜索器 ---
 class SearchTask(QRunnable):
@@ -284,8 +302,10 @@ class SingleLoaderTask(QRunnable):
     @Slot()
     def run(self):
         try:
-            mid = mido.MidiFile(self.path)
-            duration = mid.length
+            # 播放期间以最低优先级解析，不抢占播放线程
+            with governor.background_priority():
+                mid = mido.MidiFile(self.path)
+                duration = mid.length
             # 发出信号: (路径, 状态, 数据)
             self.signals.single_load_complete.emit(self.path_str, "ok", duration)
         except Exception as e:
@@ -298,6 +318,8 @@ class SingleLoaderTask(QRunnable):
 class MidiCards(QWidget):
 
     signal_card_clicked = Signal(Path)
+    # 当前列表变化: (路径列表, 是否为完整列表)
+    signal_playlist_changed = Signal(list, bool)
     ITEMS_PER_PAGE = 50
     INDEX_DIR = Path(Utils.user_path("midi_index_whoosh"))
 
@@ -569,6 +591,10 @@ class MidiCards(QWidget):
         self.next_button.setEnabled(self.current_page < self.total_pages - 1)
 
         self.clear_layout(self.card_layout)
+        # 只有一页时列表完整，可以循环；否则页尾的下一首由翻页逻辑处理
+        self.signal_playlist_changed.emit(
+            [str(p) for p in filtered_paths], self.total_pages <= 1
+        )
 
         # --- 立即渲染，异步加载 ---
 
@@ -666,6 +692,19 @@ class MidiCards(QWidget):
         if clicked_card and self.selected_path_str == clicked_card.path_str:
             return
 
+        self._update_selected(clicked_card, path_str)
+        self.signal_card_clicked.emit(Path(self.selected_path_str))
+
+    def select_path(self, path: Path):
+        """仅同步选中状态（例如播放器已无缝切到下一首），不触发播放"""
+        if self.selected_path_str == str(path):
+            return
+        self._update_selected(None, str(path))
+        card = self.find_visible_card(self.selected_path_str)
+        if card:
+            self.scroll_area.ensureWidgetVisible(card)
+
+    def _update_selected(self, clicked_card: MidiCard | None, path_str: str):
         if self.selected_path_str:
             old_card = self.find_visible_card(self.selected_path_str)
             if old_card:
@@ -680,8 +719,6 @@ class MidiCards(QWidget):
             if new_card:
                 new_card.set_selected(True)
 
-        self.signal_card_clicked.emit(Path(self.selected_path_str))
-
     def find_visible_card(self, path_str: str) -> MidiCard | None:
         """在当前显示的卡片中查找匹配的卡片"""
         for i in range(self.card_layout.count()):
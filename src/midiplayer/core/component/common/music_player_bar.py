@@ -1,9 +1,10 @@
 import threading
+from pathlib import Path
 
-import pydirectinput
+from loguru import logger
 from pynput import keyboard
 from PySide6 import QtGui
-from PySide6.QtCore import Qt, Signal
+from PySide6.QtCore import Qt, QTimer, Signal
 from PySide6.QtWidgets import QFrame, QHBoxLayout, QLayout, QSizePolicy, QVBoxLayout
 
 # 导入 Fluent Widgets
@@ -21,6 +22,8 @@ from qfluentwidgets import (
 from midiplayer.core.component.common.track_select_view import TrackContentView
 from midiplayer.core.component.settings.cmd_binding_setting import CmdKeys
 from midiplayer.core.player.midi_player import QMidiPlayer
+from midiplayer.core.player.playback_program import OutputChannelParam
+from midiplayer.core.player.playlist import PlaylistQueue
 from midiplayer.core.player.type import SONG_CHANGE_ACTIONS, MdPlaybackParam
 from midiplayer.core.utils.config import cfg
 from midiplayer.core.utils.db_manager import DBManager
@@ -30,6 +33,8 @@ from midiplayer.core.utils.utils import Utils
 class MusicPlayerBar(QFrame):
     signal_change_song_action = Signal(SONG_CHANGE_ACTIONS)
     signal_cmd_key_pressed = Signal(object)
+    # 无缝切换到下一首后通知外部同步选中状态
+    signal_song_advanced = Signal(Path)
 
     """
     仿音乐播放器条
@@ -45,11 +50,14 @@ class MusicPlayerBar(QFrame):
         self.user_action_stop = None
         self._on_play_mode_change(cfg.get(cfg.player_play_single_loop))
         self.current_song: None | dict = None
-        pydirectinput.PAUSE = cfg.get(cfg.player_play_press_delay) / 1000
+        # 播放队列，以及已提交预加载的歌曲 {路径: 歌曲信息}
+        self.playlist = PlaylistQueue()
+        self.upcoming_songs: dict[str, dict] = {}
 
         # --- 2. 初始化midi播放器 ---
         self.player = QMidiPlayer()
         self.player.start_player()
+        self._apply_output_channels(cfg.get(cfg.player_output_channels))
 
         # --- 3. 初始化UI控件 ---
         self.init_ui()
@@ -142,12 +150,33 @@ class MusicPlayerBar(QFrame):
 
         self.seek_slider = Slider(Qt.Orientation.Horizontal)
         self.time_label = BodyLabel("00:00 / 00:00")
+        # 音乐位置 小节:拍
+        self.bar_beat_label = BodyLabel("1:1")
+        self.bar_beat_label.setToolTip("小节:拍")
 
         self.slow_down_button = PushButton("-0.25")
         self.speed_up_button = PushButton("+0.25")
         self.rate_label = BodyLabel("x1.0")
         self.rate_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
 
+        # --- 按键延迟统计（可选） ---
+        self.jitter_label = BodyLabel("")
+        self.jitter_label.setToolTip(
+            "按键实际执行相对计划时间的延迟 p50/p99/最大值，队列峰值与丢弃数"
+        )
+        self.jitter_dump_button = TransparentToolButton(FluentIcon.SAVE)
+        self.jitter_dump_button.setToolTip("导出当前歌曲的时序报告")
+        self.jitter_dump_button.clicked.connect(self._dump_jitter_report)
+        self.jitter_timer = QTimer(self)
+        self.jitter_timer.setInterval(500)
+        self.jitter_timer.timeout.connect(self._update_jitter_label)
+        # 播放时按屏幕刷新率读取无锁位置快照刷新进度条
+        self.position_timer = QTimer(self)
+        self.position_timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self.position_timer.setInterval(Utils.frame_interval_ms())
+        self.position_timer.timeout.connect(self._refresh_position)
+        self._time_label_text = None
+
         # --- 音轨选择按钮 ---
         self.track_select_button = TransparentToolButton(FluentIcon.ALBUM)
         self.track_select_button.setToolTip("选择音轨")
@@ -173,6 +202,9 @@ class MusicPlayerBar(QFrame):
         seek_layout = QHBoxLayout()
         seek_layout.addWidget(self.seek_slider, 10)
         seek_layout.addWidget(self.time_label)
+        seek_layout.addWidget(self.bar_beat_label)
+        seek_layout.addWidget(self.jitter_label)
+        seek_layout.addWidget(self.jitter_dump_button)
         main_layout.addLayout(seek_layout, 8)
 
         speed_layout = QHBoxLayout()
@@ -185,6 +217,7 @@ class MusicPlayerBar(QFrame):
         main_layout.addLayout(speed_layout, 2)
 
         self.correct_info_label.setObjectName("CorrectInfoLabel")
+        self._on_jitter_overlay_change(cfg.get(cfg.player_show_jitter_overlay))
 
     def connect_signals(self):
         # --- 按钮点击 ---
@@ -201,6 +234,9 @@ class MusicPlayerBar(QFrame):
         self.player.signal_play_duration.connect(self.update_duration)
         self.player.signal_play_position.connect(self.update_slider_position)
         self.player.signal_correct_info_changed.connect(self._on_correct_info_change)
+        self.player.signal_prepare_progress.connect(self._on_prepare_progress)
+        self.player.signal_prepare_failed.connect(self._on_prepare_failed)
+        self.player.signal_song_advanced.connect(self._on_song_advanced)
 
         # --- 连接歌曲结束信号 ---
         self.player.signal_media_done.connect(self.on_media_status_changed)
@@ -215,6 +251,12 @@ class MusicPlayerBar(QFrame):
 
         # -- 变换播放模式信号 --
         cfg.player_play_single_loop.valueChanged.connect(self._on_play_mode_change)
+        cfg.player_play_single_loop.valueChanged.connect(self._schedule_prefetch)
+        cfg.player_prefetch_count.valueChanged.connect(self._schedule_prefetch)
+        cfg.player_show_jitter_overlay.valueChanged.connect(
+            self._on_jitter_overlay_change
+        )
+        cfg.player_output_channels.valueChanged.connect(self._apply_output_channels)
 
     # --- 核心逻辑：显示弹窗 ---
     def show_track_selection_flyout(self):
@@ -315,22 +357,88 @@ class MusicPlayerBar(QFrame):
             )
             self.song_info_label.setText(self.current_song["name"])
             Utils.right_elide_label(self.song_info_label)
+            self._schedule_prefetch()
 
     def resizeEvent(self, event: QtGui.QResizeEvent) -> None:
         super().resizeEvent(event)
         Utils.elide_label_handle_resize(self.correct_info_label)
         Utils.elide_label_handle_resize(self.song_info_label)
 
-    def _on_correct_info_change(self, correct_info_label, octave_change):
+    def _on_correct_info_change(self, correct_info_label, octave_change, thinned):
         text = (
             f"提高{abs(octave_change)}个调"
             if octave_change > 0
             else f"降低{abs(octave_change)}个调" if octave_change < 0 else ""
         )
+        if thinned:
+            text += f" 精简{thinned}个音符"
         correct_info = f"命中率:{correct_info_label*100 : .2f}% {text}"
         self.correct_info_label.setText(correct_info)
         Utils.right_elide_label(self.correct_info_label)
 
+    def _on_prepare_progress(self, progress):
+        # 重新拟合时保留命中率信息，只在加载新歌时显示进度
+        if (
+            progress < 100
+            and self.player.get_playback_state() == QMidiPlayer.PlayState.IDLE
+        ):
+            self.correct_info_label.setText(f"正在加载 {progress}%")
+            Utils.right_elide_label(self.correct_info_label)
+
+    def _on_prepare_failed(self, message):
+        self.correct_info_label.setText("加载失败")
+        Utils.right_elide_label(self.correct_info_label)
+        Utils.show_error_infobar(self=self, title="加载失败", content=message)
+
+    # --- 按键延迟统计 ---
+    def _on_jitter_overlay_change(self, show):
+        self.jitter_label.setVisible(show)
+        self.jitter_dump_button.setVisible(show)
+        if show:
+            self._update_jitter_label()
+            self.jitter_timer.start()
+        else:
+            self.jitter_timer.stop()
+
+    def _apply_output_channels(self, configs: list):
+        """按配置加载各附加通道的预设，交给播放器；预设缺失的通道跳过"""
+        params = []
+        for i, channel in enumerate(configs or []):
+            preset = channel.get("preset")
+            mappings = self.db.load_preset(preset) if self.db and preset else None
+            if mappings is None:
+                logger.warning(f"附加输出通道 {i} 的预设无法加载: {preset}")
+                continue
+            tracks = channel.get("tracks")
+            params.append(
+                OutputChannelParam(
+                    channel.get("name") or f"channel-{i + 1}",
+                    mappings,
+                    tuple(tracks) if tracks is not None else None,
+                    channel.get("backend") or cfg.get(cfg.player_output_backend),
+                )
+            )
+        self.player.set_output_channels(params)
+
+    def _update_jitter_label(self):
+        stats = self.player.get_jitter_stats()
+        self.jitter_label.setText(
+            f"延迟 {stats['p50_us'] / 1000:.1f}/{stats['p99_us'] / 1000:.1f}/"
+            f"{stats['max_us'] / 1000:.1f}ms 队列 {stats['queue_high_water']} "
+            f"丢弃 {stats['dropped']}"
+        )
+
+    def _dump_jitter_report(self):
+        try:
+            path = self.player.dump_jitter_report()
+        except OSError as e:
+            Utils.show_error_infobar(self=self, title="导出失败", content=str(e))
+            return
+        if path is None:
+            Utils.show_info_infobar(self=self, title="提示", content="请先选择歌曲")
+            return
+        Utils.show_success_infobar(self=self, title="已导出", content=str(path))
+
     def _on_play_mode_change(self, loop):
         if loop:
             self.loop_mode = "SongLoop"
@@ -357,6 +465,57 @@ class MusicPlayerBar(QFrame):
         )
         self.song_info_label.setText(name)
         Utils.right_elide_label(self.song_info_label)
+        self._schedule_prefetch()
+
+    # --- 无缝播放 ---
+    def set_playlist(self, paths: list, complete: bool):
+        """更新播放队列（当前列表中的歌曲路径），complete 表示列表是否完整"""
+        self.playlist.set_paths(paths, complete)
+        self._schedule_prefetch()
+
+    def _schedule_prefetch(self, *_):
+        """根据播放模式计算接下来的歌曲，交给播放器后台预加载"""
+        paths = []
+        if self.current_song:
+            paths = self.playlist.upcoming(
+                self.current_song["path"],
+                cfg.get(cfg.player_prefetch_count),
+                self.loop_mode == "SongLoop",
+            )
+
+        self.upcoming_songs = {}
+        for path in paths:
+            self.upcoming_songs[path] = (
+                self.current_song
+                if path == self.current_song["path"]
+                else {
+                    "name": Path(path).name,
+                    "path": path,
+                    "note_to_key_cfg": self.current_song["note_to_key_cfg"],
+                    "tracks": self._get_tracks_by_path(path),
+                }
+            )
+        self.player.set_upcoming(
+            [
+                MdPlaybackParam(
+                    midiPath=song["path"],
+                    noteToKeyMapping=song["note_to_key_cfg"],
+                    active_tracks=song["tracks"],
+                )
+                for song in self.upcoming_songs.values()
+            ]
+        )
+
+    def _on_song_advanced(self, path: str):
+        """播放器已在上一首结束时刻切换到下一首，同步界面状态"""
+        song = self.upcoming_songs.get(path)
+        if song is None:
+            return
+        self.current_song = song
+        self.song_info_label.setText(song["name"])
+        Utils.right_elide_label(self.song_info_label)
+        self.signal_song_advanced.emit(Path(path))
+        self._schedule_prefetch()
 
     def next_song(self):
         self.signal_change_song_action.emit(SONG_CHANGE_ACTIONS.NEXT_SONG)  # 列表循环
@@ -433,8 +592,14 @@ class MusicPlayerBar(QFrame):
     def update_play_button_icon(self, state):
         if state == QMidiPlayer.PlayState.PLAYING:
             self.play_pause_button.setIcon(self.pause_icon)
+            self.position_timer.start()
         else:
             self.play_pause_button.setIcon(self.play_icon)
+            self.position_timer.stop()
+        self._refresh_position()
+
+    def _refresh_position(self):
+        self.update_slider_position(self.player.get_position_ms())
 
     def update_duration(self, duration):
         self.seek_slider.setRange(0, duration)
@@ -446,6 +611,11 @@ class MusicPlayerBar(QFrame):
             self.seek_slider.setValue(position)
         self.update_time_label(position, self.seek_slider.maximum())
 
+    def seek_to(self, position):
+        """从其他控件（如钢琴卷帘）跳转到指定毫秒"""
+        self.player.seek(position)
+        self.update_slider_position(position)
+
     def slider_released(self):
         self.player.seek(self.seek_slider.value())
 
@@ -463,9 +633,14 @@ class MusicPlayerBar(QFrame):
         return f"{minutes:02}:{seconds:02}"
 
     def update_time_label(self, position, duration):
-        self.time_label.setText(
-            f"{self.format_time(position)} / {self.format_time(duration)}"
-        )
+        bar, beat = self.player.get_bar_beat(position)
+        text = f"{self.format_time(position)} / {self.format_time(duration)}"
+        # 每帧都会调用，文本不变时不重新设置，避免无谓的重排
+        if (text, bar, beat) == self._time_label_text:
+            return
+        self._time_label_text = (text, bar, beat)
+        self.time_label.setText(text)
+        self.bar_beat_label.setText(f"{bar}:{beat}")
 
     def speed_up(self):
         self.current_playback_rate = min(self.current_playback_rate + 0.25, 2.0)
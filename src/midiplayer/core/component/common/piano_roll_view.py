@@ -0,0 +1,199 @@
+import math
+
+from PySide6.QtCore import QRectF, Qt, QTimer, Signal
+from PySide6.QtGui import QColor, QPainter
+from PySide6.QtWidgets import QSizePolicy, QWidget
+from qfluentwidgets import isDarkTheme, themeColor
+
+from midiplayer.core.player.midi_player import QMidiPlayer
+from midiplayer.core.player.note_roll import NOTE_DROPPED, NOTE_FOLDED, NOTE_MAPPED
+from midiplayer.core.utils.utils import Utils
+
+# 播放头在视口中的水平位置（比例）
+PLAYHEAD_RATIO = 0.2
+# 视口时长（微秒）的默认值与缩放范围，每格滚轮缩放的倍数
+DEFAULT_SPAN_US = 8_000_000
+MIN_SPAN_US = 1_000_000
+ZOOM_STEP = 1.25
+# 一屏超过这么多音符时改为栅格化绘制
+MAX_NOTE_RECTS = 4000
+# 栅格化时每列的宽度（像素）
+RASTER_COLUMN_PX = 2
+# 最少显示的音高行数
+MIN_PITCH_ROWS = 24
+BLACK_KEYS = {1, 3, 6, 8, 10}
+
+
+class PianoRollView(QWidget):
+    """
+    钢琴卷帘：跟随播放位置滚动显示音符，颜色区分按原键演奏 / 移调折叠 / 未演奏。
+    数据来自播放程序中预先生成的音符区间表，每帧只裁剪、绘制视口内的音符。
+    """
+
+    # 点击卷帘跳转（毫秒）
+    signal_seek = Signal(int)
+
+    def __init__(self, player: QMidiPlayer, parent=None):
+        super().__init__(parent)
+        self.player = player
+        self.span_us = DEFAULT_SPAN_US
+        # 上一次绘制的 (卷帘, 位置, 视口时长, 尺寸)，没有变化时跳过重绘
+        self._drawn_key = None
+        # 栅格化结果缓存：(缓存键, 各状态的矩形)
+        self._raster_cache = (None, None)
+
+        self.setMinimumHeight(120)
+        self.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Preferred)
+        self.setToolTip(
+            "点击跳转，滚轮缩放\n主题色：按原键演奏  橙色：移调 / 折叠  灰色：未演奏"
+        )
+
+        self.frame_timer = QTimer(self)
+        self.frame_timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self.frame_timer.setInterval(Utils.frame_interval_ms())
+        self.frame_timer.timeout.connect(self._on_frame)
+
+    # --- 帧刷新 ---
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.frame_timer.start()
+
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        self.frame_timer.stop()
+
+    def _on_frame(self):
+        key = (
+            self.player.get_note_roll(),
+            self.player.get_position_ms(),
+            self.span_us,
+            self.width(),
+            self.height(),
+        )
+        if key != self._drawn_key:
+            self.update()
+
+    # --- 交互 ---
+    def wheelEvent(self, event):
+        max_span = max(MIN_SPAN_US, self.player.position.duration_us)
+        steps = event.angleDelta().y() / 120
+        span = self.span_us / (ZOOM_STEP**steps)
+        self.span_us = int(min(max(span, MIN_SPAN_US), max_span))
+        self.update()
+        event.accept()
+
+    def mousePressEvent(self, event):
+        if event.button() != Qt.MouseButton.LeftButton or self.width() <= 0:
+            return super().mousePressEvent(event)
+        t0_us = self.player.get_position_ms() * 1000 - self.span_us * PLAYHEAD_RATIO
+        time_us = t0_us + event.position().x() / self.width() * self.span_us
+        self.signal_seek.emit(max(0, int(time_us // 1000)))
+        event.accept()
+
+    # --- 绘制 ---
+    def paintEvent(self, event):
+        roll = self.player.get_note_roll()
+        position_ms = self.player.get_position_ms()
+        width, height = self.width(), self.height()
+        self._drawn_key = (roll, position_ms, self.span_us, width, height)
+        if width <= 0 or height <= 0:
+            return
+
+        painter = QPainter(self)
+        dark = isDarkTheme()
+        low, high = self._pitch_range(roll)
+        row_h = height / (high - low + 1)
+
+        # 黑键行加深
+        painter.setPen(Qt.PenStyle.NoPen)
+        painter.setBrush(QColor(255, 255, 255, 12) if dark else QColor(0, 0, 0, 10))
+        painter.drawRects(
+            [
+                QRectF(0, (high - pitch) * row_h, width, row_h)
+                for pitch in range(low, high + 1)
+                if pitch % 12 in BLACK_KEYS
+            ]
+        )
+
+        t0_us = position_ms * 1000 - self.span_us * PLAYHEAD_RATIO
+        if roll is not None and len(roll):
+            colors = {
+                NOTE_MAPPED: themeColor(),
+                NOTE_FOLDED: QColor(255, 160, 0),
+                NOTE_DROPPED: QColor(128, 128, 128, 110),
+            }
+            idx = roll.visible(int(t0_us), int(t0_us + self.span_us))
+            if idx.size > MAX_NOTE_RECTS:
+                self._paint_raster(painter, roll, idx, t0_us, high, row_h, colors)
+            else:
+                self._paint_notes(painter, roll, idx, t0_us, high, row_h, colors)
+
+        # 播放头
+        painter.fillRect(
+            QRectF(width * PLAYHEAD_RATIO, 0, 1.5, height),
+            QColor(255, 255, 255, 180) if dark else QColor(0, 0, 0, 150),
+        )
+        painter.end()
+
+    def _pitch_range(self, roll) -> tuple[int, int]:
+        low, high = (roll.min_pitch, roll.max_pitch) if roll else (60, 72)
+        missing = MIN_PITCH_ROWS - (high - low + 1)
+        if missing > 0:
+            low -= missing // 2
+            high += missing - missing // 2
+        return low, high
+
+    def _paint_notes(self, painter, roll, idx, t0_us, high, row_h, colors):
+        px_per_us = self.width() / self.span_us
+        xs = ((roll.starts[idx] - t0_us) * px_per_us).tolist()
+        ws = ((roll.ends[idx] - roll.starts[idx]) * px_per_us).tolist()
+        ys = ((high - roll.pitches[idx].astype(int)) * row_h).tolist()
+        note_h = max(row_h - 1, 1)
+        rects = {status: [] for status in colors}
+        for x, w, y, status in zip(xs, ws, ys, roll.status[idx].tolist()):
+            rects[status].append(QRectF(x, y, max(w, 1), note_h))
+        self._draw_rects(painter, rects, colors)
+
+    def _paint_raster(self, painter, roll, idx, t0_us, high, row_h, colors):
+        """
+        一屏音符过多时按像素列栅格化。列起点对齐到整列，平移不足一列时直接平移
+        上一帧的矩形，不重新计算
+        """
+        cols = math.ceil(self.width() / RASTER_COLUMN_PX) + 1
+        col_us = self.span_us * RASTER_COLUMN_PX / self.width()
+        aligned_t0 = math.floor(t0_us / col_us) * col_us
+        cache_key = (roll, aligned_t0, col_us, cols, row_h)
+        if self._raster_cache[0] != cache_key:
+            status, pitches, run_starts, run_ends = roll.raster(
+                idx, int(aligned_t0), col_us, cols
+            )
+            note_h = max(row_h - 1, 1)
+            rects = {s: [] for s in colors}
+            for s, p, c0, c1 in zip(
+                status.tolist(),
+                pitches.tolist(),
+                run_starts.tolist(),
+                run_ends.tolist(),
+            ):
+                rects[s].append(
+                    QRectF(
+                        c0 * RASTER_COLUMN_PX,
+                        (high - p) * row_h,
+                        (c1 - c0) * RASTER_COLUMN_PX,
+                        note_h,
+                    )
+                )
+            self._raster_cache = (cache_key, rects)
+        painter.save()
+        painter.translate((aligned_t0 - t0_us) / col_us * RASTER_COLUMN_PX, 0)
+        self._draw_rects(painter, self._raster_cache[1], colors)
+        painter.restore()
+
+    @staticmethod
+    def _draw_rects(painter, rects, colors):
+        """每种状态一次批量绘制；未演奏的音符最先画，位于最底层"""
+        painter.setPen(Qt.PenStyle.NoPen)
+        for status in (NOTE_DROPPED, NOTE_FOLDED, NOTE_MAPPED):
+            if rects[status]:
+                painter.setBrush(colors[status])
+                painter.drawRects(rects[status])
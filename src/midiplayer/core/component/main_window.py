@@ -21,6 +21,7 @@ from midiplayer.core.component.pages.omr_page import OMRInterface
 from midiplayer.core.component.pages.present_page import PresentPage
 from midiplayer.core.component.pages.setting_page import SettingPage
 from midiplayer.core.utils.db_manager import DBManager
+from midiplayer.core.utils.resource_governor import governor
 from midiplayer.core.utils.utils import Utils
 
 
@@ -180,6 +181,10 @@ class MainWindow(FluentWindow):
     def closeEvent(self, event):
         """处理窗口关闭事件，确保播放器正确关闭"""
         self.music_play_page.stop_play()
+        # 立即解除播放优先模式，让暂停中的索引构建结束
+        governor.shutdown()
+        # 显式写入播放期间推迟的音轨配置，不依赖对象回收
+        self.db.close()
         super().closeEvent(event)
 
     def check_update(self):
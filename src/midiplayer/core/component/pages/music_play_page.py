@@ -6,8 +6,10 @@ from PySide6.QtWidgets import QHBoxLayout, QListWidgetItem, QVBoxLayout, QWidget
 
 from midiplayer.core.component.common.midi_cards import MidiCards
 from midiplayer.core.component.common.music_player_bar import MusicPlayerBar
+from midiplayer.core.component.common.piano_roll_view import PianoRollView
 from midiplayer.core.component.common.present_list import PresentList
 from midiplayer.core.component.common.qlazy_widget import QLazyWidget
+from midiplayer.core.utils.config import cfg
 from midiplayer.core.utils.db_manager import DBManager
 from midiplayer.core.utils.style_sheet import StyleSheet
 from midiplayer.core.utils.utils import Utils
@@ -37,6 +39,9 @@ class MusicPlayPage(QLazyWidget):
         self.main_layout.addLayout(self.top_layout)
 
         self.music_player_bar = MusicPlayerBar(self, self.db)
+        self.piano_roll = PianoRollView(self.music_player_bar.player, self)
+        self.piano_roll.setVisible(cfg.get(cfg.player_show_piano_roll))
+        self.main_layout.addWidget(self.piano_roll)
         self.main_layout.addWidget(self.music_player_bar)
 
         self.connect_signals()
@@ -60,6 +65,12 @@ class MusicPlayPage(QLazyWidget):
         self.music_player_bar.signal_change_song_action.connect(
             self.on_change_song_action
         )
+        self.midi_tree.signal_playlist_changed.connect(
+            self.music_player_bar.set_playlist
+        )
+        self.music_player_bar.signal_song_advanced.connect(self.on_song_advanced)
+        self.piano_roll.signal_seek.connect(self.music_player_bar.seek_to)
+        cfg.player_show_piano_roll.valueChanged.connect(self.piano_roll.setVisible)
 
     def on_preset_selected(self, item: Optional[QListWidgetItem]):
         """处理预设选择事件"""
@@ -116,6 +127,11 @@ class MusicPlayPage(QLazyWidget):
                     note_to_key_cfg=self.note_to_key_mappings,
                 )
 
+    def on_song_advanced(self, midi_path: Path):
+        """播放器已无缝切到下一首，只同步状态，不重新准备"""
+        self.midi_path = midi_path
+        self.midi_tree.select_path(midi_path)
+
     def on_change_song_action(self, action):
         """处理歌曲切换操作"""
         self.midi_tree.on_user_action_change(action)
@@ -23,6 +23,7 @@ from qfluentwidgets import (
 
 from midiplayer.core.component.common.qlazy_widget import QLazyWidget
 from midiplayer.core.utils.config import cfg
+from midiplayer.core.utils.resource_governor import governor
 from midiplayer.core.utils.utils import Utils
 
 
@@ -73,14 +74,19 @@ class ConversionWorker(QThread):
                 errors="replace",
                 startupinfo=startupinfo,
             )
+            # 播放期间降低识别进程的优先级
+            governor.register_process(process.pid)
 
             # 实时读取日志
-            while True:
-                line = process.stdout.readline()
-                if not line and process.poll() is not None:
-                    break
-                if line:
-                    self.log_signal.emit(line.strip())
+            try:
+                while True:
+                    line = process.stdout.readline()
+                    if not line and process.poll() is not None:
+                        break
+                    if line:
+                        self.log_signal.emit(line.strip())
+            finally:
+                governor.unregister_process(process.pid)
 
             return_code = process.poll()
 
@@ -112,15 +118,17 @@ class ConversionWorker(QThread):
             from music21 import converter, midi, tempo
 
             try:
-                # 解析 mxl
-                score = converter.parse(str(mxl_path))
-                # 创建速度标记对象
-                mm = tempo.MetronomeMark(number=self.target_bpm)
-                for part in score.parts:
-                    part.insert(0, mm)
-
-                # 转换为 midi 文件对象
-                mf = midi.translate.music21ObjectToMidiFile(score)
+                # 播放期间以最低优先级转换
+                with governor.background_priority():
+                    # 解析 mxl
+                    score = converter.parse(str(mxl_path))
+                    # 创建速度标记对象
+                    mm = tempo.MetronomeMark(number=self.target_bpm)
+                    for part in score.parts:
+                        part.insert(0, mm)
+
+                    # 转换为 midi 文件对象
+                    mf = midi.translate.music21ObjectToMidiFile(score)
 
                 # 写入磁盘
                 mf.open(str(midi_path), "wb")
@@ -1,5 +1,4 @@
 # coding:utf-8
-import pydirectinput
 from loguru import logger
 from PySide6.QtCore import Qt
 from PySide6.QtWidgets import QFileDialog, QLabel, QWidget
@@ -86,7 +85,7 @@ class SettingPage(ScrollArea):
             cfg.player_play_press_delay,
             FIF.AIRPLANE,
             "按键延迟时间",
-            "两个按键之间的延迟，单位为毫秒",
+            "控制键与按键之间、点按按下到抬起之间的间隔，单位为毫秒，不影响和弦内其他按键",
             self.appGroup,
         )
         self.disableNoteFittingCard = SwitchSettingCard(
@@ -109,6 +108,105 @@ class SettingPage(ScrollArea):
             cfg.player_play_key_press_and_up,
             self.appGroup,
         )
+        self.chordToleranceCard = RangeSettingCard(
+            cfg.player_chord_tolerance_us,
+            FIF.ALIGNMENT,
+            "和弦合并容差",
+            "时间相差在此范围内的音符合并为和弦同时按下，单位为微秒，0 表示只合并完全同时的音符",
+            self.appGroup,
+        )
+        self.maxPolyphonyCard = RangeSettingCard(
+            cfg.player_max_polyphony,
+            FIF.FILTER,
+            "最大同时发音数",
+            "一个和弦内最多按下的音符数，超出时优先保留最高音与最低音，0 表示不限制",
+            self.appGroup,
+        )
+        self.maxKeysPerSecondCard = RangeSettingCard(
+            cfg.player_max_keys_per_second,
+            FIF.SPEED_OFF,
+            "每秒按键数上限",
+            "任意 1 秒内最多按下的键数，密集的 midi 会按旋律优先精简音符，0 表示不限制",
+            self.appGroup,
+        )
+        self.outputBackendCard = OptionsSettingCard(
+            cfg.player_output_backend,
+            FIF.GAME,
+            "按键输出方式",
+            "SendInput 将一组和弦合并为一次注入；pydirectinput 逐键发送；不发送按键仅用于预览",
+            texts=["SendInput 批量注入", "pydirectinput 逐键", "不发送按键"],
+            parent=self.appGroup,
+        )
+        self.latencyCompensationCard = SwitchSettingCard(
+            FIF.SYNC,
+            "输出延迟补偿",
+            "按本机测得的按键输出延迟提前发送按键，使按键落在乐谱时刻上，倍速播放时尤为明显",
+            cfg.player_latency_compensation,
+            self.appGroup,
+        )
+        self.latencyCalibrateCard = PushSettingCard(
+            "重新校准",
+            FIF.STOP_WATCH,
+            "校准输出延迟",
+            "清除已保存的延迟补偿量并在后台重新测量",
+            self.appGroup,
+        )
+        self.songCacheSizeCard = RangeSettingCard(
+            cfg.player_song_cache_size_mb,
+            FIF.SAVE,
+            "歌曲缓存大小",
+            "缓存解析后的midi以加快切歌速度，单位为MB，0 表示不缓存",
+            self.appGroup,
+        )
+        self.prefetchCountCard = RangeSettingCard(
+            cfg.player_prefetch_count,
+            FIF.DOWNLOAD,
+            "预加载歌曲数",
+            "播放时在后台提前加载接下来的歌曲，实现无缝切歌，0 表示关闭",
+            self.appGroup,
+        )
+        self.spinCpuBudgetCard = RangeSettingCard(
+            cfg.player_spin_cpu_budget,
+            FIF.SPEED_OFF,
+            "精确计时 CPU 占用",
+            "调度线程自旋等待最多占用的单核 CPU 百分比，越高按键时机越准，0 表示不自旋",
+            self.appGroup,
+        )
+        self.playbackPriorityCard = SwitchSettingCard(
+            FIF.PIN,
+            "播放优先模式",
+            "播放期间暂停索引构建、减少后台解析线程、推迟数据库写入并降低子进程优先级",
+            cfg.player_playback_priority,
+            self.appGroup,
+        )
+        self.jitterOverlayCard = SwitchSettingCard(
+            FIF.STOP_WATCH,
+            "显示按键延迟",
+            "在播放条上显示按键实际执行相对计划时间的延迟统计",
+            cfg.player_show_jitter_overlay,
+            self.appGroup,
+        )
+        self.processEngineCard = SwitchSettingCard(
+            FIF.APPLICATION,
+            "独立进程播放",
+            "在单独的进程中调度并发送按键，界面、索引与 MIDI 解析不再影响按键时序",
+            cfg.player_process_engine,
+            self.appGroup,
+        )
+        self.pianoRollCard = SwitchSettingCard(
+            FIF.MUSIC,
+            "显示钢琴卷帘",
+            "在播放页显示正在演奏的音符，并用颜色区分原键演奏、移调折叠与未演奏的音符",
+            cfg.player_show_piano_roll,
+            self.appGroup,
+        )
+        self.jitterReportCard = SwitchSettingCard(
+            FIF.DOCUMENT,
+            "保存时序报告",
+            "每首歌播放结束时将延迟统计写入用户目录下的 jitter_reports，便于对比机器与设置",
+            cfg.player_jitter_report,
+            self.appGroup,
+        )
         self.__initWidget()
 
         logger.info("SettingPage UI loaded")
@@ -144,6 +242,20 @@ class SettingPage(ScrollArea):
                 self.pressDelayCard,
                 self.disableNoteFittingCard,
                 self.keyPressAndUpCard,
+                self.chordToleranceCard,
+                self.maxPolyphonyCard,
+                self.maxKeysPerSecondCard,
+                self.outputBackendCard,
+                self.latencyCompensationCard,
+                self.latencyCalibrateCard,
+                self.songCacheSizeCard,
+                self.prefetchCountCard,
+                self.spinCpuBudgetCard,
+                self.processEngineCard,
+                self.playbackPriorityCard,
+                self.jitterOverlayCard,
+                self.jitterReportCard,
+                self.pianoRollCard,
             ]
         )
 
@@ -162,14 +274,13 @@ class SettingPage(ScrollArea):
         cfg.set(cfg.midi_folder, folder)
         self.midiFolderCard.setContent(folder)
 
-    def _on_press_delay_change(self, time):
-        pydirectinput.PAUSE = time / 1000
-
     def __connectSignalToSlot(self):
         # personalization
         cfg.themeChanged.connect(setTheme)
         cfg.themeColorChanged.connect(setThemeColor)
-        cfg.player_play_delay_time.valueChanged.connect(self._on_press_delay_change)
 
         # app
         self.midiFolderCard.clicked.connect(self.__onMidiFolderCardClicked)
+        self.latencyCalibrateCard.clicked.connect(
+            lambda: cfg.set(cfg.player_output_latency, {})
+        )
@@ -0,0 +1,448 @@
+# 调度器基准测试（无界面，可在 Linux 构建机上运行）
+#
+#   python -m midiplayer.core.player.benchmark [midi 文件 ...] \
+#       --speeds 1 2 --simulated --out bench.json
+#
+# 每个用例用注入的时钟与记录输出驱动 QMidiPlayer 的调度线程与执行线程，
+# 统计事件吞吐、按键延迟分布、CPU 时间与队列深度，结果写为 JSON 便于版本间对比。
+# --simulated 使用模拟时钟，以快于实时的速度跑完整首歌（测吞吐与 CPU 开销）；
+# 此时执行线程跟不上被快进的时钟，lateness 只反映积压程度，应关注 dispatch_p99_us。
+
+import argparse
+import json
+import platform
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+from loguru import logger
+from PySide6 import QtCore
+
+from midiplayer.core.player.clock import SimulatedClock, SystemClock
+from midiplayer.core.player.compiled_song import CompiledSong
+from midiplayer.core.player.key_output import RecordingOutput
+from midiplayer.core.player.midi_player import QMidiPlayer
+from midiplayer.core.player.output_latency import (
+    CALIBRATION_NPS,
+    CALIBRATION_SECONDS,
+    calibrate_output_latency,
+)
+from midiplayer.core.player.playback_program import (
+    CompileOptions,
+    OutputChannelParam,
+    build_playback_program,
+    load_song,
+)
+from midiplayer.core.player.song_cache import SongCache
+from midiplayer.core.player.synthetic import benchmark_mapping, synthetic_song
+from midiplayer.core.player.type import MdPlaybackParam
+from midiplayer.core.player.wait_strategy import machine_key
+from midiplayer.core.utils.config import cfg
+
+BENCHMARK_VERSION = 1
+
+# 多路输出同步检查的默认通道间偏差上限（微秒）：p99 与最大值分别判断，
+# 最大值受系统抢占影响，上限放宽
+DEFAULT_SKEW_BOUND_US = 1000
+DEFAULT_SKEW_MAX_BOUND_US = 5000
+# 时钟漂移检查允许的最大漂移（微秒）
+DRIFT_BOUND_US = 1.0
+
+
+def run_case(
+    name: str,
+    song: CompiledSong,
+    speed: float,
+    simulated: bool,
+    limit_seconds: float | None,
+    options: CompileOptions,
+    latency_offset_us: float = 0.0,
+) -> dict:
+    """
+    播放一首歌（或播放 limit_seconds 后停止，None 表示不限），返回统计结果。
+    latency_offset_us 为输出延迟补偿量（调度线程提前派发的真实时间）。
+    """
+    clock = SimulatedClock() if simulated else SystemClock()
+    output = RecordingOutput(clock)
+    # 基准测试不需要开头的播放延迟
+    player = QMidiPlayer(clock=clock, output=output, play_delay_sec=0)
+    player.main_channel.output_latency_us = latency_offset_us
+    program = build_playback_program(
+        song,
+        MdPlaybackParam(midiPath=name, noteToKeyMapping=benchmark_mapping()),
+        options,
+    )
+    player.install_program(program)
+
+    done = threading.Event()
+    timing = {}
+    direct = QtCore.Qt.ConnectionType.DirectConnection
+    player.signal_song_timing_done.connect(
+        lambda _path, info: timing.update(info), direct
+    )
+    player.signal_media_done.connect(lambda _: done.set(), direct)
+
+    player.start_player()
+    player.set_speed(speed)
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    sim_start_ns = clock.now_ns()
+    player.play()
+    finished = done.wait(timeout=limit_seconds)
+    if not finished:
+        player.stop()
+    # 等执行线程处理完队列中的按键
+    player.main_channel.task_ring.join()
+    wall_s = time.perf_counter() - wall_start
+    cpu_s = time.process_time() - cpu_start
+    played_s = (clock.now_ns() - sim_start_ns) / 1e9
+
+    jitter = player.main_channel.jitter
+    if timing:
+        stats = jitter.stats(timing["start_seq"], timing["end_seq"])
+        stats.update(
+            queue_high_water=timing["queue_high_water"], dropped=timing["dropped"]
+        )
+    else:
+        stats = jitter.stats()
+    player.stop_player()
+
+    return {
+        "name": name,
+        "clock": "simulated" if simulated else "system",
+        "speed": speed,
+        "chord_tolerance_us": options.chord_tolerance_us,
+        "press_delay_us": options.press_delay_us,
+        "latency_offset_us": latency_offset_us,
+        "max_polyphony": options.max_polyphony,
+        "max_keys_per_second": options.max_keys_per_second,
+        "thinned_notes": program.thinned_notes,
+        "finished": finished,
+        "song_events": len(song.events),
+        "song_duration_s": round(song.duration_us / 1e6, 3),
+        "played_s": round(played_s, 3),
+        "wall_s": round(wall_s, 3),
+        "cpu_s": round(cpu_s, 3),
+        "cpu_percent": round(100 * cpu_s / wall_s, 1) if wall_s > 0 else 0.0,
+        "dispatched_events": stats["count"],
+        "key_calls": len(output.records),
+        "output_batches": output.batches,
+        "events_per_s": round(stats["count"] / wall_s, 1) if wall_s > 0 else 0.0,
+        "lateness_us": {
+            k: stats[k]
+            for k in ("p50_us", "p95_us", "p99_us", "max_us", "dispatch_p99_us")
+        },
+        "queue_high_water": stats["queue_high_water"],
+        "dropped": stats["dropped"],
+    }
+
+
+def drift_check(hours: float, speed: float, notes_per_second: float = 2.0) -> dict:
+    """
+    时钟漂移检查：模拟时钟下以 speed 倍速播放 hours 小时的稀疏合成歌曲，
+    以第一个步骤对齐，比较每个步骤的派发时刻换算回的乐谱时刻与其实际乐谱时刻。
+    模拟时钟的自旋精确落在目标时刻上，偏差只来自播放时钟本身的累积误差。
+    """
+    clock = SimulatedClock()
+    player = QMidiPlayer(clock=clock, output=RecordingOutput(clock), play_delay_sec=0)
+    song = synthetic_song(hours * 3600, notes_per_second, 1)
+    player.install_program(
+        build_playback_program(
+            song,
+            MdPlaybackParam(midiPath="drift", noteToKeyMapping=benchmark_mapping()),
+            CompileOptions(),
+        )
+    )
+    done = threading.Event()
+    direct = QtCore.Qt.ConnectionType.DirectConnection
+    player.signal_media_done.connect(lambda _: done.set(), direct)
+    start_seq = player.main_channel.jitter.next_seq
+    player.start_player()
+    player.set_speed(speed)
+    wall_start = time.perf_counter()
+    player.play()
+    done.wait()
+    player.main_channel.task_ring.join()
+    wall_s = time.perf_counter() - wall_start
+    player.stop_player()
+
+    jitter = player.main_channel.jitter
+    seqs = np.arange(start_seq, jitter.next_seq) & jitter.mask
+    event_us = jitter.event_us[seqs]
+    queued_ns = jitter.queued_ns[seqs]
+    origin_ns = queued_ns[0] - event_us[0] * 1000 / speed
+    drift_us = (queued_ns - origin_ns) * speed / 1000 - event_us
+    return {
+        "hours": hours,
+        "speed": speed,
+        "steps": int(seqs.size),
+        "played_s": round(float(queued_ns[-1] - queued_ns[0]) / 1e9, 3),
+        "wall_s": round(wall_s, 3),
+        "max_drift_us": round(float(np.abs(drift_us).max()), 3),
+        "final_drift_us": round(float(drift_us[-1]), 3),
+        "drift_bound_us": DRIFT_BOUND_US,
+        "within_bound": float(np.abs(drift_us).max()) <= DRIFT_BOUND_US,
+    }
+
+
+def skew_check(
+    channel_count: int,
+    song: CompiledSong,
+    speed: float,
+    skew_bound_us: float = DEFAULT_SKEW_BOUND_US,
+    skew_max_bound_us: float = DEFAULT_SKEW_MAX_BOUND_US,
+) -> dict:
+    """
+    多路输出同步检查：真实时钟下主通道与 channel_count - 1 路附加通道
+    （相同的映射与音轨，各自一个记录输出）播放同一首歌，
+    逐个比较各通道第 k 次按键的发送时刻，统计通道间的偏差。
+    使用记录输出而不是空输出：偏差要按各通道的发送时刻计算，记录输出在 send 调用处
+    打时间戳（与真实后端被调用的位置相同），本身的开销只是追加到列表，与空输出相当。
+    """
+    clock = SystemClock()
+    outputs = [RecordingOutput(clock) for _ in range(channel_count)]
+    player = QMidiPlayer(clock=clock, output=outputs[0], play_delay_sec=0)
+    mapping = benchmark_mapping()
+    channels = [
+        OutputChannelParam(f"channel-{i}", mapping, None, RecordingOutput.name)
+        for i in range(1, channel_count)
+    ]
+    player.set_output_channels(channels, outputs[1:])
+    player.install_program(
+        build_playback_program(
+            song,
+            MdPlaybackParam(midiPath="skew", noteToKeyMapping=mapping),
+            CompileOptions(channels=tuple(channels)),
+        )
+    )
+    done = threading.Event()
+    direct = QtCore.Qt.ConnectionType.DirectConnection
+    player.signal_media_done.connect(lambda _: done.set(), direct)
+    player.start_player()
+    player.set_speed(speed)
+    player.play()
+    done.wait()
+    player.main_channel.task_ring.join()
+    player.stop_player()
+
+    key_calls = [len(output.records) for output in outputs]
+    count = min(key_calls)
+    sent_ns = np.array(
+        [[t for t, _, _ in output.records[:count]] for output in outputs],
+        dtype=np.int64,
+    )
+    skew_us = (sent_ns.max(axis=0) - sent_ns.min(axis=0)) / 1000
+    p99_skew_us = float(np.percentile(skew_us, 99)) if count else 0.0
+    max_skew_us = float(skew_us.max()) if count else 0.0
+    return {
+        "channels": channel_count,
+        "speed": speed,
+        "song_events": len(song.events),
+        "key_calls": key_calls,
+        "skew_us": {
+            "p50_us": round(float(np.percentile(skew_us, 50)), 1) if count else 0.0,
+            "p99_us": round(p99_skew_us, 1),
+            "max_us": round(max_skew_us, 1),
+            "over_bound": int((skew_us > skew_bound_us).sum()),
+        },
+        "skew_bound_us": skew_bound_us,
+        "skew_max_bound_us": skew_max_bound_us,
+        # 各通道的按键数不同说明有按键丢失，同样视为不同步
+        "within_bound": (
+            p99_skew_us <= skew_bound_us
+            and max_skew_us <= skew_max_bound_us
+            and len(set(key_calls)) == 1
+        ),
+    }
+
+
+def main(argv=None) -> int:
+    """运行基准测试；漂移或多路输出同步检查超出上限时返回非零退出码"""
+    parser = argparse.ArgumentParser(description="QMidiPlayer 调度器基准测试")
+    parser.add_argument("midi_files", nargs="*", help="要测试的 midi 文件")
+    parser.add_argument(
+        "--speeds", type=float, nargs="*", default=[1.0, 2.0], help="真实时钟倍速"
+    )
+    parser.add_argument(
+        "--simulated", action="store_true", help="额外用模拟时钟以最快速度运行"
+    )
+    parser.add_argument("--synthetic-seconds", type=float, default=10.0)
+    parser.add_argument("--synthetic-nps", type=float, default=60.0, help="每秒音符数")
+    parser.add_argument("--synthetic-chord", type=int, default=3, help="和弦音数")
+    parser.add_argument(
+        "--no-synthetic", action="store_true", help="不运行合成歌曲用例"
+    )
+    parser.add_argument(
+        "--limit", type=float, default=30.0, help="每个真实时钟用例最长播放秒数"
+    )
+    parser.add_argument(
+        "--chord-tolerance",
+        type=int,
+        nargs="+",
+        default=[1000],
+        help="和弦合并容差（微秒），可给多个值对比",
+    )
+    parser.add_argument(
+        "--press-delay-ms", type=int, default=0, help="按键延迟（毫秒），编入时间线"
+    )
+    parser.add_argument(
+        "--max-polyphony", type=int, default=0, help="和弦内最多按下的音符数"
+    )
+    parser.add_argument(
+        "--max-keys-per-second", type=int, default=0, help="每秒按键数上限"
+    )
+    parser.add_argument(
+        "--latency-offset-us",
+        type=float,
+        nargs="+",
+        default=[0.0],
+        help="输出延迟补偿量（微秒），可给多个值对比；-1 表示先校准",
+    )
+    parser.add_argument(
+        "--drift-hours",
+        type=float,
+        default=0,
+        help="额外运行时钟漂移检查：模拟播放的小时数（按 --speeds 中的每个倍速）",
+    )
+    parser.add_argument(
+        "--channels",
+        type=int,
+        default=0,
+        help="额外运行多路输出同步检查：输出通道数（含主通道），用合成歌曲",
+    )
+    parser.add_argument(
+        "--skew-bound-us",
+        type=float,
+        default=DEFAULT_SKEW_BOUND_US,
+        help="多路输出同步检查允许的通道间偏差 p99（微秒）",
+    )
+    parser.add_argument(
+        "--skew-max-bound-us",
+        type=float,
+        default=DEFAULT_SKEW_MAX_BOUND_US,
+        help="多路输出同步检查允许的通道间偏差最大值（微秒）",
+    )
+    parser.add_argument("--out", type=Path, help="结果 JSON 输出路径")
+    args = parser.parse_args(argv)
+
+    logger.remove()
+    logger.add(sys.stderr, level="INFO")
+    # 事件循环之外直接驱动播放器线程，仅需一个 QCoreApplication 承载计时器
+    app = QtCore.QCoreApplication.instance() or QtCore.QCoreApplication([])  # noqa
+    offsets = [
+        (
+            calibrate_output_latency(CALIBRATION_SECONDS, CALIBRATION_NPS)
+            if offset < 0
+            else offset
+        )
+        for offset in args.latency_offset_us
+    ]
+    if offsets != args.latency_offset_us:
+        logger.info(f"输出延迟校准结果: {offsets}")
+
+    songs = []
+    if not args.no_synthetic:
+        songs.append(
+            (
+                f"synthetic-{args.synthetic_nps:g}nps-x{args.synthetic_chord}",
+                synthetic_song(
+                    args.synthetic_seconds, args.synthetic_nps, args.synthetic_chord
+                ),
+            )
+        )
+    # 不使用磁盘缓存，每次都真实解析
+    no_cache = SongCache(Path(tempfile.gettempdir()) / "midiplayer_bench_cache", 0)
+    for midi_file in args.midi_files:
+        songs.append((str(midi_file), load_song(str(midi_file), no_cache)))
+
+    cases = []
+    for name, song in songs:
+        for tolerance in args.chord_tolerance:
+            options = CompileOptions(
+                chord_tolerance_us=tolerance,
+                press_delay_us=args.press_delay_ms * 1000,
+                max_polyphony=args.max_polyphony,
+                max_keys_per_second=args.max_keys_per_second,
+            )
+            for speed in args.speeds:
+                for offset in offsets:
+                    logger.info(
+                        f"运行 {name} @ {speed:g}x 容差 {tolerance}us 补偿 {offset}us ..."
+                    )
+                    cases.append(
+                        run_case(name, song, speed, False, args.limit, options, offset)
+                    )
+            if args.simulated:
+                logger.info(f"运行 {name} @ 模拟时钟 容差 {tolerance}us ...")
+                cases.append(run_case(name, song, 1.0, True, None, options))
+
+    drift = []
+    if args.drift_hours > 0:
+        for speed in args.speeds or [1.0]:
+            logger.info(f"时钟漂移检查 {args.drift_hours:g} 小时 @ {speed:g}x ...")
+            drift.append(drift_check(args.drift_hours, speed))
+            logger.info(
+                f"最大漂移 {drift[-1]['max_drift_us']}us（上限 {DRIFT_BOUND_US}us）"
+            )
+
+    skew = []
+    if args.channels > 1:
+        song = synthetic_song(
+            args.synthetic_seconds, args.synthetic_nps, args.synthetic_chord
+        )
+        for speed in args.speeds or [1.0]:
+            logger.info(f"多路输出同步检查 {args.channels} 路 @ {speed:g}x ...")
+            skew.append(
+                skew_check(
+                    args.channels,
+                    song,
+                    speed,
+                    args.skew_bound_us,
+                    args.skew_max_bound_us,
+                )
+            )
+            logger.info(
+                f"通道间偏差 p99/max {skew[-1]['skew_us']['p99_us']}/"
+                f"{skew[-1]['skew_us']['max_us']}us"
+            )
+
+    result = {
+        "version": BENCHMARK_VERSION,
+        "machine": machine_key(),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "timing_profile": cfg.get(cfg.player_timing_profile),
+        "cases": cases,
+        "drift": drift,
+        "skew": skew,
+    }
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.out:
+        args.out.write_text(text, encoding="utf-8")
+        logger.info(f"结果已写入 {args.out}")
+    else:
+        print(text)
+
+    for case in cases:
+        lateness = case["lateness_us"]
+        logger.info(
+            f"{case['name']} {case['clock']} {case['speed']:g}x "
+            f"容差 {case['chord_tolerance_us']}us 补偿 {case['latency_offset_us']}us: "
+            f"{case['events_per_s']:.0f} 事件/s, CPU {case['cpu_percent']}%, "
+            f"延迟 p50/p99/max {lateness['p50_us']}/{lateness['p99_us']}/"
+            f"{lateness['max_us']}us, 队列峰值 {case['queue_high_water']}"
+        )
+
+    failed = [f"漂移 {d['speed']:g}x" for d in drift if not d["within_bound"]]
+    failed += [f"通道间偏差 {s['speed']:g}x" for s in skew if not s["within_bound"]]
+    if failed:
+        logger.error(f"超出上限: {', '.join(failed)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
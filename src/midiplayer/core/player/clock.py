@@ -0,0 +1,108 @@
+# 播放器使用的时钟（可注入）
+# 调度线程与执行线程只通过时钟读取时间、等待、自旋，
+# 因此可以在无界面的基准测试中替换为模拟时钟，以快于实时的速度运行。
+
+import math
+import threading
+import time
+from typing import NamedTuple
+
+# 模拟时钟中一次带超时等待的最小耗时：真实的等待总有开销，
+# 且调度器以整微秒推进虚拟时间，不推进会在亚微秒的差值上原地空转
+MIN_SIMULATED_WAIT_NS = 1000
+
+
+def playback_time_us(
+    now_ns: int, anchor_real_ns: int, anchor_playback_us: float, speed: float
+) -> float:
+    """
+    锚点 (真实时刻, 播放时刻, 倍速) 下，真实时刻 now_ns 对应的播放时刻（微秒）。
+    纯函数：只在播放 / 暂停 / 跳转 / 变速时重新锚定，误差不随唤醒次数累积。
+    """
+    return anchor_playback_us + (now_ns - anchor_real_ns) * speed / 1000
+
+
+def real_time_ns(
+    playback_us: float, anchor_real_ns: int, anchor_playback_us: float, speed: float
+) -> int:
+    """
+    playback_time_us 的反函数：播放时刻对应的真实时刻（纳秒）。
+    向上取整，非 1x 倍速下自旋到该时刻后步骤即已到期，不会差不到 1 纳秒而再转一轮
+    """
+    return anchor_real_ns + math.ceil((playback_us - anchor_playback_us) * 1000 / speed)
+
+
+class PositionSnapshot(NamedTuple):
+    """
+    发布给界面的播放位置快照。不可变，整体替换引用即为原子发布：
+    读者取一次引用即得到一致的 (锚点, 倍速)，无需加锁即可外推当前位置。
+    """
+
+    # 锚定的真实时刻，0 表示时钟未推进（暂停 / 空闲 / 开始前的延迟）
+    anchor_real_ns: int
+    anchor_playback_us: float
+    speed: float
+    duration_us: int
+
+    def position_us(self, now_ns: int) -> float:
+        if not self.anchor_real_ns:
+            return self.anchor_playback_us
+        return playback_time_us(
+            now_ns, self.anchor_real_ns, self.anchor_playback_us, self.speed
+        )
+
+
+class SystemClock:
+    """真实的单调时钟"""
+
+    simulated = False
+
+    @staticmethod
+    def now_ns() -> int:
+        return time.perf_counter_ns()
+
+    @staticmethod
+    def wait(event: threading.Event, timeout_sec: float | None) -> bool:
+        return event.wait(timeout=timeout_sec)
+
+    @staticmethod
+    def spin_until(target_ns: int) -> int:
+        """忙等到目标时间，返回结束时刻"""
+        now = time.perf_counter_ns()
+        while now < target_ns:
+            now = time.perf_counter_ns()
+        return now
+
+
+class SimulatedClock:
+    """
+    模拟时钟：带超时的等待与自旋不真正消耗时间，而是直接把时间推进到目标点，
+    调度器因此以 CPU 允许的最快速度运行。无限期等待（暂停/空闲）仍然真实阻塞。
+    只应由单个调度线程推进；其他线程只读取。
+    """
+
+    simulated = True
+
+    def __init__(self, start_ns: int = 1):
+        # 播放器以 0 表示“未锚定”，时间从 1 开始
+        self._now_ns = start_ns
+
+    def now_ns(self) -> int:
+        return self._now_ns
+
+    def advance(self, delta_ns: int):
+        self._now_ns += max(0, int(delta_ns))
+
+    def wait(self, event: threading.Event, timeout_sec: float | None) -> bool:
+        if timeout_sec is None:
+            return event.wait()
+        if event.is_set():
+            return True
+        self.advance(max(MIN_SIMULATED_WAIT_NS, timeout_sec * 1_000_000_000))
+        return False
+
+    def spin_until(self, target_ns: int) -> int:
+        # 真实的自旋至少读一次时钟，时间总会前进；
+        # 否则浮点换算落在目标之前 1 纳秒时，调度器会在同一时刻原地空转
+        self._now_ns = max(target_ns, self._now_ns + 1)
+        return self._now_ns
@@ -0,0 +1,181 @@
+from array import array
+
+import mido
+import numpy as np
+
+from midiplayer.core.player.tempo_map import TempoMap
+from midiplayer.core.player.timeline import (
+    EVENT_NOTE_OFF,
+    EVENT_NOTE_ON,
+    EventTimeline,
+    build_timeline,
+)
+
+
+class CompiledSong:
+    """
+    一首 midi 编译后的全部播放数据，编译之后不再需要 mido 对象：
+    - events          : 列式事件时间线
+    - tempo_events    : int64 (n, 2) 的 [tick, tempo] 数组
+    - time_signatures : int64 (m, 3) 的 [tick, 分子, 分母] 数组
+    - tempo_map       : 由以上两者构建的 TempoMap
+    - note_histograms : uint32 (音轨数, 128) 的每音轨 note_on 计数
+    - track_names / track_sizes : 每个音轨的名称与消息数
+    """
+
+    __slots__ = (
+        "events",
+        "tempo_events",
+        "time_signatures",
+        "tempo_map",
+        "ticks_per_beat",
+        "note_histograms",
+        "track_names",
+        "track_sizes",
+        "music_track_index",
+        "control_track_index",
+        "duration_us",
+    )
+
+    def __init__(
+        self,
+        events: EventTimeline,
+        tempo_events: np.ndarray,
+        time_signatures: np.ndarray,
+        ticks_per_beat: int,
+        note_histograms: np.ndarray,
+        track_names: list[str],
+        track_sizes: list[int],
+        music_track_index: list[int],
+        control_track_index: list[int],
+        duration_us: int,
+        tempo_map: TempoMap | None = None,
+    ):
+        self.events = events
+        self.tempo_events = tempo_events
+        self.time_signatures = time_signatures
+        self.ticks_per_beat = ticks_per_beat
+        self.tempo_map = tempo_map or TempoMap(
+            ticks_per_beat, tempo_events, time_signatures
+        )
+        self.note_histograms = note_histograms
+        self.track_names = track_names
+        self.track_sizes = track_sizes
+        self.music_track_index = music_track_index
+        self.control_track_index = control_track_index
+        self.duration_us = duration_us
+
+    def note_counts(self, track_idxes) -> dict[int, int]:
+        """统计指定音轨集合的 音符 -> note_on 次数"""
+        track_idxes = sorted(track_idxes)
+        if not track_idxes:
+            return {}
+        total = self.note_histograms[track_idxes].sum(axis=0)
+        return {int(n): int(total[n]) for n in np.flatnonzero(total)}
+
+
+def compile_song(midi: mido.MidiFile) -> CompiledSong:
+    """
+    单次遍历所有音轨的消息，同时得到：
+    事件时间线、tempo / 拍号、音轨名称、控制/演奏音轨划分以及歌曲总时长，
+    编译完成后调用方即可释放 mido 对象。
+    """
+    music_track_index = []
+    control_track_index = []
+    track_names = []
+    # 使用定长类型数组收集原始事件，避免为每个事件创建元组
+    raw_ticks = array("q")
+    raw_codes = array("B")
+    raw_notes = array("B")
+    raw_tracks = array("H")
+    tempo_events = []  # (tick, tempo)
+    time_signatures = []  # (tick, 分子, 分母)
+    end_tick = 0
+
+    for i, track in enumerate(midi.tracks):
+        control_track = True
+        current_tick = 0
+        track_name = None
+
+        for msg in track:
+            current_tick += msg.time
+            msg_type = msg.type
+            if msg_type == "note_on" or msg_type == "note_off":
+                raw_ticks.append(current_tick)
+                raw_codes.append(
+                    EVENT_NOTE_ON
+                    if (msg_type == "note_on" and msg.velocity > 0)
+                    else EVENT_NOTE_OFF
+                )
+                raw_notes.append(msg.note)
+                raw_tracks.append(i)
+                control_track = False
+            elif msg_type == "set_tempo":
+                tempo_events.append((current_tick, msg.tempo))
+            elif msg_type == "time_signature":
+                time_signatures.append(
+                    (current_tick, msg.numerator, msg.denominator)
+                )
+            elif msg_type == "track_name" and track_name is None:
+                track_name = msg.name
+
+        track_names.append(track_name or "")
+        end_tick = max(end_tick, current_tick)
+        if control_track:
+            control_track_index.append(i)
+        else:
+            music_track_index.append(i)
+
+    return build_compiled_song(
+        ticks_per_beat=midi.ticks_per_beat,
+        raw_events=(
+            np.frombuffer(raw_ticks, dtype=np.int64),
+            np.frombuffer(raw_codes, dtype=np.uint8),
+            np.frombuffer(raw_notes, dtype=np.uint8),
+            np.frombuffer(raw_tracks, dtype=np.uint16),
+        ),
+        tempo_events=tempo_events,
+        time_signatures=time_signatures,
+        track_names=track_names,
+        track_sizes=[len(track) for track in midi.tracks],
+        music_track_index=music_track_index,
+        control_track_index=control_track_index,
+        end_tick=end_tick,
+    )
+
+
+def build_compiled_song(
+    ticks_per_beat: int,
+    raw_events: tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray],
+    tempo_events: list[tuple[int, int]],
+    time_signatures: list[tuple[int, int, int]],
+    track_names: list[str],
+    track_sizes: list[int],
+    music_track_index: list[int],
+    control_track_index: list[int],
+    end_tick: int,
+) -> CompiledSong:
+    """由一次遍历收集到的原始数据构建 CompiledSong（时间转换、直方图均为向量化计算）"""
+    tempo_events = np.asarray(tempo_events, dtype=np.int64).reshape(-1, 2)
+    time_signatures = np.asarray(time_signatures, dtype=np.int64).reshape(-1, 3)
+    tempo_map = TempoMap(ticks_per_beat, tempo_events, time_signatures)
+    events = build_timeline(*raw_events, tempo_map)
+
+    # 每音轨音符直方图（供音符拟合使用）
+    note_histograms = np.zeros((len(track_sizes), 128), dtype=np.uint32)
+    on_mask = events.codes == EVENT_NOTE_ON
+    np.add.at(note_histograms, (events.tracks[on_mask], events.notes[on_mask]), 1)
+
+    return CompiledSong(
+        events=events,
+        tempo_events=tempo_events,
+        time_signatures=time_signatures,
+        ticks_per_beat=ticks_per_beat,
+        note_histograms=note_histograms,
+        track_names=track_names,
+        track_sizes=track_sizes,
+        music_track_index=music_track_index,
+        control_track_index=control_track_index,
+        duration_us=int(tempo_map.tick_to_us(end_tick)),
+        tempo_map=tempo_map,
+    )
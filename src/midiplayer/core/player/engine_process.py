@@ -0,0 +1,440 @@
+# 独立进程的实时播放引擎
+# 调度、执行线程与输出后端运行在子进程中，不再与界面、索引、MIDI 解析等共享 GIL。
+# 播放器进程仍然维护状态机与时钟锚点：播放时刻由系统级单调时钟上的锚点算出，
+# 两个进程按同一个锚点各自计算，无需同步时钟，只在锚点变化时发送一条命令。
+# - 派发时间线：时刻数组与步骤编号写入共享内存；去重后的步骤表与按键快照随命令发送一次
+# - 命令：播放器 -> 引擎的 Pipe（载入 / 游标 / 锚点 / flush / 恢复按键 / 通道设置）
+# - 遥测：主通道的时序记录放在共享内存中，计数器每轮写入遥测数组，播放器无锁读取统计
+
+import multiprocessing
+import threading
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+from loguru import logger
+
+from midiplayer.core.player.clock import SystemClock, playback_time_us, real_time_ns
+from midiplayer.core.player.jitter_stats import JitterRecorder, jitter_buffer_size
+from midiplayer.core.player.key_output import create_key_output
+from midiplayer.core.player.key_steps import DispatchTimeline
+from midiplayer.core.player.output_channel import OutputChannel
+from midiplayer.core.player.playback_program import PlaybackProgram
+from midiplayer.core.player.wait_strategy import (
+    WaitStrategy,
+    calibrate_wait_overshoot,
+    is_profile_valid,
+)
+
+# 遥测数组（int64）：主通道时序记录的下一个序号、队列峰值、丢弃数
+TELEMETRY_NEXT_SEQ = 0
+TELEMETRY_QUEUE_HIGH_WATER = 1
+TELEMETRY_DROPPED = 2
+TELEMETRY_FIELDS = 3
+# 等待引擎进程退出的时间（秒），超时后强制结束
+STOP_TIMEOUT_SEC = 2.0
+
+
+def export_timeline(dispatch: DispatchTimeline) -> tuple[SharedMemory, tuple]:
+    """
+    把派发时间线写入新的共享内存：int64 时刻数组 + int32 步骤编号。
+    返回 (共享内存, 载入命令中的描述)
+    """
+    steps = dispatch.steps
+    count = len(steps)
+    # 编译时相同的步骤共用同一个对象，按对象去重
+    _, first, ids = np.unique(
+        np.fromiter(map(id, steps), np.int64, count),
+        return_index=True,
+        return_inverse=True,
+    )
+    table = [steps[i] for i in first.tolist()]
+    shm = SharedMemory(create=True, size=max(1, count * 12))
+    np.ndarray(count, np.int64, shm.buf)[:] = dispatch.times
+    np.ndarray(count, np.int32, shm.buf, offset=count * 8)[:] = ids
+    return shm, (shm.name, count, table, dispatch.checkpoints)
+
+
+def attach_timeline(desc: tuple) -> tuple[SharedMemory, DispatchTimeline]:
+    """(引擎进程) 由描述打开共享内存中的派发时间线，时刻数组不复制"""
+    name, count, table, checkpoints = desc
+    shm = _attach_shared_memory(name)
+    times = np.ndarray(count, np.int64, shm.buf)
+    ids = np.ndarray(count, np.int32, shm.buf, offset=count * 8)
+    steps = [table[i] for i in ids.tolist()]
+    return shm, DispatchTimeline(times, steps, checkpoints)
+
+
+def _attach_shared_memory(name: str) -> SharedMemory:
+    # spawn 的子进程与播放器进程共用同一个 resource_tracker，重复登记无副作用，
+    # 共享内存只由播放器进程 unlink
+    return SharedMemory(name=name)
+
+
+class EngineJitterView(JitterRecorder):
+    """(播放器进程) 引擎主通道时序记录的只读视图，计数器来自遥测数组"""
+
+    def __init__(self, buffer, telemetry: np.ndarray, send):
+        super().__init__(buffer=buffer)
+        self.telemetry = telemetry
+        self._send = send
+
+    def refresh(self) -> "EngineJitterView":
+        counters = self.telemetry.tolist()
+        self.next_seq = counters[TELEMETRY_NEXT_SEQ]
+        self.queue_high_water = counters[TELEMETRY_QUEUE_HIGH_WATER]
+        self.dropped = counters[TELEMETRY_DROPPED]
+        return self
+
+    def take_counters(self) -> tuple[int, int]:
+        self.refresh()
+        self._send(("take_counters",))
+        return self.queue_high_water, self.dropped
+
+
+class EngineProcess:
+    """
+    (播放器进程) 引擎进程的句柄。所有方法只发送命令，不等待回复；
+    除预先载入程序外，调用方在持有 clock_lock 时调用，保证命令顺序与播放器状态一致。
+    """
+
+    def __init__(self, timing_profile: dict, cpu_budget: int):
+        self.timing_profile = timing_profile
+        self.cpu_budget = cpu_budget
+        self.process = None
+        self.conn = None
+        self.alive = False
+        # GUI 线程与调度线程都会发送命令
+        self._send_lock = threading.Lock()
+        # 主通道时序记录与遥测数组
+        self._jitter_shm: SharedMemory | None = None
+        self._telemetry_shm: SharedMemory | None = None
+        self.jitter: EngineJitterView | None = None
+        # 已载入引擎的程序 {id(程序): (程序, 键, 各通道的共享内存)}
+        self._loaded: dict[int, tuple[PlaybackProgram, int, list]] = {}
+        self._next_key = 0
+
+    def start(self):
+        self._jitter_shm = SharedMemory(create=True, size=jitter_buffer_size())
+        self._telemetry_shm = SharedMemory(create=True, size=TELEMETRY_FIELDS * 8)
+        telemetry = np.ndarray(TELEMETRY_FIELDS, np.int64, self._telemetry_shm.buf)
+        telemetry[:] = 0
+        self.jitter = EngineJitterView(self._jitter_shm.buf, telemetry, self.send)
+        self.jitter.seqs[:] = -1
+
+        ctx = multiprocessing.get_context("spawn")
+        child_conn, self.conn = ctx.Pipe(duplex=False)
+        self.process = ctx.Process(
+            target=engine_main,
+            args=(
+                child_conn,
+                self._jitter_shm.name,
+                self._telemetry_shm.name,
+                self.timing_profile,
+                self.cpu_budget,
+            ),
+            name="midiplayer-engine",
+            daemon=True,
+        )
+        self.process.start()
+        child_conn.close()
+        self.alive = True
+        logger.debug(f"引擎进程已启动: pid={self.process.pid}")
+
+    def stop(self):
+        """结束引擎进程（退出前释放所有按键），并释放共享内存"""
+        if self.process is not None and self.process.is_alive():
+            self.send(("quit",))
+        if self.process is not None:
+            self.process.join(STOP_TIMEOUT_SEC)
+            if self.process.is_alive():
+                logger.warning("引擎进程未按时退出，强制结束")
+                self.process.terminate()
+                self.process.join()
+        self.alive = False
+        if self.conn is not None:
+            self.conn.close()
+        for _, _, shms in self._loaded.values():
+            _release(shms)
+        self._loaded.clear()
+        # 视图引用着缓冲区，先丢弃再关闭
+        self.jitter = None
+        _release([self._jitter_shm, self._telemetry_shm])
+        logger.debug("引擎进程已停止")
+
+    def is_alive(self) -> bool:
+        return self.alive and self.process.is_alive()
+
+    def send(self, command: tuple):
+        with self._send_lock:
+            if not self.alive:
+                return
+            try:
+                self.conn.send(command)
+            except (OSError, ValueError) as e:
+                logger.error(f"引擎进程通信失败: {e}")
+                self.alive = False
+
+    ### 命令 ###
+    def set_channels(self, channels: list[OutputChannel]):
+        """各通道的 (名称, 输出后端, 输出延迟)，第一个为主通道"""
+        self.send(
+            (
+                "channels",
+                tuple((c.name, c.output.name, c.output_latency_us) for c in channels),
+            )
+        )
+
+    def set_cpu_budget(self, value: int):
+        self.cpu_budget = value
+        self.send(("cpu_budget", value))
+
+    def load(self, program: PlaybackProgram) -> int:
+        """把程序（主通道及各附加通道）的派发时间线交给引擎，已载入时直接返回键"""
+        loaded = self._loaded.get(id(program))
+        if loaded is not None:
+            return loaded[1]
+        shms = []
+        descs = []
+        for dispatch in (program.dispatch, *(c.dispatch for c in program.channels)):
+            shm, desc = export_timeline(dispatch)
+            shms.append(shm)
+            descs.append(desc)
+        key = self._next_key
+        self._next_key += 1
+        self._loaded[id(program)] = (program, key, shms)
+        self.send(("load", key, tuple(descs)))
+        return key
+
+    def retain(self, programs):
+        """只保留给定程序的时间线，其余的从引擎中卸载并释放共享内存"""
+        keep = {id(p) for p in programs if p is not None}
+        for program_id in list(self._loaded):
+            if program_id not in keep:
+                _, key, shms = self._loaded.pop(program_id)
+                self.send(("drop", key))
+                _release(shms)
+
+    def set_cursor(self, program: PlaybackProgram, indexes: tuple, anchor: tuple):
+        """
+        切换到程序并定位各通道的派发游标（主通道在前，None 表示该通道没有程序）。
+        同时带上锚点，游标与锚点一起生效，不会按旧锚点派发新位置
+        """
+        self.send(("cursor", self.load(program), indexes, anchor))
+
+    def set_anchor(self, anchor_real_ns: int, anchor_playback_us: float, speed):
+        """锚点变化：anchor_real_ns 为 0 表示时钟停止，引擎不再派发"""
+        self.send(("anchor", anchor_real_ns, anchor_playback_us, speed))
+
+    def flush(self):
+        self.send(("flush",))
+
+    def restore_held_keys(self, playback_us: float):
+        self.send(("restore", playback_us))
+
+
+def _release(shms):
+    for shm in shms:
+        if shm is None:
+            continue
+        try:
+            shm.close()
+            shm.unlink()
+        except (BufferError, FileNotFoundError) as e:
+            logger.debug(f"释放共享内存失败: {shm.name} {e}")
+
+
+### 引擎进程 ###
+def engine_main(
+    conn, jitter_name: str, telemetry_name: str, timing_profile: dict, cpu_budget
+):
+    """引擎进程入口"""
+    if not is_profile_valid(timing_profile):
+        timing_profile = calibrate_wait_overshoot()
+    EngineHost(conn, jitter_name, telemetry_name, timing_profile, cpu_budget).run()
+
+
+class EngineHost:
+    """
+    (引擎进程) 命令线程接收命令并在 lock 下修改状态，调度线程（主线程）按锚点派发。
+    派发逻辑与播放器进程内的调度线程相同，只是游标与锚点来自命令。
+    """
+
+    def __init__(
+        self,
+        conn,
+        jitter_name: str,
+        telemetry_name: str,
+        timing_profile: dict,
+        cpu_budget,
+    ):
+        self.conn = conn
+        self.clock = SystemClock()
+        self.lock = threading.Lock()
+        self.wake_up_event = threading.Event()
+        self.running = True
+
+        self._jitter_shm = _attach_shared_memory(jitter_name)
+        self._telemetry_shm = _attach_shared_memory(telemetry_name)
+        self.jitter = JitterRecorder(buffer=self._jitter_shm.buf)
+        self.telemetry = np.ndarray(
+            TELEMETRY_FIELDS, np.int64, self._telemetry_shm.buf
+        )
+        self.wait_strategy = WaitStrategy(timing_profile, cpu_budget, self.clock)
+
+        # 通道（第一个为主通道）及其 (名称, 后端)
+        self.channels: tuple[OutputChannel, ...] = ()
+        self._channel_specs: tuple = ()
+        # 已载入的时间线 {键: (共享内存, 各通道的时间线)}
+        self.programs: dict[int, tuple[list, tuple]] = {}
+        self.timelines: tuple[DispatchTimeline | None, ...] = ()
+        self.indexes: list[int] = []
+        self.anchor = (0, 0, 1.0)
+
+    def run(self):
+        threading.Thread(target=self._command_thread, daemon=True).start()
+        wait_strategy = self.wait_strategy
+        while self.running:
+            self.wake_up_event.clear()
+            spin_wait = False
+            target_real_time_ns = 0
+            wait_timeout_sec = None
+
+            with self.lock:
+                anchor = self.anchor
+                if anchor[0] and self.channels:
+                    now_ns = self.clock.now_ns()
+                    playback_us = playback_time_us(now_ns, *anchor)
+                    next_us = None
+                    for i, dispatch in enumerate(self.timelines):
+                        if dispatch is None or i >= len(self.channels):
+                            continue
+                        self.indexes[i], channel_next_us = self.channels[i].advance(
+                            dispatch, self.indexes[i], playback_us, anchor
+                        )
+                        if channel_next_us is not None and (
+                            next_us is None or channel_next_us < next_us
+                        ):
+                            next_us = channel_next_us
+                    self.channels[0].task_ring.notify()
+                    self._publish_telemetry()
+                    if next_us is not None:
+                        target_real_time_ns = real_time_ns(next_us, *anchor)
+                        spin_wait, wait_timeout_sec = wait_strategy.plan(
+                            (target_real_time_ns - now_ns) / 1000
+                        )
+                    # 没有剩余步骤时等待下一条命令
+
+            if spin_wait:
+                wait_strategy.spin_until(target_real_time_ns)
+            else:
+                wait_strategy.wait_event(self.wake_up_event, wait_timeout_sec)
+
+        self._shutdown()
+
+    def _publish_telemetry(self):
+        jitter = self.jitter
+        self.telemetry[:] = (jitter.next_seq, jitter.queue_high_water, jitter.dropped)
+
+    def _shutdown(self):
+        if self.channels:
+            # 主通道的执行线程退出时释放所有通道按下的键
+            self.channels[0].stop()
+        self._publish_telemetry()
+        for shms, _ in self.programs.values():
+            for shm in shms:
+                shm.close()
+        # 数组视图引用着缓冲区，先丢弃再关闭
+        self.jitter = self.telemetry = None
+        self._jitter_shm.close()
+        self._telemetry_shm.close()
+
+    ### 命令线程 ###
+    def _command_thread(self):
+        while self.running:
+            try:
+                command = self.conn.recv()
+            except (EOFError, OSError):
+                # 播放器进程已退出
+                command = ("quit",)
+            try:
+                self._handle(command)
+            except Exception as e:
+                logger.exception(f"引擎命令执行失败: {command[0]} {e}")
+            self.wake_up_event.set()
+
+    def _handle(self, command: tuple):
+        name = command[0]
+        if name == "anchor":
+            with self.lock:
+                self.anchor = command[1:]
+        elif name == "cursor":
+            _, key, indexes, anchor = command
+            timelines = self.programs[key][1]
+            with self.lock:
+                self.anchor = anchor
+                self.timelines = tuple(
+                    dispatch if index is not None else None
+                    for dispatch, index in zip(timelines, indexes)
+                )
+                self.indexes = [index or 0 for index in indexes]
+        elif name == "flush":
+            with self.lock:
+                if self.channels:
+                    self.channels[0].task_ring.flush()
+        elif name == "restore":
+            with self.lock:
+                for channel, dispatch, index in zip(
+                    self.channels, self.timelines, self.indexes
+                ):
+                    if dispatch is not None:
+                        channel.restore_held_keys(dispatch, index, command[1])
+        elif name == "load":
+            _, key, descs = command
+            # 在锁外打开共享内存并展开步骤，不阻塞派发
+            attached = [attach_timeline(desc) for desc in descs]
+            with self.lock:
+                self.programs[key] = (
+                    [shm for shm, _ in attached],
+                    tuple(dispatch for _, dispatch in attached),
+                )
+        elif name == "drop":
+            with self.lock:
+                shms, _ = self.programs.pop(command[1], ([], ()))
+            for shm in shms:
+                shm.close()
+        elif name == "channels":
+            self._set_channels(command[1])
+        elif name == "cpu_budget":
+            self.wait_strategy.set_cpu_budget(command[1])
+        elif name == "take_counters":
+            self.jitter.take_counters()
+        elif name == "quit":
+            self.running = False
+
+    def _set_channels(self, specs: tuple):
+        """后端变化时重建通道；只有输出延迟变化时原地更新"""
+        names = tuple((name, backend) for name, backend, _ in specs)
+        old_channels = ()
+        if names != self._channel_specs:
+            main_name, main_backend = names[0]
+            main = OutputChannel(main_name, create_key_output(main_backend), self.clock)
+            main.jitter = self.jitter
+            followers = tuple(
+                OutputChannel(
+                    name, create_key_output(backend), self.clock, main.task_ring
+                )
+                for name, backend in names[1:]
+            )
+            main.followers = followers
+            main.start()
+            with self.lock:
+                old_channels = self.channels
+                self.channels = (main, *followers)
+                self._channel_specs = names
+        with self.lock:
+            for channel, (_, _, latency_us) in zip(self.channels, specs):
+                channel.output_latency_us = latency_us
+        if old_channels:
+            # 旧的主通道执行线程退出时释放所有旧通道按下的键
+            old_channels[0].stop()
+        logger.debug(f"引擎输出通道: {names}")
@@ -0,0 +1,134 @@
+import json
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+# 环形缓冲区容量（2 的幂），超出后覆盖最旧的记录
+DEFAULT_CAPACITY = 1 << 16
+# 未完成（或已丢弃）的记录的完成时间
+NOT_DONE = 0
+# 每条记录的字段数：序号、事件时间、应执行时刻、入队时刻、完成时刻
+RECORD_FIELDS = 5
+
+
+def jitter_buffer_size(capacity: int = DEFAULT_CAPACITY) -> int:
+    """放在外部缓冲区中的时序记录所需字节数（序号需初始化为 -1）"""
+    return RECORD_FIELDS * capacity * 8
+
+
+class JitterRecorder:
+    """
+    按键事件的时序记录（预分配的环形缓冲区）。
+    调度线程调用 record_queued 写入 (事件时间, 应执行时刻, 入队时刻) 并得到序号，
+    执行线程在按键调用返回后用该序号调用 record_done。
+    统计时只读数组，不阻塞写入；极少数正在被覆盖的记录通过序号校验剔除。
+    数组可以放在外部缓冲区（共享内存）中，由另一个进程直接读取统计。
+    """
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY, buffer=None):
+        assert capacity & (capacity - 1) == 0, "capacity 必须为 2 的幂"
+        self.capacity = capacity
+        self.mask = capacity - 1
+        if buffer is None:
+            arrays = np.zeros((RECORD_FIELDS, capacity), dtype=np.int64)
+            arrays[0] = -1
+        else:
+            arrays = np.ndarray((RECORD_FIELDS, capacity), np.int64, buffer)
+        self.seqs, self.event_us, self.due_ns, self.queued_ns, self.done_ns = arrays
+
+        self.next_seq = 0
+        self.queue_high_water = 0
+        self.dropped = 0
+        self.lock = threading.Lock()  # 只保护计数器的复位与读取
+
+    def take_counters(self) -> tuple[int, int]:
+        """取出并清零 (队列峰值, 丢弃数)，用于按歌曲分段统计"""
+        with self.lock:
+            counters = (self.queue_high_water, self.dropped)
+            self.queue_high_water = 0
+            self.dropped = 0
+        return counters
+
+    # --- 写入（热路径） ---
+    def record_queued(self, event_us: int, due_ns: int, queued_ns: int) -> int:
+        """(调度线程) 记录一个入队的事件，返回其序号"""
+        seq = self.next_seq
+        self.next_seq = seq + 1
+        i = seq & self.mask
+        self.done_ns[i] = NOT_DONE
+        self.event_us[i] = event_us
+        self.due_ns[i] = due_ns
+        self.queued_ns[i] = queued_ns
+        self.seqs[i] = seq
+        return seq
+
+    def record_done(self, seq: int, done_ns: int):
+        """(执行线程) 记录按键调用完成的时刻"""
+        i = seq & self.mask
+        if self.seqs[i] == seq:
+            self.done_ns[i] = done_ns
+
+    def record_queue_depth(self, depth: int):
+        if depth > self.queue_high_water:
+            self.queue_high_water = depth
+
+    def record_dropped(self, count: int = 1):
+        with self.lock:
+            self.dropped += count
+
+    # --- 统计 ---
+    def stats(self, start_seq: int = 0, end_seq: int | None = None) -> dict:
+        """
+        统计序号区间 [start_seq, end_seq) 内已完成事件的延迟（微秒）。
+        lateness = 按键完成时刻 - 应执行时刻；dispatch = 入队时刻 - 应执行时刻。
+        """
+        if end_seq is None:
+            end_seq = self.next_seq
+        start_seq = max(start_seq, end_seq - self.capacity, 0)
+        with self.lock:
+            queue_high_water = self.queue_high_water
+            dropped = self.dropped
+
+        seqs = np.arange(start_seq, end_seq, dtype=np.int64)
+        idx = seqs & self.mask
+        done = self.done_ns[idx]
+        valid = (self.seqs[idx] == seqs) & (done != NOT_DONE)
+        done = done[valid]
+        due = self.due_ns[idx][valid]
+        queued = self.queued_ns[idx][valid]
+
+        result = {
+            "count": int(done.size),
+            "queue_high_water": int(queue_high_water),
+            "dropped": int(dropped),
+        }
+        if done.size == 0:
+            result.update(p50_us=0.0, p95_us=0.0, p99_us=0.0, max_us=0.0)
+            result.update(dispatch_p99_us=0.0)
+            return result
+
+        lateness_us = (done - due) / 1000
+        p50, p95, p99 = np.percentile(lateness_us, (50, 95, 99))
+        result.update(
+            p50_us=round(float(p50), 1),
+            p95_us=round(float(p95), 1),
+            p99_us=round(float(p99), 1),
+            max_us=round(float(lateness_us.max()), 1),
+            dispatch_p99_us=round(
+                float(np.percentile((queued - due) / 1000, 99)), 1
+            ),
+        )
+        return result
+
+
+def write_jitter_report(report_dir: Path, midi_path: str, report: dict) -> Path:
+    """将一首歌的时序报告写入 report_dir，返回文件路径"""
+    report_dir = Path(report_dir)
+    report_dir.mkdir(parents=True, exist_ok=True)
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    file_path = report_dir / f"{stamp}_{Path(midi_path).stem}.json"
+    with open(file_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    return file_path
@@ -0,0 +1,207 @@
+from typing import NamedTuple
+
+import numpy as np
+
+from midiplayer.core.player.timeline import EVENT_NOTE_OFF, EVENT_NOTE_ON, EventTimeline
+from midiplayer.core.player.type import CONTROL_KEY_MAP, MIDI_NOTE_MAP
+
+# 任务类型：单个音符沿用事件类型编码，同一时刻的多个音符合并为和弦任务
+TASK_CHORD = 2
+
+# 存储的按键名 -> 输出后端（pydirectinput）的按键名
+BACKEND_KEY_ALIASES = {
+    "cmd": "win",
+    "page_up": "pageup",
+    "page_down": "pagedown",
+}
+
+
+class KeyAction(NamedTuple):
+    """一个音符对应的按键动作：预先拆分好的控制键与普通键（已转换为后端按键名）"""
+
+    modifiers: tuple[str, ...]
+    keys: tuple[str, ...]
+
+
+class ChordAction(NamedTuple):
+    """
+    同一时刻（容差内）的一组音符事件：先抬起、再按下。
+    同一组内先按下后抬起的音符（零时值）作为点按，按下后立即抬起。
+    """
+
+    # 需要抬起的键
+    release_keys: tuple[str, ...]
+    # 按下后保持的音符
+    holds: tuple[KeyAction, ...]
+    # 按下后立即抬起的音符
+    taps: tuple[KeyAction, ...]
+
+
+def make_chord_action(tasks) -> ChordAction:
+    """把同一组内按时间顺序排列的 (事件类型, KeyAction) 合并为和弦"""
+    release_keys: list[str] = []
+    holds: list[KeyAction] = []
+    taps: list[KeyAction] = []
+    for code, action in tasks:
+        if code == EVENT_NOTE_ON:
+            holds.append(action)
+        elif action in holds:
+            holds.remove(action)
+            taps.append(action)
+        else:
+            # 不去重：每个音符结束各抬起一次，由引用计数决定是否真正抬起
+            release_keys.extend(action.keys)
+    return ChordAction(tuple(release_keys), tuple(holds), tuple(taps))
+
+
+class KeyActionTable:
+    """
+    音符 -> 按键动作的平铺查找表，在 prepare 时一次性编译。
+    tasks[code * 128 + note] 为预先构造好的 (事件类型, KeyAction) 任务元组，
+    未映射的音符为 None，热循环中只需做下标查找。
+    """
+
+    __slots__ = ("actions", "tasks", "press_and_up")
+
+    def __init__(
+        self,
+        actions: list[KeyAction | None],
+        press_and_up: bool,
+    ):
+        self.actions = actions
+        self.press_and_up = press_and_up
+        self.tasks: list[tuple[int, KeyAction] | None] = [None] * 256
+        for note, action in enumerate(actions):
+            if action is None:
+                continue
+            self.tasks[EVENT_NOTE_OFF * 128 + note] = (EVENT_NOTE_OFF, action)
+            self.tasks[EVENT_NOTE_ON * 128 + note] = (EVENT_NOTE_ON, action)
+
+    @staticmethod
+    def empty() -> "KeyActionTable":
+        return KeyActionTable([None] * 128, False)
+
+
+def _resolve_keys(value) -> KeyAction | None:
+    """把配置中的按键值（str 或 list[str]）解析为 KeyAction"""
+    if isinstance(value, str):
+        raw_keys = [value]
+    elif isinstance(value, list):
+        raw_keys = [k for k in value if isinstance(k, str)]
+    else:
+        return None
+
+    modifiers = []
+    keys = []
+    for k in raw_keys:
+        target = modifiers if k in CONTROL_KEY_MAP else keys
+        resolved = BACKEND_KEY_ALIASES.get(k, k)
+        if resolved not in target:
+            target.append(resolved)
+
+    if not modifiers and not keys:
+        return None
+    return KeyAction(tuple(modifiers), tuple(keys))
+
+
+def build_key_action_table(note_to_key: dict, press_and_up: bool) -> KeyActionTable:
+    """根据拟合后的 音符名 -> 按键 映射，编译 128 个音符的按键动作表"""
+    actions: list[KeyAction | None] = [None] * 128
+    for note_name, value in note_to_key.items():
+        midi = MIDI_NOTE_MAP.get_midi_by_note(note_name)
+        if midi is None:
+            continue
+        actions[midi] = _resolve_keys(value)
+    return KeyActionTable(actions, press_and_up)
+
+
+def chord_group_starts(times: np.ndarray, tolerance_us: int) -> np.ndarray:
+    """
+    把升序时间分组：每组从第一个事件开始，包含其后 tolerance_us 以内的事件。
+    以组首为锚点，连续的琶音不会因逐个相邻而被串成一个和弦。
+    """
+    n = len(times)
+    if n == 0:
+        return np.empty(0, dtype=np.int64)
+    # 相邻间隔超过容差处必然分组；只有跨度超过容差的连续段才需要逐个锚定
+    gaps = np.flatnonzero(np.diff(times) > tolerance_us) + 1
+    run_starts = np.concatenate(([0], gaps)).astype(np.int64)
+    if tolerance_us <= 0:
+        return run_starts
+    run_ends = np.append(run_starts[1:], n)
+    long_runs = np.flatnonzero(times[run_ends - 1] - times[run_starts] > tolerance_us)
+    if long_runs.size == 0:
+        return run_starts
+
+    extra = []
+    for r in long_runs.tolist():
+        start, end = int(run_starts[r]), int(run_ends[r])
+        anchor = times[start]
+        for i in range(start + 1, end):
+            if times[i] - anchor > tolerance_us:
+                extra.append(i)
+                anchor = times[i]
+    return np.union1d(run_starts, np.array(extra, dtype=np.int64))
+
+
+def compile_event_tasks(
+    table: KeyActionTable,
+    events: EventTimeline,
+    active_track_idx_set: set[int],
+    chord_tolerance_us: int = 0,
+    skip: np.ndarray | None = None,
+) -> list[tuple | None]:
+    """
+    为时间线上的每个事件预先解析出任务（未激活音轨或未映射音符为 None），
+    调度线程按事件下标直接取用，无需再做任何查找。
+    时间相同（或在 chord_tolerance_us 以内）的多个任务合并为一个和弦任务，
+    放在该组最后一个事件的位置（定位到组内任意位置都不会漏掉和弦），其余置为 None。
+    skip 为被精简的事件掩码（见 note_thinning），这些事件同样没有任务。
+    """
+    if len(events) == 0:
+        return []
+
+    track_count = int(events.tracks.max()) + 1
+    track_mask = np.zeros(track_count, dtype=bool)
+    for t in active_track_idx_set:
+        if t < track_count:
+            track_mask[t] = True
+
+    task_ids = events.codes.astype(np.int32) * 128 + events.notes
+    # 非激活音轨指向一个恒为 None 的槽位
+    none_slot = len(table.tasks)
+    task_ids[~track_mask[events.tracks]] = none_slot
+    if skip is not None:
+        task_ids[skip] = none_slot
+    lookup = table.tasks + [None]
+
+    # 只在有任务的事件之间分组
+    has_task = np.array([t is not None for t in lookup], dtype=bool)
+    idx = np.flatnonzero(has_task[task_ids])
+    if idx.size >= 2:
+        starts = chord_group_starts(events.times[idx], chord_tolerance_us)
+        ends = np.append(starts[1:], idx.size)
+        multi = np.flatnonzero(ends - starts > 1)
+        if multi.size:
+            present_ids = task_ids[idx].tolist()
+            # 相同的和弦反复出现，按组内任务编号复用同一个和弦槽位
+            chord_slots: dict[tuple, int] = {}
+            slots = []
+            for s, e in zip(starts[multi].tolist(), ends[multi].tolist()):
+                key = tuple(present_ids[s:e])
+                slot = chord_slots.get(key)
+                if slot is None:
+                    slot = len(lookup)
+                    chord_slots[key] = slot
+                    lookup.append(
+                        (TASK_CHORD, make_chord_action([lookup[i] for i in key]))
+                    )
+                slots.append(slot)
+            # 组内除最后一个事件外都置空，最后一个事件指向和弦
+            is_chord = np.zeros(idx.size, dtype=bool)
+            group_of = np.repeat(np.arange(len(starts)), ends - starts)
+            is_chord[np.isin(group_of, multi)] = True
+            task_ids[idx[is_chord]] = none_slot
+            task_ids[idx[ends[multi] - 1]] = slots
+
+    return [lookup[i] for i in task_ids.tolist()]
@@ -0,0 +1,175 @@
+# 按键输出后端（可在设置中切换，也可注入）
+# 执行线程把一个任务展开成按顺序执行的按键序列 batch = ((按键, 是否按下), ...)，
+# 通过 send(batch) 一次交给后端：SendInput 后端把整组和弦合并为一次系统调用。
+# 真实输出依赖仅在 Windows 上可用的模块，这里延迟导入，使播放器在其他平台也能加载。
+
+from abc import ABC, abstractmethod
+
+from loguru import logger
+
+# 需要扩展键标志的方向键（与 pydirectinput 的处理一致）
+ARROW_KEYS = frozenset(("up", "left", "down", "right"))
+# 方向键在 NumLock 打开时需要额外发送的前缀扫描码
+EXTENDED_PREFIX_SCANCODE = 0xE0
+VK_NUMLOCK = 0x90
+INPUT_KEYBOARD = 1
+
+
+class KeyOutput(ABC):
+    """按键输出后端接口"""
+
+    # 设置中保存的后端名
+    name = ""
+
+    @abstractmethod
+    def send(self, batch: tuple[tuple[str, bool], ...]):
+        """按顺序发送一组按键事件 ((按键, 是否按下), ...)"""
+
+    def key_down(self, key: str):
+        self.send(((key, True),))
+
+    def key_up(self, key: str):
+        self.send(((key, False),))
+
+
+class SendInputOutput(KeyOutput):
+    """
+    Windows SendInput 批量输出：一组按键合并为一个 INPUT 数组一次注入，
+    同一和弦内的按键不会被其他输入打断。
+    扫描码表与结构体复用 pydirectinput 的定义，按键行为与其保持一致。
+    """
+
+    name = "sendinput"
+
+    def __init__(self):
+        import ctypes
+
+        import pydirectinput
+
+        self._pdi = pydirectinput
+        self._send_input = ctypes.windll.user32.SendInput
+        self._get_key_state = ctypes.windll.user32.GetKeyState
+        self._input_size = ctypes.sizeof(pydirectinput.Input)
+        # batch -> (INPUT 数组, 数量, NumLock 打开时的数组或 None, 数量)
+        # batch 来自预编译的按键动作，种类有限，构造一次后反复使用
+        self._cache: dict[tuple, tuple] = {}
+
+    def _make_input(self, scan_code: int, flags: int):
+        pdi = self._pdi
+        ii_ = pdi.Input_I()
+        ii_.ki = pdi.KeyBdInput(0, scan_code, flags, 0, None)
+        return pdi.Input(INPUT_KEYBOARD, ii_)
+
+    def _build(self, batch, numlock: bool):
+        pdi = self._pdi
+        inputs = []
+        for key, down in batch:
+            scan_code = pdi.KEYBOARD_MAPPING.get(key)
+            if scan_code is None:
+                continue
+            flags = pdi.KEYEVENTF_SCANCODE
+            if not down:
+                flags |= pdi.KEYEVENTF_KEYUP
+            if key in ARROW_KEYS:
+                flags |= pdi.KEYEVENTF_EXTENDEDKEY
+                if down and numlock:
+                    inputs.append(
+                        self._make_input(
+                            EXTENDED_PREFIX_SCANCODE, pdi.KEYEVENTF_SCANCODE
+                        )
+                    )
+            inputs.append(self._make_input(scan_code, flags))
+        return (pdi.Input * len(inputs))(*inputs), len(inputs)
+
+    def _compile(self, batch) -> tuple:
+        array, count = self._build(batch, False)
+        if any(down and key in ARROW_KEYS for key, down in batch):
+            numlock_array, numlock_count = self._build(batch, True)
+        else:
+            numlock_array, numlock_count = None, 0
+        entry = (array, count, numlock_array, numlock_count)
+        self._cache[batch] = entry
+        return entry
+
+    def send(self, batch):
+        entry = self._cache.get(batch)
+        if entry is None:
+            entry = self._compile(batch)
+        array, count, numlock_array, numlock_count = entry
+        if numlock_array is not None and self._get_key_state(VK_NUMLOCK) & 1:
+            array, count = numlock_array, numlock_count
+        if count == 0:
+            return
+        inserted = self._send_input(count, array, self._input_size)
+        if inserted != count:
+            # 被 UIPI 拦截等情况，交给执行线程计入丢弃
+            raise OSError(f"SendInput 仅注入了 {inserted}/{count} 个按键事件")
+
+
+class PyDirectInputOutput(KeyOutput):
+    """逐键调用 pydirectinput（按键间隔已编入时间线，不再使用 PAUSE 睡眠）"""
+
+    name = "pydirectinput"
+
+    def __init__(self):
+        import pydirectinput
+
+        pydirectinput.PAUSE = 0
+        self._key_down = pydirectinput.keyDown
+        self._key_up = pydirectinput.keyUp
+
+    def send(self, batch):
+        key_down = self._key_down
+        key_up = self._key_up
+        for key, down in batch:
+            key_down(key) if down else key_up(key)
+
+
+class NullOutput(KeyOutput):
+    """不发送任何按键（只预览播放，或在没有可用后端的平台上运行）"""
+
+    name = "null"
+
+    def send(self, batch):
+        pass
+
+
+class RecordingOutput(KeyOutput):
+    """不发送任何按键，只记录 (时刻ns, 是否按下, 按键)，用于基准测试与校验"""
+
+    name = "recording"
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.records: list[tuple[int, bool, str]] = []
+        # send 调用次数（即注入的批次数）
+        self.batches = 0
+
+    def send(self, batch):
+        now = self.clock.now_ns()
+        self.batches += 1
+        self.records.extend((now, down, key) for key, down in batch)
+
+
+# 设置中可选的后端
+OUTPUT_BACKENDS = {
+    SendInputOutput.name: SendInputOutput,
+    PyDirectInputOutput.name: PyDirectInputOutput,
+    NullOutput.name: NullOutput,
+}
+
+
+def create_key_output(name: str) -> KeyOutput:
+    """
+    按名称创建输出后端。未知的名称（过期的配置、测试用后端名）以及
+    不可用的后端（非 Windows、缺少依赖）都退回空输出，绝不误发真实按键
+    """
+    backend = OUTPUT_BACKENDS.get(name)
+    if backend is None:
+        logger.warning(f"未知的按键输出后端 {name}，改用空输出")
+        return NullOutput()
+    try:
+        return backend()
+    except Exception as e:
+        logger.warning(f"按键输出后端 {name} 不可用，改用空输出: {e}")
+        return NullOutput()
@@ -0,0 +1,311 @@
+# 派发时间线：把每个事件的任务展开为带时间偏移的按键步骤
+# 按键延迟不再由执行线程逐键睡眠（pydirectinput.PAUSE），而是编译为时间线上的偏移：
+#   控制键按下 -> +延迟 普通键按下 -> +延迟 控制键抬起；点按模式在按下后 +延迟 抬起。
+# 控制键尽量提前一个延迟按下，使带控制键的音符也落在乐谱时刻上。
+# 调度线程按时间派发步骤，执行线程只负责发送，从不睡眠；和弦内互不相关的键也不互相等待。
+# 多个音符可能映射到同一个键：编译的最后一步按键引用计数，去掉冗余的按下 / 抬起，
+# 只在键仍被其他音符按住时插入“抬起 -> 按下”重新触发。
+
+from typing import NamedTuple
+
+import numpy as np
+from loguru import logger
+
+from midiplayer.core.player.key_actions import TASK_CHORD, ChordAction, KeyAction
+from midiplayer.core.player.timeline import EVENT_NOTE_ON
+
+
+class KeyStep(NamedTuple):
+    """同一时刻按顺序发送的一组按键操作，以及执行后对按键状态的影响"""
+
+    # ((按键, 是否按下), ...)
+    ops: tuple[tuple[str, bool], ...]
+    # 本步骤中抬起、且本步骤内没有先按下的键：必须处于按下状态才发送
+    need_held: frozenset[str]
+    # 执行后处于按下 / 抬起状态的键
+    held: tuple[str, ...]
+    released: tuple[str, ...]
+
+
+def make_key_step(ops: tuple[tuple[str, bool], ...]) -> KeyStep:
+    need_held = set()
+    pressed_here = set()
+    state: dict[str, bool] = {}
+    for key, down in ops:
+        if down:
+            pressed_here.add(key)
+        elif key not in pressed_here:
+            need_held.add(key)
+        state[key] = down
+    return KeyStep(
+        ops=ops,
+        need_held=frozenset(need_held),
+        held=tuple(k for k, down in state.items() if down),
+        released=tuple(k for k, down in state.items() if not down),
+    )
+
+
+def filter_step_ops(ops, pressed_keys: set[str]) -> tuple[tuple[str, bool], ...]:
+    """去掉抬起未按下按键的操作（例如跳转后按键已被统一释放）"""
+    pressed = set(pressed_keys)
+    result = []
+    for key, down in ops:
+        if down:
+            pressed.add(key)
+        elif key in pressed:
+            pressed.discard(key)
+        else:
+            continue
+        result.append((key, down))
+    return tuple(result)
+
+
+# 按键状态快照间隔（步骤数）：跳转时最多重放这么多步骤即可还原按住的键
+CHECKPOINT_INTERVAL = 256
+
+
+class DispatchTimeline:
+    """
+    派发时间线：times 为 int64 升序派发时刻（微秒），steps 为对应的 KeyStep。
+    调度线程按下标推进，与 EventTimeline 一样用二分定位。
+    checkpoints[j] 为执行第 j * CHECKPOINT_INTERVAL 个步骤之前按住的键。
+    """
+
+    __slots__ = ("times", "steps", "checkpoints")
+
+    def __init__(
+        self,
+        times: np.ndarray,
+        steps: list[KeyStep],
+        checkpoints: list[tuple[str, ...]] | None = None,
+    ):
+        self.times = times
+        self.steps = steps
+        self.checkpoints = checkpoints if checkpoints is not None else [()]
+
+    def __len__(self) -> int:
+        return len(self.steps)
+
+    def find_index(self, time_us: int) -> int:
+        """二分查找第一个派发时刻 >= time_us 的步骤"""
+        return int(np.searchsorted(self.times, time_us, side="left"))
+
+    def find_due_end(self, time_us: int, start: int = 0) -> int:
+        """二分查找第一个派发时刻 > time_us 的步骤（即 [start, end) 均已到期）"""
+        return start + int(
+            np.searchsorted(self.times[start:], time_us, side="right")
+        )
+
+    def held_keys_at(self, index: int) -> tuple[str, ...]:
+        """执行第 index 个步骤之前按住的键：从最近的快照重放至多一个间隔的步骤"""
+        base = min(index // CHECKPOINT_INTERVAL, len(self.checkpoints) - 1)
+        held = set(self.checkpoints[base])
+        for step in self.steps[base * CHECKPOINT_INTERVAL : index]:
+            held.difference_update(step.released)
+            held.update(step.held)
+        return tuple(sorted(held))
+
+
+def _split_task(task, press_and_up: bool):
+    """任务 -> (抬起的键, 保持的音符, 点按的音符)"""
+    code, action = task
+    if code == TASK_CHORD:
+        chord: ChordAction = action
+        release_keys, holds, taps = chord.release_keys, chord.holds, chord.taps
+    elif code == EVENT_NOTE_ON:
+        release_keys, holds, taps = (), (action,), ()
+    else:
+        release_keys, holds, taps = action.keys, (), ()
+    if press_and_up:
+        # 点按模式忽略音符结束事件，所有音符按下后按延迟抬起
+        return (), (), holds + taps
+    return release_keys, holds, taps
+
+
+def _modifier_groups(actions) -> list[tuple[tuple[str, ...], list[KeyAction]]]:
+    """按控制键组合分组（保持出现顺序）"""
+    groups: dict[tuple[str, ...], list[KeyAction]] = {}
+    for action in actions:
+        groups.setdefault(action.modifiers, []).append(action)
+    return list(groups.items())
+
+
+def _immediate_ops(task, press_and_up: bool) -> tuple[tuple[str, bool], ...]:
+    """无按键延迟时，一个任务的全部操作在同一时刻按顺序发送"""
+    release_keys, holds, taps = _split_task(task, press_and_up)
+    ops = [(k, False) for k in release_keys]
+    pressed = holds + taps
+    ops += [(k, True) for a in pressed if not a.modifiers for k in a.keys]
+    for mods, actions in _modifier_groups(a for a in pressed if a.modifiers):
+        ops += [(m, True) for m in mods]
+        ops += [(k, True) for a in actions for k in a.keys]
+        ops += [(m, False) for m in reversed(mods)]
+    ops += [(k, False) for a in taps for k in a.keys]
+    return tuple(ops)
+
+
+def _reference_count_keys(
+    timed_ops: list[tuple[int, tuple[tuple[str, bool], ...]]],
+) -> tuple[list, list[tuple[str, ...]], int, int]:
+    """
+    按时间顺序对每个键的按下次数计数：
+    - 键已被其他音符按住时再次按下：同一时刻按下的视为重复，直接去掉；
+      否则插入抬起再按下（重新触发）
+    - 抬起只在最后一个按住它的音符结束时发送，没有按住的键不发送抬起
+    同时每隔 CHECKPOINT_INTERVAL 个步骤记录一次按住的键（即计数不为 0 的键）。
+    返回 (新的操作序列, 按键快照, 去掉的操作数, 重新触发次数)
+    """
+    counts: dict[str, int] = {}
+    # 每个键最近一次按下的时刻
+    pressed_at: dict[str, int] = {}
+    result = []
+    checkpoints: list[tuple[str, ...]] = []
+    removed = 0
+    retriggered = 0
+    for at, ops in timed_ops:
+        if len(result) % CHECKPOINT_INTERVAL == 0:
+            # 被整体去掉的步骤不改变实际按住的键，快照在真正输出步骤时记录
+            snapshot = tuple(sorted(k for k, c in counts.items() if c))
+        out = []
+        changed = False
+        for op in ops:
+            key, down = op
+            count = counts.get(key, 0)
+            if down:
+                counts[key] = count + 1
+                if count:
+                    changed = True
+                    if pressed_at[key] == at:
+                        removed += 1
+                        continue
+                    out.append((key, False))
+                    retriggered += 1
+                pressed_at[key] = at
+            elif count != 1:
+                changed = True
+                removed += 1
+                if count:
+                    counts[key] = count - 1
+                continue
+            else:
+                counts[key] = 0
+            out.append(op)
+        if changed:
+            ops = tuple(out)
+        if ops:
+            if len(result) % CHECKPOINT_INTERVAL == 0:
+                checkpoints.append(snapshot)
+            result.append((at, ops))
+    return result, checkpoints, removed, retriggered
+
+
+def compile_dispatch_timeline(
+    event_tasks: list,
+    times: np.ndarray,
+    press_delay_us: int,
+    press_and_up: bool,
+) -> DispatchTimeline:
+    """把逐事件的任务展开为派发时间线"""
+    idx = [i for i, task in enumerate(event_tasks) if task is not None]
+    times_list = times.tolist()
+
+    if press_delay_us <= 0:
+        # 每个任务的全部操作在事件时刻发送，相同的任务复用同一组操作
+        ops_cache: dict[int, tuple] = {}
+        timed_ops = []
+        for i in idx:
+            task = event_tasks[i]
+            ops = ops_cache.get(id(task))
+            if ops is None:
+                ops = _immediate_ops(task, press_and_up)
+                ops_cache[id(task)] = ops
+            timed_ops.append((times_list[i], ops))
+    else:
+        timed_ops = _delayed_ops(
+            event_tasks, idx, times_list, int(press_delay_us), press_and_up
+        )
+
+    timed_ops, checkpoints, removed, retriggered = _reference_count_keys(timed_ops)
+    if removed or retriggered:
+        logger.debug(
+            f"按键引用计数: 去掉冗余操作 {removed} 个, 重新触发 {retriggered} 次"
+        )
+
+    step_cache: dict[tuple, KeyStep] = {}
+    steps = []
+    for _, ops in timed_ops:
+        step = step_cache.get(ops)
+        if step is None:
+            step = make_key_step(ops)
+            step_cache[ops] = step
+        steps.append(step)
+    return DispatchTimeline(
+        np.array([at for at, _ in timed_ops], dtype=np.int64),
+        steps,
+        checkpoints or [()],
+    )
+
+
+def _delayed_ops(
+    event_tasks: list,
+    idx: list[int],
+    times_list: list[int],
+    d: int,
+    press_and_up: bool,
+) -> list[tuple[int, tuple[tuple[str, bool], ...]]]:
+    """按键延迟不为 0 时，把每个任务的操作展开到各自的时间偏移上"""
+    ops_at: dict[int, list] = {}
+    # 每个键最近一次按下的时刻，抬起不得早于按下
+    pressed_at: dict[str, int] = {}
+    # 尚未发送的点按抬起 {键: 时刻}，同键再次按下时提前到按下之前
+    tap_up_at: dict[str, int] = {}
+    # 控制键窗口的结束时刻：控制键组合依次进行，普通键不在窗口内按下
+    modifier_free_at = -1
+    # 最近一次按下普通键的时刻：控制键窗口不能提前到它之前
+    plain_pressed_at = -1
+
+    def add(at: int, op):
+        ops_at.setdefault(at, []).append(op)
+
+    def press(at: int, key: str):
+        up_at = tap_up_at.pop(key, None)
+        if up_at is not None and up_at > at:
+            ops_at[up_at].remove((key, False))
+            add(at, (key, False))
+        add(at, (key, True))
+        pressed_at[key] = at
+
+    for i in idx:
+        t = times_list[i]
+        release_keys, holds, taps = _split_task(event_tasks[i], press_and_up)
+        for key in release_keys:
+            tap_up_at.pop(key, None)
+            add(max(t, pressed_at.get(key, t)), (key, False))
+
+        pressed = holds + taps
+        plain_at = max(t, modifier_free_at)
+        for action in pressed:
+            if not action.modifiers:
+                for key in action.keys:
+                    press(plain_at, key)
+                plain_pressed_at = plain_at
+
+        at = max(t - d, modifier_free_at, plain_pressed_at)
+        for mods, actions in _modifier_groups(a for a in pressed if a.modifiers):
+            for m in mods:
+                add(at, (m, True))
+            for action in actions:
+                for key in action.keys:
+                    press(at + d, key)
+            for m in reversed(mods):
+                add(at + 2 * d, (m, False))
+            at += 2 * d
+            modifier_free_at = at
+
+        for action in taps:
+            for key in action.keys:
+                up_at = pressed_at[key] + d
+                add(up_at, (key, False))
+                tap_up_at[key] = up_at
+
+    return [(at, tuple(ops_at[at])) for at in sorted(ops_at) if ops_at[at]]
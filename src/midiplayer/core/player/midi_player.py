@@ -1,22 +1,46 @@
-import queue
 import threading
-import time
 from enum import Enum
-from typing import List, Set  # 用于类型提示
 
-import mido
-import pydirectinput
 from loguru import logger
 from PySide6 import QtCore
 
-from midiplayer.core.player.note_fitting import NoteFitting
-from midiplayer.core.player.type import (
-    CONTROL_KEY_MAP,
-    KEY_MAP,
-    MIDI_NOTE_MAP,
-    MdPlaybackParam,
+from midiplayer.core.player.clock import (
+    PositionSnapshot,
+    SystemClock,
+    playback_time_us,
+    real_time_ns,
+)
+from midiplayer.core.player.engine_process import EngineProcess
+from midiplayer.core.player.jitter_stats import JitterRecorder, write_jitter_report
+from midiplayer.core.player.key_output import KeyOutput, NullOutput, create_key_output
+from midiplayer.core.player.note_roll import NoteRoll
+from midiplayer.core.player.output_channel import OutputChannel
+from midiplayer.core.player.output_latency import (
+    REFINE_MIN_EVENTS,
+    LatencyCalibrationTask,
+    latency_offset_us,
+    refined_offset_us,
+    with_latency_offset,
+)
+from midiplayer.core.player.playback_program import (
+    CompileOptions,
+    OutputChannelParam,
+    PlaybackProgram,
+    same_playback_param,
+)
+from midiplayer.core.player.prepare_task import PrepareTask
+from midiplayer.core.player.song_cache import SongCache
+from midiplayer.core.player.type import MdPlaybackParam
+from midiplayer.core.player.wait_strategy import (
+    RESPONSIVE_LOOP_TIME_US,
+    WaitStrategy,
+    calibrate_wait_overshoot,
+    is_profile_valid,
+    machine_key,
 )
 from midiplayer.core.utils.config import cfg
+from midiplayer.core.utils.resource_governor import governor
+from midiplayer.core.utils.utils import Utils
 
 
 class QMidiPlayer(QtCore.QObject):
@@ -29,25 +53,81 @@ class QMidiPlayer(QtCore.QObject):
     signal_play_position = QtCore.Signal(int)
     signal_play_duration = QtCore.Signal(int)
     signal_media_done = QtCore.Signal(bool)
-    signal_correct_info_changed = QtCore.Signal(float, int)
-
-    def __init__(self):
+    # 命中率、升降调数、精简的音符数
+    signal_correct_info_changed = QtCore.Signal(float, int, int)
+    # 歌曲准备进度 0-100
+    signal_prepare_progress = QtCore.Signal(int)
+    # 歌曲准备失败 (错误信息)
+    signal_prepare_failed = QtCore.Signal(str)
+    # 无缝切换到下一首 (midi 路径)
+    signal_song_advanced = QtCore.Signal(str)
+    # 调度线程完成本机等待误差校准 (profile)
+    signal_timing_profile_calibrated = QtCore.Signal(dict)
+    # 一首歌播放结束 (midi 路径, 该曲的时序记录区间与计数)
+    signal_song_timing_done = QtCore.Signal(str, dict)
+
+    # 当前歌曲准备任务的线程池优先级（高于预加载）
+    PREPARE_PRIORITY = 1
+
+    def __init__(self, clock=None, output=None, play_delay_sec=None):
+        """
+        clock: 时钟（默认真实单调时钟），output: 按键输出（默认按设置创建），
+        play_delay_sec: 开始播放前的延迟（默认按设置）。
+        基准测试中注入模拟时钟与记录输出，即可在无界面的 Linux 上运行。
+        """
         super().__init__()
-
-        # config
-        self.midi = None
-        self.music_track_index = None
-        self.control_track_index = None
-        self.note_to_key = {}
-        self.active_track_idx_set = None
-
-        self.task_queue = queue.Queue()
-        self.events = []  # (绝对微秒, 事件类型, 音符)
-
-        self.ticks_per_beat = None
+        self.clock = clock if clock is not None else SystemClock()
+        self._play_delay_sec = play_delay_sec
+        # 注入的输出不随设置切换
+        self._output_injected = output is not None
+        # 主输出通道：任务环、执行线程、按键状态与时序记录（附加通道共用其任务环）
+        self.main_channel = OutputChannel(
+            "main",
+            (
+                output
+                if output is not None
+                else create_key_output(cfg.get(cfg.player_output_backend))
+            ),
+            self.clock,
+        )
+        # 附加输出通道（整体替换元组，调度线程每轮读取一次）及其设置
+        self.extra_channels: tuple[OutputChannel, ...] = ()
+        self._channel_params: tuple[OutputChannelParam, ...] = ()
+        self._channel_outputs_injected = False
+        # 独立进程的播放引擎：运行时由它派发按键，本进程只维护状态与锚点
+        self.engine: EngineProcess | None = None
+
+        # 当前播放程序（不可变），调度线程只读，整体替换指针完成热切换
+        self.program: PlaybackProgram | None = None
+        self.playback_param: MdPlaybackParam | None = None
+
+        # 按键时序记录（主通道）：当前歌曲在记录中的起始序号
+        self._song_start_seq = 0
+
+        # 编译结果的磁盘缓存
+        self.song_cache = SongCache(
+            Utils.user_path("song_cache"), cfg.get(cfg.player_song_cache_size_mb)
+        )
         self.total_duration_us = 0
         self.total_events = 0
 
+        # 后台准备任务：请求 id 递增，旧请求的结果直接丢弃
+        self.prepare_pool = QtCore.QThreadPool(self)
+        self.prepare_pool.setMaxThreadCount(2)
+        self._prepare_request_id = 0
+        self._preparing = False
+        # 准备期间用户点击播放，准备完成后自动开始
+        self._play_when_ready = False
+
+        # 预加载：接下来的歌曲参数、已就绪的程序、进行中的请求 {路径: (请求id, 参数)}
+        self._upcoming: list[MdPlaybackParam] = []
+        self._prefetched: dict[str, PlaybackProgram] = {}
+        self._prefetch_pending: dict[str, tuple[int, MdPlaybackParam]] = {}
+        self._prefetch_request_id = 0
+        self._prefetch_live_ids = frozenset()
+        # 已就绪的下一首，播放结束时调度线程直接切换
+        self.next_program: PlaybackProgram | None = None
+
         # 播放状态
         self.state = QMidiPlayer.PlayState.IDLE  # 'idle', 'playing', 'paused'
         # 用于延时
@@ -55,253 +135,556 @@ class QMidiPlayer(QtCore.QObject):
 
         # 线程控制
         self.running = True
-        # 锁1：保护时钟和调度
+        # 保护时钟和调度（按键状态由各输出通道自己的锁保护）
         self.clock_lock = threading.Lock()
-        # 锁2：保护按键状态
-        self.keys_lock = threading.Lock()
         self.wake_up_event = threading.Event()
         self.play_delay_event = threading.Event()
         self.scheduler_thread = None
-        self.executor_thread = None
 
         # 播放时钟（虚拟时钟）
         self.current_playback_time_us = 0
-        self.last_real_time_ns = 0
         self.playback_speed = 1.0
+        # 时钟锚点：播放时刻由 (真实时刻, 播放时刻, 倍速) 直接算出，不逐次累加
+        # anchor_real_ns 为 0 表示未锚定，调度线程下一轮以当前播放时刻重新锚定
+        self.anchor_real_ns = 0
+        self.anchor_playback_us = 0
 
         self.event_index = 0
-        self.pressed_keys: Set[str] = set()
 
-        # 引入混合调度阈值
+        # 混合等待策略（自旋窗口按本机校准结果与 CPU 预算自适应），由调度线程创建
+        self.wait_strategy: WaitStrategy | None = None
+
+        # 发布给界面的播放位置快照（只在持有 clock_lock 时替换，读取无需加锁）
+        self.position = PositionSnapshot(0, 0, 1.0, 0)
+
+        for item in (
+            cfg.player_play_disable_note_fitting,
+            cfg.player_play_key_press_and_up,
+            cfg.player_chord_tolerance_us,
+            cfg.player_play_press_delay,
+            cfg.player_max_polyphony,
+            cfg.player_max_keys_per_second,
+        ):
+            item.valueChanged.connect(self._on_compile_options_change)
+        cfg.player_song_cache_size_mb.valueChanged.connect(
+            self.song_cache.set_max_size_mb
+        )
+        cfg.player_spin_cpu_budget.valueChanged.connect(self._on_cpu_budget_change)
+        cfg.player_output_backend.valueChanged.connect(self._on_output_backend_change)
+        cfg.player_process_engine.valueChanged.connect(self._on_process_engine_change)
+        self.signal_timing_profile_calibrated.connect(
+            self._on_timing_profile_calibrated
+        )
+        self.signal_song_timing_done.connect(self._on_song_timing_done)
+        # 播放优先模式：播放期间压制后台工作（注入输出的基准测试播放器不参与）
+        self.signal_state.connect(self._on_state_for_governor)
+
+        # 输出延迟补偿（各通道的 output_latency_us）：调度线程提前这么久派发步骤
+        self._latency_calibrating = False
+        cfg.player_output_latency.valueChanged.connect(self._refresh_output_latency)
+        cfg.player_latency_compensation.valueChanged.connect(
+            self._refresh_output_latency
+        )
+        self._refresh_output_latency()
 
-        # 自旋等待阈值（微秒）：当距下个事件小于此值，线程自旋以保证最高精度
-        self.SPIN_WAIT_THRESHOLD_US = 500
-        # 响应式轮询时间（微秒）：当距下个事件较远时，以此间隔苏醒以检查UI响应
-        self.RESPONSIVE_LOOP_TIME_US = 20000
+    def _play_delay(self) -> float:
+        """开始播放前（以及曲间）的延迟秒数"""
+        if self._play_delay_sec is not None:
+            return self._play_delay_sec
+        return cfg.get(cfg.player_play_delay_time)
 
-        # 同步当前播放时间
-        self.position_timer = QtCore.QTimer(self)
-        self.position_timer.setInterval(1000)  # 1000ms = 1s
-        self.position_timer.timeout.connect(self._on_position_update)
+    def _on_state_for_governor(self, state):
+        # 调度线程发出的状态经队列连接到主线程，资源调控只在主线程切换
+        if self._output_injected:
+            return
+        governor.set_playing(state == QMidiPlayer.PlayState.PLAYING)
 
-    def _on_position_update(self):
+    def _on_cpu_budget_change(self, value):
+        # 只替换一个浮点数，调度线程下一轮即生效
+        if self.wait_strategy is not None:
+            self.wait_strategy.set_cpu_budget(value)
         with self.clock_lock:
-            pos_ms = int(self.current_playback_time_us // 1000)
-            logger.debug(
-                f"update position  current_placback_time : {self.current_playback_time_us}"
-            )
-        self.signal_play_position.emit(pos_ms)
-
-    def _prepare_track_and_events(self):
-        """
-        分离控制和实际演奏音符的index，获取所有事件
-        """
-        music_track_index = []
-        control_track_index = []
-        raw_events = []  # (tick, type, note, trackIdx)
-        tempo_events = []  # (tick, tempo)
-
-        for i, track in enumerate(self.midi.tracks):
-            control_track = True
-            current_tick = 0
-
-            for msg in track:
-                current_tick += msg.time
-                if msg.type in ("note_on", "note_off"):
-                    event_type = (
-                        "note_off"
-                        if (msg.type == "note_on" and msg.velocity == 0)
-                        else msg.type
-                    )
-                    raw_events.append((current_tick, event_type, msg.note, i))
-                    control_track = False
-                elif msg.type == "set_tempo":
-                    tempo_events.append((current_tick, msg.tempo))
-
-            if control_track:
-                control_track_index.append(i)
-            else:
-                music_track_index.append(i)
-
-        for track in self.midi.tracks:
-            current_tick = 0
-            for msg in track:
-                current_tick += msg.time
+            if self.engine is not None:
+                self.engine.set_cpu_budget(value)
+
+    def _on_timing_profile_calibrated(self, profile: dict):
+        cfg.set(cfg.player_timing_profile, profile)
+
+    def _compile_options(self) -> CompileOptions:
+        return CompileOptions(
+            disable_note_fitting=cfg.get(cfg.player_play_disable_note_fitting),
+            key_press_and_up=cfg.get(cfg.player_play_key_press_and_up),
+            chord_tolerance_us=cfg.get(cfg.player_chord_tolerance_us),
+            press_delay_us=cfg.get(cfg.player_play_press_delay) * 1000,
+            max_polyphony=cfg.get(cfg.player_max_polyphony),
+            max_keys_per_second=cfg.get(cfg.player_max_keys_per_second),
+            channels=self._channel_params,
+        )
 
-        self.music_track_index = music_track_index
-        self.control_track_index = control_track_index
-        return raw_events, tempo_events
+    def _on_compile_options_change(self, _):
+        if self.playback_param is not None:
+            self.handle_playback_param_change(self.playback_param)
+        # 预加载的程序是按旧配置编译的，重新提交
+        self.set_upcoming(self._upcoming)
+
+    def _is_prepare_cancelled(self, request_id: int) -> bool:
+        return request_id != self._prepare_request_id
+
+    def _start_prepare_task(self, md_playback_param: MdPlaybackParam, song=None):
+        """提交后台准备任务，并使之前未完成的请求过期"""
+        self._prepare_request_id += 1
+        task = PrepareTask(
+            request_id=self._prepare_request_id,
+            md_playback_param=md_playback_param,
+            song_cache=self.song_cache,
+            options=self._compile_options(),
+            is_cancelled=self._is_prepare_cancelled,
+            song=song,
+        )
+        task.signals.progress.connect(self._on_prepare_progress)
+        task.signals.finished.connect(self._on_prepare_finished)
+        task.signals.failed.connect(self._on_prepare_failed)
+        # 当前歌曲的准备优先于预加载
+        self.prepare_pool.start(task, self.PREPARE_PRIORITY)
 
-    def _prepare_key_mapping_and_active_tracks(
+    def _find_ready_program(
         self, md_playback_param: MdPlaybackParam
-    ):
-        # 处理按键调整 以及 音轨处理
-        self.active_track_idx_set = set(
-            self.control_track_index
-            + (
-                self.music_track_index
-                if md_playback_param.active_track_idxes is None
-                else [
-                    self.music_track_index[t]
-                    for t in md_playback_param.active_track_idxes
-                ]
-            )
-        )
-        self.note_to_key, correct_radio_1base, octave_change = NoteFitting(
-            [self.midi.tracks[t] for t in self.active_track_idx_set],
-            md_playback_param.note_to_key_mapping,
-            cfg.get(cfg.player_play_disable_note_fitting),
-        )
-        self.signal_correct_info_changed.emit(correct_radio_1base, octave_change)
+    ) -> PlaybackProgram | None:
+        program = self._prefetched.get(md_playback_param.midi_path)
+        if program is not None and program.matches(
+            md_playback_param, self._compile_options()
+        ):
+            return program
+        return None
 
     def prepare(self, md_playback_param: MdPlaybackParam):
+        """在后台线程解析并编译歌曲，完成后在 GUI 线程安装；已预加载则立即安装"""
         self.stop()
 
+        self.playback_param = md_playback_param
+        self._play_when_ready = False
+        ready_program = self._find_ready_program(md_playback_param)
+        if ready_program is not None:
+            # 使正在进行的准备任务过期
+            self._prepare_request_id += 1
+            self._preparing = False
+            logger.debug(f"使用预加载的歌曲: {md_playback_param.midi_path}")
+            self.install_program(ready_program)
+            return
+
+        self._preparing = True
         with self.clock_lock:
-            self.midi = mido.MidiFile(md_playback_param.midi_path)
-            # 初始 tempo
-            initial_tempo = 500000
-            self.ticks_per_beat = self.midi.ticks_per_beat
-
-            raw_events, tempo_events = self._prepare_track_and_events()
-            tempo_events.sort(key=lambda x: x[0])
-            raw_events.sort(key=lambda x: x[0])
-            self._prepare_key_mapping_and_active_tracks(md_playback_param)
-
-            # --- 精确计算所有事件的绝对微秒时间 ---
-            final_events_with_micros = []
-            current_tempo = initial_tempo
-            last_event_tick = 0
-            last_event_micro = 0
-            tempo_event_index = 0
-
-            for event_tick, event_type, note, trackIdx in raw_events:
-                while (
-                    tempo_event_index < len(tempo_events)
-                    and tempo_events[tempo_event_index][0] <= event_tick
-                ):
+            # 旧程序不再可播放，避免在新歌准备期间误播旧歌
+            self.program = None
+            self.next_program = None
+            self.total_events = 0
+            self.total_duration_us = 0
+        self.signal_play_duration.emit(0)
+        self._start_prepare_task(md_playback_param)
+
+    def _on_prepare_progress(self, request_id: int, progress: int):
+        if self._is_prepare_cancelled(request_id):
+            return
+        self.signal_prepare_progress.emit(progress)
 
-                    tempo_tick, new_tempo = tempo_events[tempo_event_index]
-                    ticks_since_last = tempo_tick - last_event_tick
-                    micros_since_last = (
-                        ticks_since_last * current_tempo
-                    ) // self.ticks_per_beat
-                    last_event_micro += micros_since_last
-
-                    current_tempo = new_tempo
-                    last_event_tick = tempo_tick
-                    tempo_event_index += 1
-
-                ticks_since_last = event_tick - last_event_tick
-                micros_since_last = (
-                    ticks_since_last * current_tempo
-                ) // self.ticks_per_beat
-                current_event_micro = last_event_micro + micros_since_last
-
-                final_events_with_micros.append(
-                    (current_event_micro, event_type, note, trackIdx)
-                )
+    def _on_prepare_failed(self, request_id: int, message: str):
+        if self._is_prepare_cancelled(request_id):
+            return
+        self._preparing = False
+        self._play_when_ready = False
+        self.signal_prepare_failed.emit(message)
 
-                last_event_tick = event_tick
-                last_event_micro = current_event_micro
+    def _on_prepare_finished(self, request_id: int, program: PlaybackProgram):
+        if self._is_prepare_cancelled(request_id):
+            logger.debug(f"丢弃过期的准备结果: {program.midi_path}")
+            return
 
-            self.events = final_events_with_micros
-            self.total_events = len(self.events)
-            self.total_duration_us = self.midi.length * 1_000_000
+        self._preparing = False
+        self.install_program(program)
+        if self._play_when_ready:
+            self._play_when_ready = False
+            self.play()
+
+    def install_program(self, program: PlaybackProgram):
+        """(GUI 线程) 在安全点整体替换播放程序；也可直接安装预先编译好的程序"""
+        engine = self.engine
+        if engine is not None:
+            # 在锁外写入共享内存，安装时只需切换游标
+            engine.load(program)
+        with self.clock_lock:
+            refit = self.program is not None and self.program.song is program.song
+            self.program = program
+            self.total_events = len(program.dispatch)
+            self.total_duration_us = program.song.duration_us
+            if refit:
+                # 同一首歌重新编译：从当前位置在新的派发时间线上继续
+                self.event_index = program.dispatch.find_index(
+                    self.current_playback_time_us
+                )
+            self._install_channel_programs(program)
+            self._arm_next_program()
+            self._publish_position()
 
+        if refit:
+            # 旧映射下按住的键需要释放，再按新映射重新按下当前应按住的键
+            with self.clock_lock:
+                self._flush_output()
+                self._restore_held_keys()
+        else:
+            self._begin_song_timing()
             logger.debug(
                 f"预处理完毕，总事件数: {self.total_events}，总时长: {self.total_duration_us / 1000:.2f} ms"
             )
             self.signal_play_duration.emit(self.total_duration_us // 1000)
 
-    def _get_keys(self, note: int) -> List[str]:
-        # (与上一版相同)
-        if not self.note_to_key:
-            return []
-        notestr = MIDI_NOTE_MAP.get_note_by_midi(note)
-        if notestr is None:
-            return []
-        if notestr not in self.note_to_key:
-            return []
-        value = self.note_to_key[notestr]
-        if isinstance(value, str):
-            return [value]
-        elif isinstance(value, list):
-            return [k for k in value if isinstance(k, str)]
-        else:
-            return []
+        self.signal_correct_info_changed.emit(
+            program.correct_ratio, program.octave_change, program.thinned_notes
+        )
 
-    # 执行线程增加按键状态跟踪
-    def _executor_thread(self):
-        """执行线程：执行按键操作，并跟踪按键状态"""
-        while self.running:
-            try:
-                task = self.task_queue.get(timeout=0.1)
-                event_type, keys = task
-                key_press_and_up = cfg.get(cfg.player_play_key_press_and_up)
-
-                if event_type == "note_on":
-                    control_keys = [k for k in keys if k in CONTROL_KEY_MAP]
-                    normal_keys = [k for k in keys if k not in CONTROL_KEY_MAP]
-                    # 先按控制键
-
-                    for c_k in control_keys:
-                        pydirectinput.keyDown(c_k)
-                    for key_to_press in normal_keys:
-                        pydirectinput.keyDown(key_to_press)
-                    for c_k in reversed(control_keys):
-                        pydirectinput.keyUp(c_k)
-
-                    if key_press_and_up:
-                        for key_to_press in reversed(normal_keys):
-                            pydirectinput.keyUp(key_to_press)
-                    else:
-                        # 使用锁保护 self.pressed_keys
-                        with self.keys_lock:
-                            self.pressed_keys.update(normal_keys)
+    ### 无缝播放：预加载后续歌曲 ###
+    def set_upcoming(self, params: list[MdPlaybackParam]):
+        """
+        设置接下来要播放的歌曲（按顺序），在后台预编译。
+        第一首就绪后作为无缝切换的下一首，播放结束时由调度线程直接切换。
+        """
+        self._upcoming = list(params)
+        options = self._compile_options()
+
+        prefetched = {}
+        pending = {}
+        for param in self._upcoming:
+            path = param.midi_path
+            if path in prefetched or path in pending:
+                continue
+            # 单曲循环或列表只剩一首时，下一首就是当前程序
+            for program in (self.program, self._prefetched.get(path)):
+                if program is not None and program.matches(param, options):
+                    prefetched[path] = program
+                    break
+            else:
+                old = self._prefetch_pending.get(path)
+                if old is not None and same_playback_param(old[1], param):
+                    pending[path] = old
                 else:
-                    normal_keys = [k for k in keys if k not in CONTROL_KEY_MAP]
-                    for key_to_release in normal_keys:
-                        with self.keys_lock:
-                            (
-                                pydirectinput.keyUp(key_to_release)
-                                if key_to_release in self.pressed_keys
-                                else None
-                            )
-                            self.pressed_keys.discard(key_to_release)
-                    # logger.debug(f"释放键: {key_to_press}") # 调试时开启
+                    self._prefetch_request_id += 1
+                    pending[path] = (self._prefetch_request_id, param)
+                    self._start_prefetch_task(
+                        self._prefetch_request_id, param, options
+                    )
 
-                self.task_queue.task_done()
-            except queue.Empty:
-                continue
-            except Exception as e:
-                logger.debug(f"按键执行出错: {e}")
-                self.task_queue.task_done()
+        self._prefetched = prefetched
+        self._prefetch_pending = pending
+        # 整体替换集合，后台线程读取时无需加锁
+        self._prefetch_live_ids = frozenset(rid for rid, _ in pending.values())
+        with self.clock_lock:
+            self._arm_next_program()
+
+    def _is_prefetch_cancelled(self, request_id: int) -> bool:
+        return request_id not in self._prefetch_live_ids
+
+    def _start_prefetch_task(
+        self, request_id: int, param: MdPlaybackParam, options: CompileOptions
+    ):
+        task = PrepareTask(
+            request_id=request_id,
+            md_playback_param=param,
+            song_cache=self.song_cache,
+            options=options,
+            is_cancelled=self._is_prefetch_cancelled,
+        )
+        task.signals.finished.connect(self._on_prefetch_finished)
+        task.signals.failed.connect(self._on_prefetch_failed)
+        self.prepare_pool.start(task)
+
+    def _on_prefetch_finished(self, request_id: int, program: PlaybackProgram):
+        pending = self._prefetch_pending.get(program.midi_path)
+        if pending is None or pending[0] != request_id:
+            return
+        logger.debug(f"预加载完成: {program.midi_path}")
+        del self._prefetch_pending[program.midi_path]
+        self._prefetched[program.midi_path] = program
+        with self.clock_lock:
+            self._arm_next_program()
+
+    def _on_prefetch_failed(self, request_id: int, message: str):
+        for path, (rid, _) in list(self._prefetch_pending.items()):
+            if rid == request_id:
+                logger.warning(f"预加载失败: {path} {message}")
+                del self._prefetch_pending[path]
+
+    def _arm_next_program(self):
+        """(持有 clock_lock) 选出无缝切换的下一首"""
+        self.next_program = None
+        if self.program is None or not self._upcoming:
+            return
+        self.next_program = self._prefetched.get(self._upcoming[0].midi_path)
+        if self.engine is not None:
+            # 提前把下一首交给引擎，切歌时只需切换游标
+            if self.next_program is not None:
+                self.engine.load(self.next_program)
+            self.engine.retain((self.program, self.next_program))
+
+    def _advance_to_next_program(self):
+        """
+        (调度线程，持有 clock_lock) 在上一首的结束时刻切换到下一首。
+        超出结束时刻的部分保留到新歌，再减去配置的曲间间隔，保证切换点精确。
+        """
+        program = self.next_program
+        overshoot_us = self.current_playback_time_us - self.total_duration_us
+        gap_us = self._play_delay() * 1_000_000 * self.playback_speed
+        self._end_song_timing(self.program.midi_path)
+
+        self.program = program
+        self.playback_param = program.md_playback_param
+        self.next_program = None
+        self.total_events = len(program.dispatch)
+        self.total_duration_us = program.song.duration_us
+        self.event_index = 0
+        # 间隔期间虚拟时间为负数，不会派发任何事件；锚点随之平移，时钟保持连续
+        playback_us = overshoot_us - int(gap_us)
+        self.anchor_playback_us += playback_us - self.current_playback_time_us
+        self.current_playback_time_us = playback_us
+        self._install_channel_programs(program)
+        self._publish_position()
+
+        logger.debug(f"无缝切换到下一首: {program.midi_path}")
+        self.signal_song_advanced.emit(program.midi_path)
+        self.signal_play_duration.emit(self.total_duration_us // 1000)
+        self.signal_correct_info_changed.emit(
+            program.correct_ratio, program.octave_change, program.thinned_notes
+        )
+
+    ### 多路输出 ###
+    def set_output_channels(
+        self,
+        params: list[OutputChannelParam],
+        outputs: list[KeyOutput] | None = None,
+    ):
+        """
+        (GUI 线程) 设置附加输出通道：每个通道按自己的音轨子集与预设编译，
+        发送到自己的输出后端，与主通道共用同一个调度时钟、任务环与执行线程。
+        outputs 用于注入输出（基准测试），默认按 params 中的后端名创建。
+        """
+        params = tuple(params)
+        if outputs is not None:
+            # 注入的输出无法交给引擎进程，先切回本进程派发
+            self._channel_outputs_injected = True
+            self._on_process_engine_change(False)
+        with self.clock_lock:
+            main_channel = self.main_channel
+            channels = tuple(
+                OutputChannel(
+                    param.name,
+                    outputs[i] if outputs else create_key_output(param.backend),
+                    self.clock,
+                    main_channel.task_ring,
+                )
+                for i, param in enumerate(params)
+            )
+            old_channels = self.extra_channels
+            self.extra_channels = channels
+            main_channel.followers = channels
+            self._channel_params = params
+            self._channel_outputs_injected = outputs is not None
+            if self.program is not None:
+                self._install_channel_programs(self.program)
+            if old_channels:
+                # 作废旧通道未执行的任务，再按快照重新按下主通道应按住的键
+                self._flush_output()
+                self._restore_held_keys()
+        # 执行中的任务持有 keys_lock，释放在它之后；其余旧任务已作废
+        for channel in old_channels:
+            with channel.keys_lock:
+                channel.release_pressed_keys_now()
+        logger.debug(f"附加输出通道: {[param.name for param in params]}")
+        self._refresh_output_latency()
+        # 程序中的通道是按旧设置编译的，重新编译后热切换
+        program = self.program
+        if program is None or program.options.channels != params:
+            self._on_compile_options_change(None)
+        if outputs is None:
+            # 不再有注入的输出时按设置恢复引擎进程
+            self._on_process_engine_change(cfg.get(cfg.player_process_engine))
+
+    def _install_channel_programs(self, program: PlaybackProgram):
+        """(持有 clock_lock) 把程序中各通道的时间线交给对应的附加通道"""
+        if program.options.channels != self._channel_params:
+            # 通道设置已变化，等按新设置编译的程序
+            programs = (None,) * len(self.extra_channels)
+        else:
+            programs = program.channels
+        for channel, channel_program in zip(self.extra_channels, programs):
+            channel.set_program(channel_program, self.current_playback_time_us)
+        self._sync_engine_cursor()
+
+    ### 独立进程引擎 ###
+    def _use_engine(self) -> bool:
+        # 注入的输出（基准测试）无法交给其他进程：引擎只能按后端名重新创建输出
+        return (
+            cfg.get(cfg.player_process_engine)
+            and not self._output_injected
+            and not self._channel_outputs_injected
+        )
+
+    def _start_engine(self):
+        """(持有 clock_lock) 启动引擎进程，并交给它当前的通道、程序、游标与锚点"""
+        engine = EngineProcess(
+            cfg.get(cfg.player_timing_profile), cfg.get(cfg.player_spin_cpu_budget)
+        )
+        engine.start()
+        self.engine = engine
+        engine.set_channels((self.main_channel, *self.extra_channels))
+        self._sync_engine_cursor()
+        self._arm_next_program()
+        self._publish_position()
+        self._begin_song_timing()
+
+    def _on_process_engine_change(self, enabled: bool):
+        """运行中切换派发方式：作废未执行的任务，切换后重新按下应按住的键"""
+        if not self.scheduler_thread or enabled == (self.engine is not None):
+            return
+        if enabled and not self._use_engine():
+            return
+        if not enabled:
+            # 先启动本进程的执行线程，调度线程看到 engine 为 None 后即可派发
+            self.main_channel.start()
+        with self.clock_lock:
+            self._flush_output()
+            engine = self.engine
+            if enabled:
+                self._start_engine()
+            else:
+                self.engine = None
+                self._begin_song_timing()
+            self._restore_held_keys()
+        if enabled:
+            self.main_channel.stop()
+        else:
+            engine.stop()
+        logger.debug(f"独立进程引擎: {enabled}")
+        self.wake_up_event.set()
 
-        # 线程退出前，释放所有按键，防止卡键
-        logger.debug("执行线程退出，释放所有按键...")
-        for key_str in list(self.pressed_keys):
-            key_to_release = KEY_MAP.get(key_str, key_str)
-            pydirectinput.keyUp(key_to_release)
+    def _on_engine_lost(self, engine: EngineProcess):
+        """(调度线程) 引擎进程意外退出：改为在本进程内派发，从当前游标继续"""
+        if self.engine is not engine:
+            return
+        logger.error("引擎进程意外退出，改为在本进程内派发")
+        self.main_channel.start()
+        with self.clock_lock:
+            if self.engine is not engine:
+                return
+            self.engine = None
+            self._begin_song_timing()
+            self._restore_held_keys()
+        engine.stop()
+
+    ### 输出延迟补偿 ###
+    def _refresh_output_latency(self, _=None):
+        """按当前后端读取补偿量，本机尚未校准时在后台校准（注入输出时不补偿）"""
+        compensate = cfg.get(cfg.player_latency_compensation)
+        profile = cfg.get(cfg.player_output_latency)
+        offset = 0.0
+        if not self._output_injected and compensate:
+            backend = self.main_channel.output.name
+            offset = latency_offset_us(profile, backend)
+            if offset is None:
+                offset = 0.0
+                if backend != NullOutput.name:
+                    self._start_latency_calibration(backend)
+        with self.clock_lock:
+            self.main_channel.output_latency_us = offset
+            # 附加通道使用各自后端已有的补偿量，不单独校准
+            for channel in self.extra_channels:
+                channel_offset = None
+                if not self._channel_outputs_injected and compensate:
+                    channel_offset = latency_offset_us(profile, channel.output.name)
+                channel.output_latency_us = channel_offset or 0.0
+            if self.engine is not None:
+                self.engine.set_channels((self.main_channel, *self.extra_channels))
+
+    def _start_latency_calibration(self, backend: str):
+        if self._latency_calibrating:
+            return
+        self._latency_calibrating = True
+        logger.debug(f"校准输出延迟: {backend}")
+        task = LatencyCalibrationTask(backend)
+        task.signals.finished.connect(self._on_latency_calibrated)
+        task.signals.failed.connect(self._on_latency_calibration_failed)
+        self.prepare_pool.start(task)
+
+    def _on_latency_calibration_failed(self, backend: str):
+        # 允许之后（重新校准、切换后端时）再次校准
+        self._latency_calibrating = False
+
+    def _on_latency_calibrated(self, backend: str, latency_us: float):
+        self._latency_calibrating = False
+        profile = cfg.get(cfg.player_output_latency)
+        cfg.set(
+            cfg.player_output_latency,
+            with_latency_offset(profile, backend, latency_us),
+        )
+
+    def _refine_output_latency(self, stats: dict):
+        """一首歌结束后，按实测剩余延迟修正当前后端的补偿量"""
+        if (
+            self._output_injected
+            or not cfg.get(cfg.player_latency_compensation)
+            or stats["count"] < REFINE_MIN_EVENTS
+        ):
+            return
+        backend = self.main_channel.output.name
+        profile = cfg.get(cfg.player_output_latency)
+        offset = latency_offset_us(profile, backend)
+        if offset is None or backend == NullOutput.name:
+            return
+        refined = refined_offset_us(offset, stats["p50_us"])
+        logger.debug(f"修正输出延迟补偿: {backend} {offset:.0f} -> {refined:.0f}us")
+        cfg.set(
+            cfg.player_output_latency, with_latency_offset(profile, backend, refined)
+        )
+
+    def _on_output_backend_change(self, name: str):
+        """切换输出后端：先用旧后端抬起按下的键，再替换（执行线程每个任务读取一次）"""
+        if self._output_injected:
+            return
+        output = create_key_output(name)
+        self.main_channel.set_output(output)
+        logger.debug(f"按键输出后端切换为: {output.name}")
+        self._refresh_output_latency()
 
     ### 高精度混合调度器 ###
-    def _scheduler_thread(self):
+    def _create_wait_strategy(self, profile: dict) -> WaitStrategy:
+        """(调度线程) 读取本机等待误差 profile，缺失或不属于本机时重新校准"""
+        if not is_profile_valid(profile):
+            logger.debug("校准本机 Event.wait 误差...")
+            profile = calibrate_wait_overshoot()
+            logger.debug(f"校准完成: {profile}")
+            self.signal_timing_profile_calibrated.emit(profile)
+        return WaitStrategy(profile, cfg.get(cfg.player_spin_cpu_budget), self.clock)
+
+    def _scheduler_thread(self, timing_profile: dict):
         """调度线程：基于状态机的混合精度时钟"""
+        self.wait_strategy = self._create_wait_strategy(timing_profile)
+        wait_strategy = self.wait_strategy
 
         while self.running:
             # 清除唤醒标志
             self.wake_up_event.clear()
 
+            engine = self.engine
+            if engine is not None and not engine.is_alive():
+                self._on_engine_lost(engine)
+
             # 播放延时控制（这块可以优化）
             tmp_start_flag = False
             with self.clock_lock:
                 tmp_start_flag = self.start_flag
             if tmp_start_flag:
                 self.play_delay_event.clear()
-                self.play_delay_event.wait(timeout=cfg.get(cfg.player_play_delay_time))
+                self.clock.wait(self.play_delay_event, self._play_delay())
                 with self.clock_lock:
                     self.start_flag = False
-                    self.last_real_time_ns = 0
+                    self._unanchor_clock()
 
             spin_wait = False  # 是否进入自旋模式
             target_real_time_ns = 0  # 自旋模式的目标时间
@@ -310,94 +693,115 @@ class QMidiPlayer(QtCore.QObject):
             with self.clock_lock:
                 # --- 状态检查与时钟推进 ---
                 if self.state == QMidiPlayer.PlayState.PLAYING:
-                    current_real_time_ns = time.time_ns()
+                    current_real_time_ns = self.clock.now_ns()
 
-                    # 仅当 last_real_time_ns > 0 (非暂停后刚恢复) 才推进时钟
-                    if self.last_real_time_ns > 0:
-                        real_time_delta_ns = (
-                            current_real_time_ns - self.last_real_time_ns
+                    if self.anchor_real_ns == 0:
+                        # 开始 / 恢复播放后的第一轮：以当前播放时刻锚定
+                        self._anchor_clock(current_real_time_ns)
+                    else:
+                        self.current_playback_time_us = playback_time_us(
+                            current_real_time_ns,
+                            self.anchor_real_ns,
+                            self.anchor_playback_us,
+                            self.playback_speed,
                         )
-                        virtual_time_delta_us = (
-                            real_time_delta_ns // 1000
-                        ) * self.playback_speed
-                        self.current_playback_time_us += virtual_time_delta_us
-
-                    # 锚定当前真实时间
-                    self.last_real_time_ns = current_real_time_ns
 
                     # --- 事件派发 ---
-                    while self.event_index < self.total_events:
-                        event_time_us = self.events[self.event_index][0]
-
-                        if event_time_us <= self.current_playback_time_us:
-                            # 时间到，推入队列
-                            _, event_type, note, track_idx = self.events[
-                                self.event_index
-                            ]
-                            if track_idx in self.active_track_idx_set:
-                                keys = self._get_keys(note)
-                                self.task_queue.put((event_type, keys))
-                            self.event_index += 1
-                        else:
-                            # 此事件在未来，停止检查
-                            break
+                    # 二分定位所有已到期步骤 [event_index, due_end)
+                    # 程序指针只在持有 clock_lock 时替换，本轮内保持一致
+                    program = self.program
+                    anchor = (
+                        self.anchor_real_ns,
+                        self.anchor_playback_us,
+                        self.playback_speed,
+                    )
+                    # 按键由引擎进程派发时，本线程只推进游标，用于判断歌曲结束
+                    engine = self.engine
+                    send = engine is None
+                    main_channel = self.main_channel
+                    # next_us: 下一个步骤（按输出延迟提前后）的播放时刻，None 表示已没有步骤
+                    self.event_index, next_us = main_channel.advance(
+                        program.dispatch,
+                        self.event_index,
+                        self.current_playback_time_us,
+                        anchor,
+                        send,
+                    )
+
+                    # 附加通道：同一个时钟锚点，各自的时间线与输出延迟
+                    channels_done = True
+                    for channel in self.extra_channels:
+                        if channel.program is None:
+                            continue
+                        channel.event_index, channel_next_us = channel.advance(
+                            channel.program.dispatch,
+                            channel.event_index,
+                            self.current_playback_time_us,
+                            anchor,
+                            send,
+                        )
+                        if channel_next_us is not None:
+                            channels_done = False
+                            if next_us is None or channel_next_us < next_us:
+                                next_us = channel_next_us
+                    if send:
+                        # 各通道同一时刻的步骤都已入环，再唤醒执行线程依次发送
+                        main_channel.task_ring.notify()
 
                     # --- 计算下一次等待策略 ---
-                    if (
+                    song_done = (
                         self.event_index >= self.total_events
+                        and channels_done
                         and self.current_playback_time_us > self.total_duration_us
-                    ):
+                    )
+                    if song_done and self.next_program is not None:
+                        # 无缝切换到已预加载的下一首，立即进入下一轮调度
+                        self._advance_to_next_program()
+                        wait_timeout_sec = 0
+                    elif song_done:
                         # 播放完毕
                         logger.debug("播放完毕。")
+                        self._end_song_timing(program.midi_path)
                         self.state = QMidiPlayer.PlayState.IDLE
                         self.signal_state.emit(self.state)
                         self.signal_media_done.emit(True)
                         self.current_playback_time_us = 0
                         self.event_index = 0
-                        self.last_real_time_ns = 0  # 重置时钟锚
+                        self._unanchor_clock()  # 重置时钟锚
+                        self._seek_channels(0)
                         wait_timeout_sec = None  # 进入无限等待
+                    elif engine is not None:
+                        # 只需在歌曲结束（以及结束后剩余的步骤）时醒来，不自旋
+                        end_us = max(next_us or 0, self.total_duration_us) + 1
+                        wait_ns = real_time_ns(end_us, *anchor) - current_real_time_ns
+                        wait_timeout_sec = min(
+                            max(wait_ns, 0) / 1e9, RESPONSIVE_LOOP_TIME_US / 1e6
+                        )
                     else:
                         # 计算到下一个事件的“真实”微秒
-                        if self.event_index < self.total_events:
-                            next_event_time_us = self.events[self.event_index][0]
-                            wait_micros = (
-                                next_event_time_us - self.current_playback_time_us
-                            ) / self.playback_speed
+                        if next_us is not None:
+                            # 下一个步骤的真实时刻由锚点反算
+                            next_real_ns = real_time_ns(next_us, *anchor)
                         else:
                             # 此时在静默播放，已经没有任务了. 让他不要自旋就行
-                            wait_micros = max(
-                                self.RESPONSIVE_LOOP_TIME_US,
-                                self.SPIN_WAIT_THRESHOLD_US + 1,
-                            )
-
-                        if wait_micros <= 1:  # (<= 1us 视为立即执行)
-                            # 已经迟了或即将到时，不睡眠，立即循环
-                            wait_timeout_sec = 0
-
-                        elif wait_micros <= self.SPIN_WAIT_THRESHOLD_US:
-                            # 【精度模式】
-                            # 时间极短，准备自旋
-                            spin_wait = True
-                            target_real_time_ns = current_real_time_ns + int(
-                                wait_micros * 1000
+                            next_real_ns = (
+                                current_real_time_ns + RESPONSIVE_LOOP_TIME_US * 1000
                             )
-                            # (此时 wait_timeout_sec 保持 None，因为我们将不使用 wake_up_event.wait)
+                        wait_micros = (next_real_ns - current_real_time_ns) / 1000
 
-                        else:
-                            # 【响应模式】
-                            # 时间较长，计算一个安全的、可响应的睡眠时间
-                            # 睡眠时间 = min(到下个音符的时间 * 0.75, 响应时间)
-                            sleep_micros = min(
-                                wait_micros * 0.75, self.RESPONSIVE_LOOP_TIME_US
-                            )
-                            wait_timeout_sec = sleep_micros / 1_000_000
+                        # 【精度模式】进入自旋窗口后自旋到目标时间
+                        # 【响应模式】否则睡到窗口边缘（可被 wake_up_event 打断）再重新计算
+                        spin_wait, wait_timeout_sec = wait_strategy.plan(wait_micros)
+                        if spin_wait:
+                            target_real_time_ns = next_real_ns
 
                 elif (
                     self.state == QMidiPlayer.PlayState.PAUSED
                     or self.state == QMidiPlayer.PlayState.IDLE
                 ):
                     # 暂停或空闲时，重置时钟锚，无限期等待
-                    self.last_real_time_ns = 0
+                    if self.anchor_real_ns:
+                        self._unanchor_clock()
                     wait_timeout_sec = None
 
             # --- 锁已释放 ---
@@ -406,15 +810,14 @@ class QMidiPlayer(QtCore.QObject):
             if spin_wait:
                 # 【精度模式】
                 # 忙碌-等待（自旋）
-                while time.time_ns() < target_real_time_ns:
-                    pass
+                wait_strategy.spin_until(target_real_time_ns)
             else:
                 # 【响应模式】
                 # 带超时的等待
                 # 1. state='playing': 等待 wait_timeout_sec (例如 0ms 或 5ms)
                 # 2. state='paused'/'idle': 等待 None (无限期)
                 # 3. 任何 `wake_up_event.set()` 都会立即唤醒它
-                self.wake_up_event.wait(timeout=wait_timeout_sec)
+                wait_strategy.wait_event(self.wake_up_event, wait_timeout_sec)
 
         logger.debug("调度线程已退出。")
 
@@ -426,13 +829,22 @@ class QMidiPlayer(QtCore.QObject):
 
         logger.debug("启动播放器线程...")
         self.running = True
+        if not self._output_injected:
+            # 播放期间预加载只用一个线程
+            governor.register_pool(self.prepare_pool, 1)
 
-        # 启动执行线程
-        self.executor_thread = threading.Thread(target=self._executor_thread)
-        self.executor_thread.start()
+        # 启动执行线程（附加通道共用），或在独立进程中运行引擎
+        if self._use_engine():
+            with self.clock_lock:
+                self._start_engine()
+        else:
+            self.main_channel.start()
 
         # 启动调度线程
-        self.scheduler_thread = threading.Thread(target=self._scheduler_thread)
+        self.scheduler_thread = threading.Thread(
+            target=self._scheduler_thread,
+            args=(cfg.get(cfg.player_timing_profile),),
+        )
         self.scheduler_thread.start()
 
     def stop_player(self):
@@ -443,14 +855,15 @@ class QMidiPlayer(QtCore.QObject):
         self.wake_up_event.set()  # 唤醒调度器，让它看到 self.running=False 并退出
         self.play_delay_event.set()
 
-        self.position_timer.stop()
         if self.scheduler_thread:
             self.scheduler_thread.join()
-        if self.executor_thread:
-            self.executor_thread.join()
+        self.main_channel.stop()
+        if self.engine is not None:
+            self.engine.stop()
+            self.engine = None
 
         self.scheduler_thread = None
-        self.executor_thread = None
+        governor.unregister_pool(self.prepare_pool)
         logger.debug("播放器线程已停止")
 
     def play(self):
@@ -459,7 +872,11 @@ class QMidiPlayer(QtCore.QObject):
             logger.debug("线程未启动，请先调用 start_player()")
             return
 
-        if not self.midi:
+        if self.program is None:
+            if self._preparing:
+                logger.debug("歌曲准备中，完成后自动播放")
+                self._play_when_ready = True
+                return
             logger.debug("未加载midi，请先调用 prepare(...)")
             return
 
@@ -470,52 +887,64 @@ class QMidiPlayer(QtCore.QObject):
 
             logger.debug("开始播放...")
             self.state = QMidiPlayer.PlayState.PLAYING
-            self.signal_state.emit(self.state)
-            self.last_real_time_ns = 0
 
             # 如果是从头开始
             if last_state == QMidiPlayer.PlayState.IDLE:
                 self.current_playback_time_us = 0
                 logger.debug("从头播放")
                 self.start_flag = True
+            else:
+                # 暂停时释放了所有按键，恢复时重新按下仍在发音的键
+                self._restore_held_keys()
+            self._unanchor_clock()
+            self.signal_state.emit(self.state)
 
-        self.position_timer.start()
         # 唤醒调度器线程
         self.wake_up_event.set()
 
     def pause(self):
         """暂停播放。"""
+        self._play_when_ready = False
         with self.clock_lock:
             if self.state != QMidiPlayer.PlayState.PLAYING:
                 return
             logger.debug("暂停播放。")
             self.state = QMidiPlayer.PlayState.PAUSED
+            if self.anchor_real_ns:
+                # 停在暂停的这一刻，界面显示的位置与恢复时的起点一致
+                self.current_playback_time_us = playback_time_us(
+                    self.clock.now_ns(),
+                    self.anchor_real_ns,
+                    self.anchor_playback_us,
+                    self.playback_speed,
+                )
+                self._unanchor_clock()
             self.signal_state.emit(self.state)
 
         # 释放队列按键以及按下的按键
         self._release_keyup_all_task_and_pressed_keys()
 
         # 唤醒调度器，让它进入 'paused' 的等待状态
-        self.position_timer.stop()
         self.wake_up_event.set()
 
     def stop(self):
+        self._play_when_ready = False
         # 1. 先锁时钟，改变状态
         with self.clock_lock:
             if self.state == QMidiPlayer.PlayState.IDLE:
                 return
             logger.debug("正在停止播放...")
             self.state = QMidiPlayer.PlayState.IDLE
-            self.signal_state.emit(self.state)
             self.event_index = 0
             self.current_playback_time_us = 0
-            self.last_real_time_ns = 0
+            self._unanchor_clock()
+            self._seek_channels(0)
+            self.signal_state.emit(self.state)
 
         # 2. 释放队列按键以及按下的按键
         self._release_keyup_all_task_and_pressed_keys()
 
         self.signal_play_position.emit(0)
-        self.position_timer.stop()
         self.wake_up_event.set()  # 唤醒调度器
 
     def seek(self, time_ms: int):
@@ -526,61 +955,118 @@ class QMidiPlayer(QtCore.QObject):
         if time_us > self.total_duration_us:
             time_us = self.total_duration_us
 
-        logger.debug(f"跳转到 {time_ms} ms...")
-
         with self.clock_lock:
+            bar, beat = self._get_bar_beat(time_us)
+            logger.debug(f"跳转到 {time_ms} ms (第 {bar} 小节 第 {beat} 拍)...")
+
             # 1. 暂停调度器
             was_playing = self.state == QMidiPlayer.PlayState.PLAYING
             self.state = QMidiPlayer.PlayState.PAUSED
-            self.signal_state.emit(self.state)
             self.current_playback_time_us = time_us
             self.event_index = self._find_event_index_for_time(time_us)
+            # 先停止时钟再定位游标，引擎不会按旧锚点派发新位置
+            self._unanchor_clock()
+            self._seek_channels(time_us)
+            self.signal_state.emit(self.state)
 
         # 2. 释放队列按键以及按下的按键
         self._release_keyup_all_task_and_pressed_keys()
 
-        # 3. 如果之前在播放，则恢复播放
+        # 3. 如果之前在播放，则恢复播放，并按快照重新按下跳转点处仍在发音的键
         if was_playing:
             with self.clock_lock:
                 self.state = QMidiPlayer.PlayState.PLAYING
+                self._anchor_clock(self.clock.now_ns())
+                self._restore_held_keys()
                 self.signal_state.emit(self.state)
-                self.last_real_time_ns = time.time_ns()
 
         # 唤醒调度器
         self.wake_up_event.set()
 
+    def seek_bar(self, bar: int, beat: int = 1):
+        """跳转到指定小节:拍（均为 1 基）。"""
+        with self.clock_lock:
+            if self.program is None:
+                return
+            time_us = self.program.song.tempo_map.bar_beat_to_us(bar, beat)
+        self.seek(time_us // 1000)
+
+    def _get_bar_beat(self, time_us: int) -> tuple[int, int]:
+        # 程序不可变，只读一次指针，无需加锁
+        program = self.program
+        if program is None:
+            return 1, 1
+        return program.song.tempo_map.us_to_bar_beat(time_us)
+
+    def get_bar_beat(self, time_ms: int) -> tuple[int, int]:
+        """获取指定毫秒处的音乐位置 (小节, 拍)，界面每帧调用，不加锁。"""
+        return self._get_bar_beat(time_ms * 1000)
+
+    def get_note_roll(self) -> NoteRoll | None:
+        """(无锁) 当前播放程序的钢琴卷帘数据，未加载时返回 None"""
+        program = self.program
+        return program.note_roll if program is not None else None
+
     def _release_keyup_all_task_and_pressed_keys(self):
-        # 清空队列 (在锁外)
-        while not self.task_queue.empty():
-            try:
-                self.task_queue.get_nowait()
-            except queue.Empty:
-                break
-            self.task_queue.task_done()
-
-        # 锁按键状态，准备释放
-        with self.keys_lock:
-            keys_to_release = list(self.pressed_keys)
-            # 注意：这里不清空pressed_keys，让executor来清
-
-        # 提交释放任务 (在锁外)
-        for key_str in keys_to_release:
-            self.task_queue.put(("note_off", [key_str]))  # 修复：传列表
+        """O(1) 作废任务环中未执行的任务，由执行线程跳过它们并释放各通道按下的键"""
+        with self.clock_lock:
+            self._flush_output()
+
+    def _flush_output(self):
+        """(持有 clock_lock) 作废未执行的任务（引擎进程运行时由它作废）"""
+        if self.engine is not None:
+            self.engine.flush()
+        else:
+            self.main_channel.task_ring.flush()
+
+    def _restore_held_keys(self):
+        """
+        (持有 clock_lock，播放中) 按各通道派发时间线的按键快照，
+        重新按下当前位置应按住的键。
+        """
+        if self.program is None or self.state != QMidiPlayer.PlayState.PLAYING:
+            return
+        playback_us = self.current_playback_time_us
+        if self.engine is not None:
+            # 引擎按自己的派发游标恢复
+            self.engine.restore_held_keys(playback_us)
+            return
+        self.main_channel.restore_held_keys(
+            self.program.dispatch, self.event_index, playback_us
+        )
+        for channel in self.extra_channels:
+            if channel.program is not None:
+                channel.restore_held_keys(
+                    channel.program.dispatch, channel.event_index, playback_us
+                )
+
+    def _seek_channels(self, time_us: int):
+        """(持有 clock_lock) 附加通道的派发游标定位到 time_us"""
+        for channel in self.extra_channels:
+            if channel.program is not None:
+                channel.event_index = channel.program.dispatch.find_index(time_us)
+        self._sync_engine_cursor()
+
+    def _sync_engine_cursor(self):
+        """(持有 clock_lock) 把当前程序与各通道的派发游标交给引擎进程"""
+        if self.engine is None or self.program is None:
+            return
+        indexes = (self.event_index,) + tuple(
+            c.event_index if c.program is not None else None
+            for c in self.extra_channels
+        )
+        self.engine.set_cursor(
+            self.program,
+            indexes,
+            (self.anchor_real_ns, self.anchor_playback_us, self.playback_speed),
+        )
 
     def _find_event_index_for_time(self, time_us: int) -> int:
         """(辅助函数) 使用二分查找快速定位时间戳"""
         # 查找第一个时间戳 >= time_us 的事件
-        l, r = 0, self.total_events - 1
-        target_index = self.total_events
-
-        while l <= r:
-            mid = (l + r) // 2
-            if self.events[mid][0] >= time_us:
-                target_index = mid
-                r = mid - 1
-            else:
-                l = mid + 1
-        return target_index
+        if self.program is None:
+            return 0
+        return self.program.dispatch.find_index(time_us)
 
     def set_speed(self, speed: float):
         """设置播放速度（例如 1.0, 1.5, 0.5）。"""
@@ -589,17 +1075,66 @@ class QMidiPlayer(QtCore.QObject):
 
         with self.clock_lock:
             logger.debug(f"播放速度设置为: {speed}x")
+            if self.anchor_real_ns:
+                # 以旧速度推进到当前时刻后重新锚定，此前的播放进度不受新速度影响
+                now_ns = self.clock.now_ns()
+                self.current_playback_time_us = playback_time_us(
+                    now_ns,
+                    self.anchor_real_ns,
+                    self.anchor_playback_us,
+                    self.playback_speed,
+                )
+                self._anchor_clock(now_ns)
             self.playback_speed = speed
-        # 无需唤醒线程，它会在下一次循环自动使用新速度
+            self._publish_position()
+        # 唤醒调度线程，按新速度重新计算等待时间
+        self.wake_up_event.set()
+
+    def _anchor_clock(self, now_ns: int):
+        """(持有 clock_lock) 以当前播放时刻在 now_ns 处重新锚定时钟"""
+        self.anchor_real_ns = now_ns
+        self.anchor_playback_us = self.current_playback_time_us
+        self._publish_position()
+
+    def _unanchor_clock(self):
+        """(持有 clock_lock) 时钟停止推进，播放位置停在当前时刻"""
+        self.anchor_real_ns = 0
+        self._publish_position()
+
+    def _publish_position(self):
+        """(持有 clock_lock) 整体替换位置快照，界面线程据此无锁外推"""
+        self.position = PositionSnapshot(
+            self.anchor_real_ns,
+            (
+                self.anchor_playback_us
+                if self.anchor_real_ns
+                else self.current_playback_time_us
+            ),
+            self.playback_speed,
+            self.total_duration_us,
+        )
+        if self.engine is not None:
+            self.engine.set_anchor(
+                self.anchor_real_ns, self.anchor_playback_us, self.playback_speed
+            )
+
+    def get_position_ms(self) -> int:
+        """(任意线程，无锁) 由最近发布的快照外推当前播放位置（毫秒）"""
+        position = self.position
+        position_us = position.position_us(self.clock.now_ns())
+        return int(min(max(position_us, 0), position.duration_us)) // 1000
 
     def get_playback_info(self) -> dict:
         """获取当前播放信息（用于时间条）。"""
         with self.clock_lock:
+            bar, beat = self._get_bar_beat(self.current_playback_time_us)
             return {
-                "current_time_ms": self.current_playback_time_us // 1000,
+                "current_time_ms": max(0, self.current_playback_time_us // 1000),
                 "total_time_ms": self.total_duration_us // 1000,
                 "state": self.state,
                 "speed": self.playback_speed,
+                "bar": bar,
+                "beat": beat,
             }
 
     def get_playback_state(self) -> PlayState:
@@ -609,20 +1144,111 @@ class QMidiPlayer(QtCore.QObject):
     def get_all_tracks(self):
         track_info = []
         with self.clock_lock:
-            if self.midi:
-                for i, track_idx in enumerate(self.music_track_index):
-                    track = self.midi.tracks[track_idx]
+            if self.program is not None:
+                song = self.program.song
+                for i, track_idx in enumerate(song.music_track_index):
                     track_info.append(
-                        {"index": i, "name": track.name, "num": len(track)}
+                        {
+                            "index": i,
+                            "name": song.track_names[track_idx],
+                            "num": song.track_sizes[track_idx],
+                        }
                     )
         return track_info
 
     def handle_playback_param_change(self, md_playback_param: MdPlaybackParam):
-        with self.clock_lock:
-            if self.midi:
-                self._prepare_key_mapping_and_active_tracks(md_playback_param)
+        """预设/音轨变化：后台重新拟合，完成后热切换，不打断播放"""
+        self.playback_param = md_playback_param
+        if self._preparing or self.program is None:
+            # 歌曲仍在准备，直接以新参数重新提交（旧请求随之过期）
+            if self._preparing:
+                self._start_prepare_task(md_playback_param)
+            return
+        self._start_prepare_task(md_playback_param, song=self.program.song)
+
+    ### 时序统计 ###
+    def _begin_song_timing(self):
+        jitter = self._jitter()
+        self._song_start_seq = jitter.next_seq
+        jitter.take_counters()
+
+    def _end_song_timing(self, midi_path: str):
+        """(持有 clock_lock) 结束当前歌曲的时序记录，交给 GUI 线程按需写报告"""
+        jitter = self._jitter()
+        queue_high_water, dropped = jitter.take_counters()
+        self.signal_song_timing_done.emit(
+            midi_path,
+            {
+                "start_seq": self._song_start_seq,
+                "end_seq": jitter.next_seq,
+                "queue_high_water": queue_high_water,
+                "dropped": dropped,
+            },
+        )
+        self._song_start_seq = jitter.next_seq
+
+    def _jitter(self) -> JitterRecorder:
+        """主通道的时序记录（引擎进程运行时为共享内存中由引擎写入的记录）"""
+        engine = self.engine
+        if engine is not None:
+            return engine.jitter.refresh()
+        return self.main_channel.jitter
+
+    def get_jitter_stats(self) -> dict:
+        """当前歌曲的按键延迟统计：p50/p95/p99/max（微秒）、队列峰值、丢弃数"""
+        return self._jitter().stats(self._song_start_seq)
+
+    def _build_jitter_report(self, midi_path: str, stats: dict) -> dict:
+        return {
+            "midi_path": midi_path,
+            "machine": machine_key(),
+            "stats": stats,
+            "settings": {
+                "speed": self.playback_speed,
+                "press_delay_ms": cfg.get(cfg.player_play_press_delay),
+                "key_press_and_up": cfg.get(cfg.player_play_key_press_and_up),
+                "chord_tolerance_us": cfg.get(cfg.player_chord_tolerance_us),
+                "output_backend": self.main_channel.output.name,
+                "output_latency_us": self.main_channel.output_latency_us,
+                "process_engine": self.engine is not None,
+                "playback_priority": governor.active,
+                "output_channels": [
+                    {"name": c.name, "backend": c.output.name}
+                    for c in self.extra_channels
+                ],
+                "max_polyphony": cfg.get(cfg.player_max_polyphony),
+                "max_keys_per_second": cfg.get(cfg.player_max_keys_per_second),
+                "spin_cpu_budget": cfg.get(cfg.player_spin_cpu_budget),
+                "spin_window_us": (
+                    self.wait_strategy.spin_window_us if self.wait_strategy else None
+                ),
+                "timing_profile": cfg.get(cfg.player_timing_profile),
+            },
+        }
+
+    def dump_jitter_report(self):
+        """将当前歌曲的时序报告写入用户目录，返回文件路径（未加载歌曲时返回 None）"""
+        if self.playback_param is None:
+            return None
+        report = self._build_jitter_report(
+            self.playback_param.midi_path, self.get_jitter_stats()
+        )
+        return write_jitter_report(
+            Utils.user_path("jitter_reports"), self.playback_param.midi_path, report
+        )
 
-    def handle_playback_param_change(self, md_playback_param: MdPlaybackParam):
-        with self.clock_lock:
-            if self.midi:
-                self._prepare_key_mapping_and_active_tracks(md_playback_param)
+    def _on_song_timing_done(self, midi_path: str, info: dict):
+        stats = self._jitter().stats(info["start_seq"], info["end_seq"])
+        stats.update(queue_high_water=info["queue_high_water"], dropped=info["dropped"])
+        self._refine_output_latency(stats)
+        if not cfg.get(cfg.player_jitter_report):
+            return
+        try:
+            path = write_jitter_report(
+                Utils.user_path("jitter_reports"),
+                midi_path,
+                self._build_jitter_report(midi_path, stats),
+            )
+            logger.debug(f"时序报告已写入: {path}")
+        except OSError as e:
+            logger.warning(f"写入时序报告失败: {e}")
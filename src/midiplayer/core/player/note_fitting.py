@@ -1,24 +1,17 @@
 # 音符拟合 - 修正版 (支持黑键 & 原调优先)
 
-from mido import MidiTrack
-
 from midiplayer.core.player.type import MIDI_NOTE_MAP
 
 
 def NoteFitting(
-    tracks: list[MidiTrack],
+    note_counts: dict[int, int],
     note_to_key_mapping: dict[str, str],
     disableNoteFitting: bool,
 ) -> tuple[dict[str, str], float, int]:
 
     # --- 1. 数据预处理 ---
-    note_counts: dict[int, int] = {}
-    total_notes = 0
-    for track in tracks:
-        for msg in track:
-            if msg.type == "note_on" and msg.velocity > 0:
-                note_counts[msg.note] = note_counts.get(msg.note, 0) + 1
-                total_notes += 1
+    # note_counts: 音符 -> note_on 次数（由编译阶段的音符直方图统计得出）
+    total_notes = sum(note_counts.values())
 
     if total_notes == 0:
         return note_to_key_mapping, 1.0, 0
@@ -0,0 +1,174 @@
+# 钢琴卷帘数据：由编译好的事件时间线生成音符区间，供界面按视口裁剪绘制
+# 音符按开始时间排序存放在列式数组中；长音符单独索引，查询某个时间窗内的音符只需
+# 两次二分查找，绘制开销只与屏幕上的音符数有关，与歌曲长度无关。
+# 缩小到一屏音符过多时，按 (状态, 音高, 像素列) 栅格化，每行连续占用的列合并为一个矩形。
+
+import numpy as np
+
+from midiplayer.core.player.key_actions import KeyActionTable
+from midiplayer.core.player.timeline import EVENT_NOTE_OFF, EVENT_NOTE_ON, EventTimeline
+from midiplayer.core.player.type import MIDI_NOTE_MAP
+
+# 音符状态：按原键演奏 / 经移调、折叠或吸附后演奏 / 未映射或被精简
+NOTE_MAPPED = 0
+NOTE_FOLDED = 1
+NOTE_DROPPED = 2
+NOTE_STATUS_COUNT = 3
+
+# 超过此时长（微秒）的音符归入长音符索引，其余音符查询时只需向前多看这么长
+LONG_NOTE_US = 4_000_000
+
+
+class NoteRoll:
+    """
+    不可变的音符区间表（按开始时间升序）：
+    - starts / ends : int64 开始、结束时间（微秒）
+    - pitches       : uint8 原始音高
+    - status        : uint8 NOTE_MAPPED / NOTE_FOLDED / NOTE_DROPPED
+    """
+
+    __slots__ = (
+        "starts",
+        "ends",
+        "pitches",
+        "status",
+        "long_idx",
+        "min_pitch",
+        "max_pitch",
+    )
+
+    def __init__(
+        self,
+        starts: np.ndarray,
+        ends: np.ndarray,
+        pitches: np.ndarray,
+        status: np.ndarray,
+    ):
+        self.starts = starts
+        self.ends = ends
+        self.pitches = pitches
+        self.status = status
+        self.long_idx = np.flatnonzero(ends - starts > LONG_NOTE_US)
+        if len(pitches):
+            self.min_pitch = int(pitches.min())
+            self.max_pitch = int(pitches.max())
+        else:
+            self.min_pitch, self.max_pitch = 60, 72
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    @staticmethod
+    def empty() -> "NoteRoll":
+        return NoteRoll(
+            np.empty(0, dtype=np.int64),
+            np.empty(0, dtype=np.int64),
+            np.empty(0, dtype=np.uint8),
+            np.empty(0, dtype=np.uint8),
+        )
+
+    def visible(self, t0_us: int, t1_us: int) -> np.ndarray:
+        """返回与 [t0_us, t1_us) 相交的音符下标（升序）"""
+        starts = self.starts
+        lo = int(np.searchsorted(starts, t0_us - LONG_NOTE_US, side="left"))
+        hi = int(np.searchsorted(starts, t1_us, side="left"))
+        idx = lo + np.flatnonzero(self.ends[lo:hi] > t0_us)
+        # 更早开始、仍未结束的长音符
+        long_idx = self.long_idx
+        n = int(np.searchsorted(starts[long_idx], t0_us - LONG_NOTE_US, side="left"))
+        early = long_idx[:n]
+        early = early[self.ends[early] > t0_us]
+        if early.size:
+            idx = np.concatenate((early, idx))
+        return idx
+
+    def raster(self, idx: np.ndarray, t0_us: int, col_us: float, cols: int):
+        """
+        把音符栅格化到 (状态, 音高, 列) 网格，返回每行连续占用的列区间：
+        (状态数组, 音高数组, 起始列数组, 结束列数组)
+        """
+        c0 = np.floor((self.starts[idx] - t0_us) / col_us)
+        c1 = np.ceil((self.ends[idx] - t0_us) / col_us)
+        c0 = np.clip(c0, 0, cols).astype(np.int64)
+        c1 = np.clip(np.maximum(c1, c0 + 1), 0, cols).astype(np.int64)
+        # 差分数组：开始列 +1，结束列 -1，按列累加后大于 0 即为占用
+        row = self.status[idx].astype(np.int64) * 128 + self.pitches[idx]
+        size = NOTE_STATUS_COUNT * 128 * (cols + 1)
+        diff = np.bincount(row * (cols + 1) + c0, minlength=size)
+        diff -= np.bincount(row * (cols + 1) + c1, minlength=size)
+        occupied = diff.reshape(-1, cols + 1).cumsum(axis=1)[:, :cols] > 0
+        # 每行前后补 False，上升沿为区间开始，下降沿为区间结束
+        edges = np.diff(np.pad(occupied, ((0, 0), (1, 1))).astype(np.int8), axis=1)
+        rows, run_starts = np.nonzero(edges == 1)
+        _, run_ends = np.nonzero(edges == -1)
+        return rows // 128, rows % 128, run_starts, run_ends
+
+
+def note_status_by_pitch(
+    table: KeyActionTable, note_to_key: dict, original_mapping: dict
+) -> np.ndarray:
+    """每个音高的状态：未映射为丢弃，映射到的键与原映射不同为移调 / 折叠"""
+    status = np.full(128, NOTE_DROPPED, dtype=np.uint8)
+    for note, action in enumerate(table.actions):
+        if action is None:
+            continue
+        name = MIDI_NOTE_MAP.get_note_by_midi(note)
+        same = note_to_key.get(name) == original_mapping.get(name)
+        status[note] = NOTE_MAPPED if same else NOTE_FOLDED
+    return status
+
+
+def build_note_roll(
+    events: EventTimeline,
+    active_track_idx_set: set[int],
+    pitch_status: np.ndarray,
+    skip: np.ndarray | None,
+    duration_us: int,
+) -> NoteRoll:
+    """
+    把激活音轨的音符开始 / 结束事件按 (音轨, 音高) 依次配对为区间，
+    被精简的音符标记为丢弃。
+    """
+    if len(events) == 0:
+        return NoteRoll.empty()
+    track_count = int(events.tracks.max()) + 1
+    track_mask = np.zeros(track_count, dtype=bool)
+    for t in active_track_idx_set:
+        if t < track_count:
+            track_mask[t] = True
+    active = track_mask[events.tracks]
+    on_idx = np.flatnonzero(active & (events.codes == EVENT_NOTE_ON))
+    if on_idx.size == 0:
+        return NoteRoll.empty()
+    off_idx = np.flatnonzero(active & (events.codes == EVENT_NOTE_OFF))
+
+    starts = events.times[on_idx]
+    # 没有结束事件的音符持续到歌曲结尾
+    ends = np.full(on_idx.size, max(duration_us, int(starts[-1])), dtype=np.int64)
+    if off_idx.size:
+        # 同一 (音轨, 音高) 的第 k 个开始事件与第 k 个结束事件配对
+        pair_keys = events.tracks.astype(np.int64) * 128 + events.notes
+        on_keys = _ranked_keys(pair_keys[on_idx])
+        off_keys = _ranked_keys(pair_keys[off_idx])
+        off_order = np.argsort(off_keys, kind="stable")
+        sorted_off_keys = off_keys[off_order]
+        pos = np.minimum(np.searchsorted(sorted_off_keys, on_keys), off_idx.size - 1)
+        paired = sorted_off_keys[pos] == on_keys
+        off_times = events.times[off_idx[off_order[pos]]]
+        ends = np.where(paired, np.maximum(off_times, starts), ends)
+
+    pitches = events.notes[on_idx]
+    status = pitch_status[pitches]
+    if skip is not None:
+        status = np.where(skip[on_idx], NOTE_DROPPED, status).astype(np.uint8)
+    return NoteRoll(starts, ends, pitches, status)
+
+
+def _ranked_keys(keys: np.ndarray) -> np.ndarray:
+    """(配对键, 该键第几次出现) 合并为一个 int64，出现次序按原数组顺序"""
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+    first = np.searchsorted(sorted_keys, sorted_keys, side="left")
+    ranks = np.empty(keys.size, dtype=np.int64)
+    ranks[order] = np.arange(keys.size) - first
+    return keys * (1 << 32) + ranks
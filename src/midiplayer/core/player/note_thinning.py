@@ -0,0 +1,133 @@
+# 密集 midi 的音符精简：同时发音数上限 + 每秒按键数预算
+# 游戏每帧能识别的按键有限，黑乐谱 / 管弦乐每秒上千个音符会让执行线程越来越落后。
+# 编译时按和弦分组，用“天际线”优先级（最高音旋律、最低音低音、其余从高到低）保留音符，
+# 被精简的音符连同与之配对的音符结束事件一起跳过，不影响其他音符的按键引用计数。
+
+from collections import deque
+
+import numpy as np
+
+from midiplayer.core.player.key_actions import KeyActionTable, chord_group_starts
+from midiplayer.core.player.timeline import EVENT_NOTE_OFF, EVENT_NOTE_ON, EventTimeline
+
+# 每秒按键数预算的统计窗口（微秒）
+BUDGET_WINDOW_US = 1_000_000
+
+
+def skyline_order(notes: list[int]) -> list[int]:
+    """
+    和弦内音符的保留优先级（返回下标）：最高音、最低音、其余从高到低，
+    同一音高重复出现的排在最后
+    """
+    by_pitch = sorted(range(len(notes)), key=lambda i: -notes[i])
+    seen = set()
+    unique, duplicate = [], []
+    for i in by_pitch:
+        (duplicate if notes[i] in seen else unique).append(i)
+        seen.add(notes[i])
+    if len(unique) > 2:
+        unique.insert(1, unique.pop())
+    return unique + duplicate
+
+
+def thin_note_events(
+    table: KeyActionTable,
+    events: EventTimeline,
+    active_track_idx_set: set[int],
+    chord_tolerance_us: int,
+    max_polyphony: int,
+    max_keys_per_second: int,
+) -> tuple[np.ndarray | None, int]:
+    """
+    计算需要跳过的事件，返回 (事件掩码, 精简的音符数)；未启用或无需精简时掩码为 None。
+    max_polyphony 限制一个和弦内同时按下的音符数，
+    max_keys_per_second 限制任意 1 秒内按下的键数（含控制键），0 表示不限制。
+    """
+    if (max_polyphony <= 0 and max_keys_per_second <= 0) or len(events) == 0:
+        return None, 0
+
+    track_count = int(events.tracks.max()) + 1
+    track_mask = np.zeros(track_count, dtype=bool)
+    for t in active_track_idx_set:
+        if t < track_count:
+            track_mask[t] = True
+    mapped = np.array([a is not None for a in table.actions], dtype=bool)
+    # 每个音符按下的键数（控制键 + 普通键）
+    cost = np.array(
+        [len(a.modifiers) + len(a.keys) if a else 0 for a in table.actions],
+        dtype=np.int64,
+    )
+    playable = track_mask[events.tracks] & mapped[events.notes]
+
+    on_idx = np.flatnonzero(playable & (events.codes == EVENT_NOTE_ON))
+    if on_idx.size == 0:
+        return None, 0
+    starts = chord_group_starts(events.times[on_idx], chord_tolerance_us)
+    ends = np.append(starts[1:], on_idx.size)
+
+    if max_keys_per_second <= 0:
+        # 只限制同时发音数：只需处理超出上限的和弦
+        groups = np.flatnonzero(ends - starts > max_polyphony)
+    else:
+        groups = np.arange(starts.size)
+    if groups.size == 0:
+        return None, 0
+
+    notes = events.notes[on_idx].tolist()
+    on_costs = cost[events.notes[on_idx]].tolist()
+    # 和弦在组内最后一个事件处派发
+    group_times = events.times[on_idx[ends - 1]].tolist()
+    polyphony = max_polyphony if max_polyphony > 0 else None
+    # 预算窗口内已按下的 (时刻, 键数)
+    window: deque[tuple[int, int]] = deque()
+    window_keys = 0
+
+    dropped: list[int] = []
+    for g in groups.tolist():
+        s, e = int(starts[g]), int(ends[g])
+        order = skyline_order(notes[s:e])
+        keep = order[:polyphony]
+        dropped.extend(s + i for i in order[len(keep) :])
+
+        if max_keys_per_second > 0:
+            t = group_times[g]
+            while window and t - window[0][0] >= BUDGET_WINDOW_US:
+                window_keys -= window.popleft()[1]
+            used = 0
+            for n, i in enumerate(keep):
+                c = on_costs[s + i]
+                if window_keys + used + c > max_keys_per_second:
+                    dropped.extend(s + j for j in keep[n:])
+                    break
+                used += c
+            if used:
+                window.append((t, used))
+                window_keys += used
+
+    if not dropped:
+        return None, 0
+    skip = np.zeros(len(events), dtype=bool)
+    skip[on_idx[dropped]] = True
+    _skip_paired_note_offs(events, playable, skip)
+    return skip, len(dropped)
+
+
+def _skip_paired_note_offs(events: EventTimeline, playable: np.ndarray, skip):
+    """按 (音轨, 音高) 先进先出配对，被跳过的音符对应的结束事件也跳过"""
+    pair_keys = events.tracks.astype(np.int64) * 128 + events.notes
+    affected = np.unique(pair_keys[skip])
+    sel = np.flatnonzero(
+        playable
+        & np.isin(pair_keys, affected)
+        & ((events.codes == EVENT_NOTE_ON) | (events.codes == EVENT_NOTE_OFF))
+    )
+    pending: dict[int, deque] = {}
+    skip_offs = []
+    codes = events.codes[sel].tolist()
+    for i, code, key in zip(sel.tolist(), codes, pair_keys[sel].tolist()):
+        queue = pending.setdefault(key, deque())
+        if code == EVENT_NOTE_ON:
+            queue.append(skip[i])
+        elif queue and queue.popleft():
+            skip_offs.append(i)
+    skip[skip_offs] = True
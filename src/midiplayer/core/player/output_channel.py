@@ -0,0 +1,231 @@
+# 按键输出通道
+# 一个通道 = 按键状态 + 输出后端 + 时序记录。播放器的主通道之外，可以再挂多个附加通道：
+# 同一首歌按各自的音轨子集、预设与拟合结果编译出各自的派发时间线，由同一个调度线程按同一个
+# 时钟锚点派发。所有通道共用主通道的任务环与执行线程，同一时刻的步骤依次紧接着发送，
+# 通道间的偏差只取决于发送本身的耗时，不受线程调度影响。
+
+import threading
+
+from loguru import logger
+
+from midiplayer.core.player.clock import real_time_ns
+from midiplayer.core.player.jitter_stats import JitterRecorder
+from midiplayer.core.player.key_output import KeyOutput
+from midiplayer.core.player.key_steps import (
+    DispatchTimeline,
+    KeyStep,
+    filter_step_ops,
+    make_key_step,
+)
+from midiplayer.core.player.playback_program import PlaybackProgram
+from midiplayer.core.player.task_ring import TaskRing
+
+
+class OutputChannel:
+    """
+    一路按键输出。主通道的播放程序与派发游标由播放器维护；
+    附加通道的程序（来自主程序的 channels）与游标保存在这里，只在持有 clock_lock 时修改。
+    传入 task_ring 的是附加通道：任务写入主通道的环，由主通道的执行线程执行。
+    """
+
+    def __init__(
+        self,
+        name: str,
+        output: KeyOutput,
+        clock,
+        task_ring: TaskRing | None = None,
+    ):
+        self.name = name
+        self.output = output
+        self.clock = clock
+        # 调度线程 -> 执行线程的任务环（只在持有 clock_lock 时写入）
+        self.attached = task_ring is not None
+        self.task_ring = task_ring if task_ring is not None else TaskRing()
+        # 共用本通道任务环的附加通道（整体替换元组）
+        self.followers: tuple["OutputChannel", ...] = ()
+        self.jitter = JitterRecorder()
+        # 保护按键状态
+        self.keys_lock = threading.Lock()
+        self.pressed_keys: set[str] = set()
+        # 输出延迟补偿（微秒，真实时间）
+        self.output_latency_us = 0.0
+
+        self.program: PlaybackProgram | None = None
+        self.event_index = 0
+
+        self.running = False
+        self.thread: threading.Thread | None = None
+
+    ### 生命周期 ###
+    def start(self):
+        if self.attached or self.thread:
+            return
+        if self.task_ring.closed:
+            self.task_ring = TaskRing()
+            for channel in self.followers:
+                channel.task_ring = self.task_ring
+        self.running = True
+        self.thread = threading.Thread(target=self._executor_thread)
+        self.thread.start()
+
+    def stop(self):
+        if self.attached:
+            return
+        self.running = False
+        self.task_ring.close()
+        if self.thread:
+            self.thread.join()
+        self.thread = None
+
+    def set_output(self, output: KeyOutput):
+        """切换输出后端：先用旧后端抬起按下的键，再替换（执行线程每个任务读取一次）"""
+        with self.keys_lock:
+            self.release_pressed_keys_now()
+            self.output = output
+
+    ### 调度线程侧（持有 clock_lock） ###
+    def set_program(self, program: PlaybackProgram | None, playback_us: int):
+        """安装附加通道的程序，游标定位到当前播放时刻"""
+        self.program = program
+        self.event_index = (
+            program.dispatch.find_index(playback_us) if program is not None else 0
+        )
+
+    def advance(
+        self,
+        dispatch: DispatchTimeline,
+        index: int,
+        playback_us: float,
+        anchor: tuple[int, int, float],
+        send: bool = True,
+    ) -> tuple[int, float | None]:
+        """
+        派发按输出延迟提前后已到期的步骤 [index, end)。
+        返回 (end, 下一个步骤提前后的播放时刻，没有剩余步骤时为 None)；
+        send 为 False 时只推进游标（按键由引擎进程派发）
+        """
+        lead_us = self.output_latency_us * anchor[2]
+        end = dispatch.find_due_end(playback_us + lead_us, index)
+        if send and end > index:
+            self.dispatch_due(dispatch, index, end, anchor)
+        if end < len(dispatch):
+            return end, int(dispatch.times[end]) - lead_us
+        return end, None
+
+    def dispatch_due(
+        self,
+        dispatch: DispatchTimeline,
+        start: int,
+        end: int,
+        anchor: tuple[int, int, float],
+    ):
+        """
+        把 [start, end) 的步骤推入任务环；到期真实时刻由锚点反算。
+        不唤醒执行线程：各通道本轮的步骤全部入环后由调用方统一 notify
+        """
+        steps = dispatch.steps
+        times = dispatch.times
+        push = self.task_ring.push
+        owner = self if self.attached else None
+        record_queued = self.jitter.record_queued
+        now_ns = self.clock.now_ns
+        for i in range(start, end):
+            # 提前派发的步骤在未来，延迟统计仍以乐谱时刻为准
+            event_us = int(times[i])
+            seq = record_queued(event_us, real_time_ns(event_us, *anchor), now_ns())
+            if not push(steps[i], seq, owner):
+                self.jitter.record_dropped()
+        self.jitter.record_queue_depth(len(self.task_ring))
+
+    def restore_held_keys(self, dispatch: DispatchTimeline, index: int, playback_us):
+        """
+        按派发时间线的按键快照，重新按下 index 处应按住的键。
+        在 flush 之后入环，执行线程先释放旧的按键再执行它。
+        """
+        held = dispatch.held_keys_at(index)
+        if not held:
+            return
+        now_ns = self.clock.now_ns()
+        seq = self.jitter.record_queued(int(playback_us), now_ns, now_ns)
+        step = make_key_step(tuple((k, True) for k in held))
+        if not self.task_ring.push(step, seq, self if self.attached else None):
+            self.jitter.record_dropped()
+        self.task_ring.notify()
+
+    ### 执行线程 ###
+    def _executor_thread(self):
+        """
+        执行线程：批量取出任务环中的任务，展开为按键序列交给所属通道的输出后端。
+        附加通道的任务按入环顺序紧接着执行
+        """
+        ring = self.task_ring
+        tasks = ring.tasks
+        seqs = ring.seqs
+        epochs = ring.epochs
+        owners = ring.owners
+        mask = ring.mask
+        seen_epoch = ring.flush_state[1]
+        while self.running:
+            # 暂停 / 停止 / 跳转：跳过作废的任务，释放按下的键
+            flush_to, flush_epoch = ring.flush_state
+            skipped = ring.skip_flushed(flush_to)
+            if skipped:
+                self.jitter.record_dropped(skipped)
+            if flush_epoch != seen_epoch:
+                seen_epoch = flush_epoch
+                self._release_all_channels()
+
+            head = ring.head
+            tail = ring.tail
+            if head == tail:
+                ring.wait(seen_epoch)
+                continue
+
+            # 批量执行 [head, tail)。途中发生 flush（前面的任务已作废），
+            # 或遇到 flush 之后写入的任务（需要先释放按键）时回到循环开头处理
+            while (
+                head < tail
+                and epochs[head & mask] == seen_epoch
+                and ring.flush_state[0] <= head
+            ):
+                i = head & mask
+                channel = owners[i] or self
+                try:
+                    channel._execute_step(tasks[i])
+                    channel.jitter.record_done(seqs[i], self.clock.now_ns())
+                except Exception as e:
+                    logger.debug(f"按键执行出错: {channel.name} {e}")
+                    channel.jitter.record_dropped()
+                head += 1
+                ring.head = head
+
+        # 线程退出前，释放所有按键，防止卡键
+        logger.debug(f"执行线程退出，释放所有按键: {self.name}")
+        self._release_all_channels()
+
+    def _release_all_channels(self):
+        for channel in (self, *self.followers):
+            with channel.keys_lock:
+                channel.release_pressed_keys_now()
+
+    def _execute_step(self, step: KeyStep):
+        """发送一个步骤的按键操作并更新按键状态（从不睡眠，间隔已编入时间线）"""
+        with self.keys_lock:
+            pressed_keys = self.pressed_keys
+            if pressed_keys.issuperset(step.need_held):
+                ops = step.ops
+            else:
+                ops = filter_step_ops(step.ops, pressed_keys)
+            pressed_keys.difference_update(step.released)
+            pressed_keys.update(step.held)
+            if ops:
+                self.output.send(ops)
+
+    def release_pressed_keys_now(self):
+        """(持有 keys_lock) 立即通过当前后端抬起所有按下的键"""
+        if self.pressed_keys:
+            try:
+                self.output.send(tuple((k, False) for k in self.pressed_keys))
+            except Exception as e:
+                logger.warning(f"释放按键失败: {self.name} {e}")
+            self.pressed_keys.clear()
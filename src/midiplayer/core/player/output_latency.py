@@ -0,0 +1,151 @@
+# 输出延迟补偿
+# 从步骤到期到按键真正注入之间有一段大致固定的延迟：调度线程唤醒误差、任务环交接、
+# 执行线程与后端调用的耗时，且随输出后端与机器不同。调度线程按该延迟提前派发步骤，
+# 使按键落在乐谱时刻上。
+# 初值由校准得到：用记录输出在真实时钟下播放一段合成歌曲，记录输出在与真实后端相同的位置
+# （send 调用处）打时间戳，测得“到期 -> 发送”的延迟中位数。记录输出观测不到真实后端
+# 自身的调用耗时，这部分由每首歌播放结束后的实测延迟按比例修正，按后端分别保存。
+
+import threading
+
+from loguru import logger
+from PySide6.QtCore import QObject, QRunnable, Signal, Slot
+
+from midiplayer.core.player.clock import SystemClock, playback_time_us, real_time_ns
+from midiplayer.core.player.key_output import RecordingOutput
+from midiplayer.core.player.output_channel import OutputChannel
+from midiplayer.core.player.playback_program import (
+    CompileOptions,
+    build_playback_program,
+)
+from midiplayer.core.player.synthetic import benchmark_mapping, synthetic_song
+from midiplayer.core.player.type import MdPlaybackParam
+from midiplayer.core.player.wait_strategy import (
+    WaitStrategy,
+    calibrate_wait_overshoot,
+    is_profile_valid,
+    machine_key,
+)
+from midiplayer.core.utils.config import cfg
+
+LATENCY_PROFILE_VERSION = 1
+# 补偿量上限（微秒），防止异常测量把整首歌提前太多
+MAX_OUTPUT_LATENCY_US = 20000
+# 校准用合成歌曲的时长（秒）与每秒音符数
+CALIBRATION_SECONDS = 1.5
+CALIBRATION_NPS = 40
+# 每首歌结束后按实测剩余延迟修正补偿量的比例，以及参与修正所需的最少按键数
+REFINE_GAIN = 0.5
+REFINE_MIN_EVENTS = 50
+
+
+def _is_local_profile(profile: dict | None) -> bool:
+    return (
+        isinstance(profile, dict)
+        and profile.get("version") == LATENCY_PROFILE_VERSION
+        and profile.get("machine") == machine_key()
+    )
+
+
+def latency_offset_us(profile: dict | None, backend: str) -> float | None:
+    """读取本机某个后端的补偿量（微秒），未校准或不属于本机时返回 None"""
+    if not _is_local_profile(profile):
+        return None
+    offset = profile.get("offsets_us", {}).get(backend)
+    return float(offset) if isinstance(offset, (int, float)) else None
+
+
+def with_latency_offset(profile: dict | None, backend: str, offset_us: float) -> dict:
+    """返回写入了某个后端补偿量的新 profile（不属于本机的旧记录直接丢弃）"""
+    offsets = dict(profile.get("offsets_us", {})) if _is_local_profile(profile) else {}
+    offsets[backend] = round(min(max(offset_us, 0.0), MAX_OUTPUT_LATENCY_US), 1)
+    return {
+        "version": LATENCY_PROFILE_VERSION,
+        "machine": machine_key(),
+        "offsets_us": offsets,
+    }
+
+
+def refined_offset_us(offset_us: float, residual_p50_us: float) -> float:
+    """按一首歌实测的剩余延迟中位数修正补偿量"""
+    return min(
+        max(offset_us + REFINE_GAIN * residual_p50_us, 0.0), MAX_OUTPUT_LATENCY_US
+    )
+
+
+def calibrate_output_latency(seconds: float, notes_per_second: float) -> float:
+    """
+    输出延迟校准：真实时钟下按调度线程的方式（OutputChannel.advance + WaitStrategy）
+    把一段合成歌曲派发到记录输出，返回“步骤到期 -> 发送”的延迟中位数（微秒）。
+    不创建 QMidiPlayer，可在运行中的播放器的后台线程池里执行（基准测试也使用它）。
+    """
+    clock = SystemClock()
+    channel = OutputChannel("latency-calibration", RecordingOutput(clock), clock)
+    dispatch = build_playback_program(
+        synthetic_song(seconds, notes_per_second, 1),
+        MdPlaybackParam(
+            midiPath="latency-calibration", noteToKeyMapping=benchmark_mapping()
+        ),
+        CompileOptions(),
+    ).dispatch
+    profile = cfg.get(cfg.player_timing_profile)
+    if not is_profile_valid(profile):
+        profile = calibrate_wait_overshoot()
+    wait_strategy = WaitStrategy(profile, cfg.get(cfg.player_spin_cpu_budget), clock)
+    # 没有外部唤醒，只用于带超时的等待
+    wake_up_event = threading.Event()
+
+    channel.start()
+    try:
+        anchor = (clock.now_ns(), 0, 1.0)
+        index = 0
+        while True:
+            now_ns = clock.now_ns()
+            index, next_us = channel.advance(
+                dispatch, index, playback_time_us(now_ns, *anchor), anchor
+            )
+            channel.task_ring.notify()
+            if next_us is None:
+                break
+            target_real_time_ns = real_time_ns(next_us, *anchor)
+            spin_wait, wait_timeout_sec = wait_strategy.plan(
+                (target_real_time_ns - now_ns) / 1000
+            )
+            if spin_wait:
+                wait_strategy.spin_until(target_real_time_ns)
+            else:
+                wait_strategy.wait_event(wake_up_event, wait_timeout_sec)
+        # 等执行线程处理完队列中的按键
+        channel.task_ring.join()
+    finally:
+        channel.stop()
+    return max(0.0, channel.jitter.stats()["p50_us"])
+
+
+class LatencyCalibrationSignals(QObject):
+    # 信号: (后端名, 测得的延迟 微秒)
+    finished = Signal(str, float)
+    # 信号: (后端名)
+    failed = Signal(str)
+
+
+class LatencyCalibrationTask(QRunnable):
+    """后台任务：用记录输出跑一段合成歌曲，测量调度到发送的延迟"""
+
+    def __init__(self, backend: str):
+        super().__init__()
+        self.backend = backend
+        self.signals = LatencyCalibrationSignals()
+
+    @Slot()
+    def run(self):
+        try:
+            latency_us = calibrate_output_latency(
+                CALIBRATION_SECONDS, CALIBRATION_NPS
+            )
+        except Exception as e:
+            logger.opt(exception=e).warning("输出延迟校准失败")
+            self.signals.failed.emit(self.backend)
+            return
+        logger.debug(f"输出延迟校准完成: {self.backend} {latency_us}us")
+        self.signals.finished.emit(self.backend, latency_us)
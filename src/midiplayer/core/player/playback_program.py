@@ -0,0 +1,230 @@
+from typing import NamedTuple
+
+import mido
+from loguru import logger
+
+from midiplayer.core.player.compiled_song import CompiledSong, compile_song
+from midiplayer.core.player.key_actions import (
+    KeyActionTable,
+    build_key_action_table,
+    compile_event_tasks,
+)
+from midiplayer.core.player.key_steps import (
+    DispatchTimeline,
+    compile_dispatch_timeline,
+)
+from midiplayer.core.player.note_fitting import NoteFitting
+from midiplayer.core.player.note_roll import (
+    NoteRoll,
+    build_note_roll,
+    note_status_by_pitch,
+)
+from midiplayer.core.player.note_thinning import thin_note_events
+from midiplayer.core.player.smf_reader import read_smf
+from midiplayer.core.player.song_cache import SongCache
+from midiplayer.core.player.type import MdPlaybackParam
+
+
+class OutputChannelParam(NamedTuple):
+    """附加输出通道：同一首歌按自己的音轨子集与预设编译，发送到自己的输出后端"""
+
+    name: str
+    note_to_key_mapping: dict
+    # 演奏音轨下标（None 表示全部）
+    active_track_idxes: tuple[int, ...] | None
+    backend: str
+
+
+class CompileOptions(NamedTuple):
+    """影响编译结果的播放设置，任一变化都需要重新编译播放程序"""
+
+    disable_note_fitting: bool = False
+    key_press_and_up: bool = False
+    # 合并为和弦的时间容差（微秒），0 表示只合并完全同时的事件
+    chord_tolerance_us: int = 0
+    # 控制键 -> 普通键 -> 控制键抬起之间、以及点按按下到抬起的间隔（微秒）
+    press_delay_us: int = 0
+    # 一个和弦内最多按下的音符数、任意 1 秒内最多按下的键数，0 表示不限制
+    max_polyphony: int = 0
+    max_keys_per_second: int = 0
+    # 附加输出通道，每个通道编译出自己的派发时间线
+    channels: tuple[OutputChannelParam, ...] = ()
+
+
+class PlaybackProgram:
+    """
+    一次编译得到的不可变播放程序：歌曲 + 激活音轨 + 拟合结果 + 派发时间线。
+    调度线程只读取它，参数变化时由后台线程编译新的实例，再整体替换指针。
+    """
+
+    __slots__ = (
+        "midi_path",
+        "md_playback_param",
+        "options",
+        "song",
+        "active_track_idx_set",
+        "note_to_key",
+        "correct_ratio",
+        "octave_change",
+        "key_actions",
+        "dispatch",
+        "thinned_notes",
+        "note_roll",
+        "channels",
+    )
+
+    def __init__(
+        self,
+        midi_path: str,
+        md_playback_param: MdPlaybackParam,
+        options: CompileOptions,
+        song: CompiledSong,
+        active_track_idx_set: set[int],
+        note_to_key: dict,
+        correct_ratio: float,
+        octave_change: int,
+        key_actions: KeyActionTable,
+        dispatch: DispatchTimeline,
+        thinned_notes: int = 0,
+        note_roll: NoteRoll | None = None,
+        channels: tuple["PlaybackProgram", ...] = (),
+    ):
+        self.midi_path = midi_path
+        self.md_playback_param = md_playback_param
+        self.options = options
+        self.song = song
+        self.active_track_idx_set = active_track_idx_set
+        self.note_to_key = note_to_key
+        self.correct_ratio = correct_ratio
+        self.octave_change = octave_change
+        self.key_actions = key_actions
+        self.dispatch = dispatch
+        # 因同时发音数 / 每秒按键数限制而跳过的音符数
+        self.thinned_notes = thinned_notes
+        # 钢琴卷帘显示用的音符区间（含每个音符的拟合状态）
+        self.note_roll = note_roll if note_roll is not None else NoteRoll.empty()
+        # 附加输出通道的程序（与 options.channels 一一对应，共用同一首歌）
+        self.channels = channels
+
+    def matches(
+        self, md_playback_param: MdPlaybackParam, options: CompileOptions
+    ) -> bool:
+        """判断该程序是否由相同的参数与配置编译而来（可直接复用）"""
+        return (
+            same_playback_param(self.md_playback_param, md_playback_param)
+            and self.options == options
+        )
+
+
+def same_playback_param(a: MdPlaybackParam, b: MdPlaybackParam) -> bool:
+    return (
+        a.midi_path == b.midi_path
+        and a.note_to_key_mapping == b.note_to_key_mapping
+        and a.active_track_idxes == b.active_track_idxes
+    )
+
+
+def load_song(midi_path: str, song_cache: SongCache) -> CompiledSong:
+    """优先读取编译缓存，未命中时用快速解析器解析（失败回退到 mido）并写入缓存"""
+    song = song_cache.load(midi_path)
+    if song is not None:
+        logger.debug(f"命中歌曲缓存: {midi_path}")
+        return song
+    try:
+        song = read_smf(midi_path)
+    except Exception as e:
+        logger.warning(f"快速解析失败，回退到 mido: {midi_path} {e}")
+        song = compile_song(mido.MidiFile(midi_path))
+    song_cache.store(midi_path, song)
+    return song
+
+
+def resolve_active_tracks(
+    song: CompiledSong, md_playback_param: MdPlaybackParam
+) -> set[int]:
+    """控制音轨始终激活，演奏音轨按用户选择（None 表示全部）"""
+    return set(
+        song.control_track_index
+        + (
+            song.music_track_index
+            if md_playback_param.active_track_idxes is None
+            else [
+                song.music_track_index[t]
+                for t in md_playback_param.active_track_idxes
+                if 0 <= t < len(song.music_track_index)
+            ]
+        )
+    )
+
+
+def build_playback_program(
+    song: CompiledSong,
+    md_playback_param: MdPlaybackParam,
+    options: CompileOptions,
+) -> PlaybackProgram:
+    """处理按键调整 以及 音轨处理，编译出完整的播放程序（含各附加通道的程序）"""
+    active_track_idx_set = resolve_active_tracks(song, md_playback_param)
+    note_to_key, correct_ratio, octave_change = NoteFitting(
+        song.note_counts(active_track_idx_set),
+        md_playback_param.note_to_key_mapping,
+        options.disable_note_fitting,
+    )
+    key_actions = build_key_action_table(note_to_key, options.key_press_and_up)
+    skip, thinned_notes = thin_note_events(
+        key_actions,
+        song.events,
+        active_track_idx_set,
+        options.chord_tolerance_us,
+        options.max_polyphony,
+        options.max_keys_per_second,
+    )
+    if thinned_notes:
+        logger.info(f"密集音符精简: 跳过 {thinned_notes} 个音符")
+    event_tasks = compile_event_tasks(
+        key_actions,
+        song.events,
+        active_track_idx_set,
+        options.chord_tolerance_us,
+        skip,
+    )
+    dispatch = compile_dispatch_timeline(
+        event_tasks,
+        song.events.times,
+        options.press_delay_us,
+        options.key_press_and_up,
+    )
+    note_roll = build_note_roll(
+        song.events,
+        active_track_idx_set,
+        note_status_by_pitch(
+            key_actions, note_to_key, md_playback_param.note_to_key_mapping
+        ),
+        skip,
+        song.duration_us,
+    )
+    return PlaybackProgram(
+        midi_path=md_playback_param.midi_path,
+        md_playback_param=md_playback_param,
+        options=options,
+        song=song,
+        active_track_idx_set=active_track_idx_set,
+        note_to_key=note_to_key,
+        correct_ratio=correct_ratio,
+        octave_change=octave_change,
+        key_actions=key_actions,
+        dispatch=dispatch,
+        thinned_notes=thinned_notes,
+        note_roll=note_roll,
+        channels=tuple(
+            build_playback_program(
+                song,
+                MdPlaybackParam(
+                    midiPath=md_playback_param.midi_path,
+                    noteToKeyMapping=channel.note_to_key_mapping,
+                    active_tracks=channel.active_track_idxes,
+                ),
+                options._replace(channels=()),
+            )
+            for channel in options.channels
+        ),
+    )
@@ -0,0 +1,39 @@
+class PlaylistQueue:
+    """
+    播放队列：记录当前歌曲列表，给出接下来将要播放的歌曲，用于后台预加载。
+    列表只覆盖当前页时（complete=False）不做回绕，页尾的下一首交由翻页逻辑处理。
+    """
+
+    def __init__(self):
+        self.paths: list[str] = []
+        self.complete = True
+        self._index_of: dict[str, int] = {}
+
+    def set_paths(self, paths: list[str], complete: bool = True):
+        self.paths = list(paths)
+        self.complete = complete
+        self._index_of = {p: i for i, p in enumerate(self.paths)}
+
+    def upcoming(self, current_path: str | None, count: int, single_loop: bool):
+        """返回当前歌曲之后的至多 count 首歌曲路径"""
+        if not current_path or count <= 0:
+            return []
+        if single_loop:
+            return [current_path]
+
+        idx = self._index_of.get(current_path)
+        if idx is None:
+            return []
+        n = len(self.paths)
+        result = []
+        for step in range(1, count + 1):
+            next_idx = idx + step
+            if next_idx >= n:
+                if not self.complete:
+                    break
+                next_idx %= n
+            path = self.paths[next_idx]
+            if path in result:
+                break
+            result.append(path)
+        return result
@@ -0,0 +1,76 @@
+from typing import Callable
+
+from loguru import logger
+from PySide6.QtCore import QObject, QRunnable, Signal, Slot
+
+from midiplayer.core.player.compiled_song import CompiledSong
+from midiplayer.core.player.playback_program import (
+    CompileOptions,
+    build_playback_program,
+    load_song,
+)
+from midiplayer.core.player.song_cache import SongCache
+from midiplayer.core.player.type import MdPlaybackParam
+
+
+class PrepareSignals(QObject):
+    """
+    定义播放准备任务可以发出的信号，均携带请求 id 以便丢弃过期结果。
+    """
+
+    # 信号: (请求id, 进度 0-100)
+    progress = Signal(int, int)
+    # 信号: (请求id, PlaybackProgram)
+    finished = Signal(int, object)
+    # 信号: (请求id, 错误信息)
+    failed = Signal(int, str)
+
+
+class PrepareTask(QRunnable):
+    """
+    后台任务：解析 / 读取缓存 -> 音符拟合 -> 编译按键任务，产出新的 PlaybackProgram。
+    若传入已编译的 song（参数变化时的重新拟合），则跳过解析阶段。
+    每个阶段之间检查是否已被新的请求取代，过期则直接退出。
+    """
+
+    def __init__(
+        self,
+        request_id: int,
+        md_playback_param: MdPlaybackParam,
+        song_cache: SongCache,
+        options: CompileOptions,
+        is_cancelled: Callable[[int], bool],
+        song: CompiledSong | None = None,
+    ):
+        super().__init__()
+        self.request_id = request_id
+        self.md_playback_param = md_playback_param
+        self.song_cache = song_cache
+        self.options = options
+        self.is_cancelled = is_cancelled
+        self.song = song
+        self.signals = PrepareSignals()
+
+    @Slot()
+    def run(self):
+        try:
+            self.signals.progress.emit(self.request_id, 0)
+            song = self.song
+            if song is None:
+                song = load_song(self.md_playback_param.midi_path, self.song_cache)
+                if self.is_cancelled(self.request_id):
+                    logger.debug(f"准备任务已过期: {self.md_playback_param.midi_path}")
+                    return
+                self.signals.progress.emit(self.request_id, 60)
+
+            program = build_playback_program(song, self.md_playback_param, self.options)
+            if self.is_cancelled(self.request_id):
+                logger.debug(f"准备任务已过期: {self.md_playback_param.midi_path}")
+                return
+            self.signals.progress.emit(self.request_id, 100)
+            self.signals.finished.emit(self.request_id, program)
+        except Exception as e:
+            logger.opt(exception=e).error(
+                f"准备歌曲失败: {self.md_playback_param.midi_path}"
+            )
+            self.signals.failed.emit(self.request_id, str(e))
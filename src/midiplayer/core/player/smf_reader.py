@@ -0,0 +1,273 @@
+# 播放专用的 Standard MIDI File 快速解析器
+# 直接在 mmap 映射的文件缓冲区上解码，只提取播放需要的事件
+# （note on/off、tempo、拍号、音轨名），不为每条消息创建对象。
+
+import mmap
+import os
+from array import array
+
+import numpy as np
+
+from midiplayer.core.player.compiled_song import CompiledSong, build_compiled_song
+from midiplayer.core.player.timeline import EVENT_NOTE_OFF, EVENT_NOTE_ON
+
+# 通道消息（按高 4 位）携带的数据字节数
+_CHANNEL_DATA_LEN = {
+    0x80: 2,
+    0x90: 2,
+    0xA0: 2,
+    0xB0: 2,
+    0xC0: 1,
+    0xD0: 1,
+    0xE0: 2,
+}
+
+# 系统公共消息（按状态字节）携带的数据字节数，未列出的（实时消息等）只有状态字节
+_SYSTEM_COMMON_DATA_LEN = {
+    0xF1: 1,
+    0xF2: 2,
+    0xF3: 1,
+}
+
+META_TRACK_NAME = 0x03
+META_END_OF_TRACK = 0x2F
+META_SET_TEMPO = 0x51
+META_TIME_SIGNATURE = 0x58
+
+
+def read_smf(path: str) -> CompiledSong:
+    """
+    解析 midi 文件并编译为 CompiledSong。
+    对常见的文件损坏做容错：RIFF(RMID) 封装、chunk 长度越界、文件末尾的音轨被截断、
+    缺少 end_of_track、音轨数与头部不符、未知 chunk 等。
+    无法解析时抛出 ValueError，由调用方回退到 mido。
+    """
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < 14:
+            raise ValueError(f"文件过小，不是有效的 midi 文件: {path}")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return _parse(mm, size)
+
+
+class _TrackTruncated(Exception):
+    """音轨数据在 chunk 末尾之前被截断"""
+
+
+def _read_u32(mm, pos: int) -> int:
+    return int.from_bytes(mm[pos : pos + 4], "big")
+
+
+def _parse(mm, size: int) -> CompiledSong:
+    header_pos = mm.find(b"MThd", 0, min(size, 1024))
+    if header_pos < 0:
+        raise ValueError("未找到 MThd 头")
+    header_len = _read_u32(mm, header_pos + 4)
+    if header_len < 6 or header_pos + 14 > size:
+        raise ValueError("MThd 头长度无效")
+    division = int.from_bytes(mm[header_pos + 12 : header_pos + 14], "big")
+    if division & 0x8000 or division == 0:
+        # SMPTE 时间格式不在播放支持范围内
+        raise ValueError("不支持的时间格式")
+    ticks_per_beat = division
+
+    raw_ticks = array("q")
+    raw_codes = array("B")
+    raw_notes = array("B")
+    raw_tracks = array("H")
+    tempo_events = []  # (tick, tempo)
+    time_signatures = []  # (tick, 分子, 分母)
+    track_names = []
+    track_sizes = []
+    music_track_index = []
+    control_track_index = []
+    end_tick = 0
+
+    pos = header_pos + 8 + header_len
+    while pos + 8 <= size:
+        chunk_id = mm[pos : pos + 4]
+        chunk_len = _read_u32(mm, pos + 4)
+        start = pos + 8
+        # chunk 长度越界时截断到文件末尾
+        end = min(start + chunk_len, size)
+        pos = end
+        if chunk_id != b"MTrk":
+            continue
+
+        track_idx = len(track_sizes)
+        note_count_before = len(raw_ticks)
+        track_end_tick, msg_count, track_name, truncated = _parse_track(
+            mm,
+            start,
+            end,
+            track_idx,
+            raw_ticks,
+            raw_codes,
+            raw_notes,
+            raw_tracks,
+            tempo_events,
+            time_signatures,
+        )
+        if truncated and end < size:
+            # 截断的音轨后面还有数据：无法判断哪些字节可信，交给 mido 处理
+            raise ValueError(f"音轨 {track_idx} 在 chunk 内被截断")
+        track_names.append(track_name)
+        track_sizes.append(msg_count)
+        end_tick = max(end_tick, track_end_tick)
+        if len(raw_ticks) == note_count_before:
+            control_track_index.append(track_idx)
+        else:
+            music_track_index.append(track_idx)
+
+    if not track_sizes:
+        raise ValueError("未找到任何 MTrk 音轨")
+
+    return build_compiled_song(
+        ticks_per_beat=ticks_per_beat,
+        raw_events=(
+            np.frombuffer(raw_ticks, dtype=np.int64),
+            np.frombuffer(raw_codes, dtype=np.uint8),
+            np.frombuffer(raw_notes, dtype=np.uint8),
+            np.frombuffer(raw_tracks, dtype=np.uint16),
+        ),
+        tempo_events=tempo_events,
+        time_signatures=time_signatures,
+        track_names=track_names,
+        track_sizes=track_sizes,
+        music_track_index=music_track_index,
+        control_track_index=control_track_index,
+        end_tick=end_tick,
+    )
+
+
+def _parse_track(
+    mm,
+    i: int,
+    end: int,
+    track_idx: int,
+    raw_ticks: array,
+    raw_codes: array,
+    raw_notes: array,
+    raw_tracks: array,
+    tempo_events: list,
+    time_signatures: list,
+) -> tuple[int, int, str, bool]:
+    """解析单个音轨，返回 (结束 tick, 消息数, 音轨名, 是否被截断)"""
+    # 热循环中使用局部变量，减少属性查找
+    append_tick = raw_ticks.append
+    append_code = raw_codes.append
+    append_note = raw_notes.append
+    append_track = raw_tracks.append
+    channel_data_len = _CHANNEL_DATA_LEN
+
+    tick = 0
+    status = 0
+    msg_count = 0
+    track_name = None
+
+    # 每次读取前都检查不越过本 chunk 的末尾，截断的数据不会读到下一个 chunk 中
+    try:
+        while i < end:
+            # 变长 delta time
+            b = mm[i]
+            i += 1
+            delta = b & 0x7F
+            while b & 0x80:
+                if i >= end:
+                    raise _TrackTruncated
+                b = mm[i]
+                i += 1
+                delta = (delta << 7) | (b & 0x7F)
+            tick += delta
+            if i >= end:
+                raise _TrackTruncated
+
+            b = mm[i]
+            if b & 0x80:
+                i += 1
+                if b < 0xF0:
+                    # 通道消息，更新 running status
+                    status = b
+                elif b == 0xFF:
+                    # meta 事件（不影响 running status）
+                    if i >= end:
+                        raise _TrackTruncated
+                    meta_type = mm[i]
+                    length, i = _read_varlen(mm, i + 1, end)
+                    if i + length > end:
+                        raise _TrackTruncated
+                    msg_count += 1
+                    if meta_type == META_SET_TEMPO and length >= 3:
+                        tempo_events.append(
+                            (tick, (mm[i] << 16) | (mm[i + 1] << 8) | mm[i + 2])
+                        )
+                    elif meta_type == META_TIME_SIGNATURE and length >= 2:
+                        # 分母以 2 的幂存储，限制范围防止损坏数据溢出
+                        time_signatures.append(
+                            (tick, mm[i], 1 << min(mm[i + 1], 6))
+                        )
+                    elif meta_type == META_TRACK_NAME and track_name is None:
+                        track_name = mm[i : i + length].decode("latin1")
+                    elif meta_type == META_END_OF_TRACK:
+                        break
+                    i += length
+                    continue
+                elif b == 0xF0 or b == 0xF7:
+                    # sysex，按长度跳过
+                    length, i = _read_varlen(mm, i, end)
+                    if i + length > end:
+                        raise _TrackTruncated
+                    msg_count += 1
+                    i += length
+                    continue
+                else:
+                    # 系统公共 / 实时消息（文件中少见）：跳过其数据字节。
+                    # 与 mido 一致，之后缺少状态字节的数据不再按之前的通道消息解析
+                    data_len = _SYSTEM_COMMON_DATA_LEN.get(b, 0)
+                    if i + data_len > end:
+                        raise _TrackTruncated
+                    msg_count += 1
+                    status = 0
+                    i += data_len
+                    continue
+            elif not status:
+                # 缺少 status 的数据字节（损坏），跳过
+                i += 1
+                continue
+
+            kind = status & 0xF0
+            if kind == 0x90 or kind == 0x80:
+                if i + 2 > end:
+                    raise _TrackTruncated
+                msg_count += 1
+                note = mm[i] & 0x7F
+                velocity = mm[i + 1]
+                i += 2
+                append_tick(tick)
+                append_code(
+                    EVENT_NOTE_ON if (kind == 0x90 and velocity) else EVENT_NOTE_OFF
+                )
+                append_note(note)
+                append_track(track_idx)
+            else:
+                i += channel_data_len[kind]
+                if i > end:
+                    raise _TrackTruncated
+                msg_count += 1
+    except _TrackTruncated:
+        return tick, msg_count, track_name or "", True
+
+    return tick, msg_count, track_name or "", False
+
+
+def _read_varlen(mm, i: int, end: int) -> tuple[int, int]:
+    """读取变长整数，返回 (值, 之后的位置)；越过 chunk 末尾时抛出 _TrackTruncated"""
+    value = 0
+    while True:
+        if i >= end:
+            raise _TrackTruncated
+        b = mm[i]
+        i += 1
+        value = (value << 7) | (b & 0x7F)
+        if not b & 0x80:
+            return value, i
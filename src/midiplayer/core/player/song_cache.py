@@ -0,0 +1,238 @@
+import hashlib
+import json
+import os
+import struct
+import threading
+from pathlib import Path
+
+import numpy as np
+from loguru import logger
+
+from midiplayer.core.player.compiled_song import CompiledSong
+from midiplayer.core.player.timeline import EventTimeline
+
+# 缓存文件格式：
+#   MAGIC(4) | 版本(uint32) | 头部长度(uint32) | 头部JSON | 对齐填充 | 各数组原始字节
+# 数组按 ARRAY_ALIGN 对齐，读取时使用 np.memmap 直接映射，不做任何解析
+MAGIC = b"MPSC"
+CACHE_VERSION = 2
+ARRAY_ALIGN = 64
+CACHE_SUFFIX = ".song"
+HASH_CHUNK_SIZE = 1024 * 1024
+# 头部JSON末尾预留的空白字节：mtime 变化后头部变长时仍可原地更新
+HEADER_SLACK = 32
+
+
+def _file_hash(path: str) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        while chunk := f.read(HASH_CHUNK_SIZE):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _align(n: int) -> int:
+    return (n + ARRAY_ALIGN - 1) // ARRAY_ALIGN * ARRAY_ALIGN
+
+
+class SongCache:
+    """
+    编译后歌曲的磁盘缓存（LRU，按总大小淘汰）。
+    以 路径 为键，通过 文件大小 + mtime 快速校验，mtime 不一致时再用内容哈希确认。
+    """
+
+    def __init__(self, cache_dir: Path, max_size_mb: int):
+        self.cache_dir = Path(cache_dir)
+        self.max_size_bytes = max_size_mb * 1024 * 1024
+        self.lock = threading.Lock()
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def set_max_size_mb(self, max_size_mb: int):
+        with self.lock:
+            self.max_size_bytes = max_size_mb * 1024 * 1024
+            self._evict()
+
+    def _entry_path(self, midi_path: str) -> Path:
+        norm = os.path.normcase(os.path.abspath(midi_path))
+        key = hashlib.sha1(norm.encode("utf-8")).hexdigest()
+        return self.cache_dir / f"{key}{CACHE_SUFFIX}"
+
+    # --- 读取 ---
+    def load(self, midi_path: str) -> CompiledSong | None:
+        if self.max_size_bytes <= 0:
+            return None
+        entry = self._entry_path(midi_path)
+        with self.lock:
+            try:
+                if not entry.exists():
+                    return None
+                header, data_offset = self._read_header(entry)
+                if header is None:
+                    return None
+                if not self._validate(midi_path, entry, header):
+                    return None
+                song = self._map_song(entry, header, data_offset)
+                # 更新 mtime 作为 LRU 的最近使用时间
+                os.utime(entry)
+                return song
+            except Exception as e:
+                logger.opt(exception=e).warning(f"读取歌曲缓存失败: {midi_path}")
+                return None
+
+    def _read_header(self, entry: Path) -> tuple[dict | None, int]:
+        with open(entry, "rb") as f:
+            prefix = f.read(12)
+            if len(prefix) < 12 or prefix[:4] != MAGIC:
+                return None, 0
+            version, header_len = struct.unpack("<II", prefix[4:])
+            if version != CACHE_VERSION:
+                return None, 0
+            header = json.loads(f.read(header_len).decode("utf-8"))
+        return header, _align(12 + header_len)
+
+    def _validate(self, midi_path: str, entry: Path, header: dict) -> bool:
+        stat = os.stat(midi_path)
+        if stat.st_size != header["size"]:
+            return False
+        if stat.st_mtime_ns == header["mtime_ns"]:
+            return True
+        # mtime 变化但大小一致（例如文件被复制/touch），用内容哈希确认
+        if _file_hash(midi_path) != header["hash"]:
+            return False
+        header["mtime_ns"] = stat.st_mtime_ns
+        if not self._rewrite_header_mtime(entry, header):
+            # 无法更新 mtime 时丢弃条目，重新编译后写入新条目，避免以后每次都重新哈希
+            logger.debug(f"歌曲缓存头部无法原地更新，丢弃条目: {midi_path}")
+            try:
+                entry.unlink(missing_ok=True)
+            except OSError:
+                pass
+            return False
+        return True
+
+    def _rewrite_header_mtime(self, entry: Path, header: dict) -> bool:
+        """
+        原地更新头部（头部长度不变，末尾的预留空白吸收变长的部分），
+        返回是否成功
+        """
+        with open(entry, "r+b") as f:
+            f.seek(4)
+            version, header_len = struct.unpack("<II", f.read(8))
+            new_header = json.dumps(header).encode("utf-8")
+            if len(new_header) > header_len:
+                return False
+            f.seek(12)
+            f.write(new_header.ljust(header_len, b" "))
+        return True
+
+    def _map_song(self, entry: Path, header: dict, data_offset: int) -> CompiledSong:
+        arrays = {}
+        for name, (dtype, shape, offset) in header["arrays"].items():
+            if int(np.prod(shape)) == 0:
+                arrays[name] = np.empty(shape, dtype=dtype)
+            else:
+                arrays[name] = np.memmap(
+                    entry,
+                    dtype=dtype,
+                    mode="r",
+                    offset=data_offset + offset,
+                    shape=tuple(shape),
+                )
+        return CompiledSong(
+            events=EventTimeline(
+                arrays["times"], arrays["codes"], arrays["notes"], arrays["tracks"]
+            ),
+            tempo_events=arrays["tempo_events"],
+            time_signatures=arrays["time_signatures"],
+            ticks_per_beat=header["ticks_per_beat"],
+            note_histograms=arrays["note_histograms"],
+            track_names=header["track_names"],
+            track_sizes=header["track_sizes"],
+            music_track_index=header["music_track_index"],
+            control_track_index=header["control_track_index"],
+            duration_us=header["duration_us"],
+        )
+
+    # --- 写入 ---
+    def store(self, midi_path: str, song: CompiledSong):
+        if self.max_size_bytes <= 0:
+            return
+        entry = self._entry_path(midi_path)
+        tmp_entry = entry.with_suffix(".tmp")
+        with self.lock:
+            try:
+                stat = os.stat(midi_path)
+                arrays = {
+                    "times": song.events.times,
+                    "codes": song.events.codes,
+                    "notes": song.events.notes,
+                    "tracks": song.events.tracks,
+                    "tempo_events": song.tempo_events,
+                    "time_signatures": song.time_signatures,
+                    "note_histograms": song.note_histograms,
+                }
+                layout = {}
+                offset = 0
+                for name, arr in arrays.items():
+                    layout[name] = (arr.dtype.str, list(arr.shape), offset)
+                    offset = _align(offset + arr.nbytes)
+
+                header = {
+                    "path": os.path.abspath(midi_path),
+                    "size": stat.st_size,
+                    "mtime_ns": stat.st_mtime_ns,
+                    "hash": _file_hash(midi_path),
+                    "ticks_per_beat": song.ticks_per_beat,
+                    "duration_us": int(song.duration_us),
+                    "track_names": song.track_names,
+                    "track_sizes": song.track_sizes,
+                    "music_track_index": song.music_track_index,
+                    "control_track_index": song.control_track_index,
+                    "arrays": layout,
+                }
+                header_bytes = json.dumps(header).encode("utf-8")
+                header_bytes += b" " * HEADER_SLACK
+                data_offset = _align(12 + len(header_bytes))
+
+                with open(tmp_entry, "wb") as f:
+                    f.write(MAGIC)
+                    f.write(struct.pack("<II", CACHE_VERSION, len(header_bytes)))
+                    f.write(header_bytes)
+                    for name, arr in arrays.items():
+                        f.seek(data_offset + layout[name][2])
+                        f.write(np.ascontiguousarray(arr).tobytes())
+                os.replace(tmp_entry, entry)
+                logger.debug(f"歌曲缓存已写入: {midi_path}")
+            except Exception as e:
+                # 例如 Windows 下旧缓存正被映射无法替换，忽略即可
+                logger.opt(exception=e).warning(f"写入歌曲缓存失败: {midi_path}")
+                try:
+                    tmp_entry.unlink(missing_ok=True)
+                except OSError:
+                    pass
+                return
+            self._evict()
+
+    def _evict(self):
+        """按最近使用时间淘汰，直到总大小不超过上限"""
+        try:
+            entries = []
+            total = 0
+            for p in self.cache_dir.glob(f"*{CACHE_SUFFIX}"):
+                st = p.stat()
+                entries.append((st.st_mtime_ns, st.st_size, p))
+                total += st.st_size
+            if total <= self.max_size_bytes:
+                return
+            entries.sort()
+            for _, size, p in entries:
+                if total <= self.max_size_bytes:
+                    break
+                try:
+                    p.unlink()
+                    total -= size
+                except OSError:
+                    # 正在被映射的文件无法删除，跳过
+                    continue
+        except Exception as e:
+            logger.opt(exception=e).warning("清理歌曲缓存失败")
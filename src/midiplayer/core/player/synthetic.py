@@ -0,0 +1,66 @@
+# 合成测试歌曲：基准测试与输出延迟校准共用，
+# 随机和弦序列配合 3 个八度的按键映射，所有音符都能映射到按键。
+
+import numpy as np
+
+from midiplayer.core.player.compiled_song import CompiledSong, build_compiled_song
+from midiplayer.core.player.timeline import EVENT_NOTE_OFF, EVENT_NOTE_ON
+from midiplayer.core.player.type import MIDI_NOTE_MAP
+
+# 合成歌曲：1 tick = 1 ms（ticks_per_beat=1000, tempo=1s/拍）
+SYNTHETIC_TICKS_PER_BEAT = 1000
+SYNTHETIC_TEMPO = 1_000_000
+
+# 常见的 3 个八度 21 键布局，黑键用 shift + 下方白键
+WHITE_KEY_ROWS = {3: "zxcvbnm", 4: "asdfghj", 5: "qwertyu"}
+WHITE_NOTE_NAMES = ["C", "D", "E", "F", "G", "A", "B"]
+
+
+def benchmark_mapping() -> dict:
+    """基准测试使用的 音符名 -> 按键 映射"""
+    mapping = {}
+    for octave, row in WHITE_KEY_ROWS.items():
+        for name, key in zip(WHITE_NOTE_NAMES, row):
+            mapping[f"{name}{octave}"] = key
+            if name not in ("E", "B"):
+                mapping[f"{name}#{octave}"] = ["shift", key]
+    return mapping
+
+
+def synthetic_song(
+    seconds: float, notes_per_second: float, chord_size: int, seed: int = 0
+) -> CompiledSong:
+    """生成随机和弦序列：音符落在映射范围内，时值 50~400ms"""
+    rng = np.random.default_rng(seed)
+    low = MIDI_NOTE_MAP.get_midi_by_note("C3")
+    high = MIDI_NOTE_MAP.get_midi_by_note("B5")
+
+    onset_count = max(1, int(seconds * notes_per_second / chord_size))
+    onsets = np.sort(rng.integers(0, int(seconds * 1000), onset_count))
+    on_ticks = np.repeat(onsets, chord_size)
+    notes = rng.integers(low, high + 1, on_ticks.size)
+    off_ticks = on_ticks + rng.integers(50, 400, on_ticks.size)
+
+    ticks = np.concatenate([on_ticks, off_ticks]).astype(np.int64)
+    codes = np.concatenate(
+        [
+            np.full(on_ticks.size, EVENT_NOTE_ON, dtype=np.uint8),
+            np.full(off_ticks.size, EVENT_NOTE_OFF, dtype=np.uint8),
+        ]
+    )
+    return build_compiled_song(
+        ticks_per_beat=SYNTHETIC_TICKS_PER_BEAT,
+        raw_events=(
+            ticks,
+            codes,
+            np.concatenate([notes, notes]).astype(np.uint8),
+            np.ones(ticks.size, dtype=np.uint16),
+        ),
+        tempo_events=[(0, SYNTHETIC_TEMPO)],
+        time_signatures=[(0, 4, 4)],
+        track_names=["tempo", "synthetic"],
+        track_sizes=[1, int(ticks.size)],
+        music_track_index=[1],
+        control_track_index=[0],
+        end_tick=int(ticks.max()) + 1,
+    )
@@ -0,0 +1,100 @@
+# 调度线程 -> 执行线程的任务环形缓冲区（单生产者 / 单消费者）
+# 槽位预先分配：任务是编译期构造好的元组，入队只写入引用与序号，不产生新对象。
+# tail / flush_state 只由生产者写（持有 clock_lock），head 只由消费者写，
+# 依赖 CPython 中单个属性与元素读写的原子性，入队与出队都不需要加锁。
+
+import threading
+import time
+from array import array
+
+# 环容量（2 的幂）；积压超过容量说明执行线程已严重落后，新任务直接丢弃
+DEFAULT_CAPACITY = 1 << 14
+
+
+class TaskRing:
+    """
+    预分配的 SPSC 任务环。
+    生产者 push 后调用 notify（仅在消费者睡眠时才真正唤醒）；
+    flush 整体替换 flush_state = (flush_to, epoch)，O(1) 作废所有未执行的任务，
+    消费者看到新的 epoch 后跳过这些任务并释放按下的键。
+    每个槽位记录写入时的 epoch：flush 之后写入的任务（例如重新按下应按住的键）
+    一定在消费者处理完这次 flush（释放按键）之后才执行。
+    """
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        assert capacity & (capacity - 1) == 0, "capacity 必须为 2 的幂"
+        self.capacity = capacity
+        self.mask = capacity - 1
+        self.tasks: list = [None] * capacity
+        self.seqs = array("q", bytes(8 * capacity))
+        self.epochs = array("q", bytes(8 * capacity))
+        # 任务所属的输出通道（None 表示环的所有者），多路输出共用一个环
+        self.owners: list = [None] * capacity
+
+        self.head = 0  # 消费者：下一个要执行的位置
+        self.tail = 0  # 生产者：下一个写入的位置
+        # (此位置之前的任务已作废, flush 次数)，整体替换，读者一次取得一致的两个值
+        self.flush_state = (0, 0)
+        self.closed = False
+
+        self._wakeup = threading.Event()
+        self._sleeping = False
+
+    def __len__(self) -> int:
+        return self.tail - self.head
+
+    # --- 生产者 ---
+    def push(self, task, seq: int, owner=None) -> bool:
+        """写入一个任务，环已满时返回 False（任务被丢弃）"""
+        tail = self.tail
+        if tail - self.head >= self.capacity:
+            return False
+        i = tail & self.mask
+        self.tasks[i] = task
+        self.seqs[i] = seq
+        self.epochs[i] = self.flush_state[1]
+        self.owners[i] = owner
+        self.tail = tail + 1
+        return True
+
+    def notify(self):
+        """一批任务写入完毕后调用；消费者未睡眠时没有任何开销"""
+        if self._sleeping:
+            self._wakeup.set()
+
+    def flush(self):
+        """作废所有未执行的任务，并要求消费者释放按下的键"""
+        self.flush_state = (self.tail, self.flush_state[1] + 1)
+        self._wakeup.set()
+
+    def close(self):
+        self.closed = True
+        self._wakeup.set()
+
+    # --- 消费者 ---
+    def skip_flushed(self, flush_to: int) -> int:
+        """跳过 flush_to 之前已作废的任务，返回跳过的数量"""
+        head = self.head
+        if flush_to > head:
+            self.head = flush_to
+            return flush_to - head
+        return 0
+
+    def wait(self, seen_epoch: int):
+        """没有新任务、没有新的 flush 时睡眠，直到 notify / flush / close"""
+        self._wakeup.clear()
+        self._sleeping = True
+        # 先声明睡眠再复查，生产者要么看到 _sleeping，要么这里看到新的 tail
+        if (
+            self.tail == self.head
+            and self.flush_state[1] == seen_epoch
+            and not self.closed
+        ):
+            self._wakeup.wait()
+        self._sleeping = False
+
+    # --- 其他线程 ---
+    def join(self, poll_sec: float = 0.001):
+        """等待已写入的任务全部执行完毕（基准测试用）"""
+        while self.head < self.tail and not self.closed:
+            time.sleep(poll_sec)
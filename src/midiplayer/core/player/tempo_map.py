@@ -0,0 +1,115 @@
+import numpy as np
+
+# 默认 tempo（微秒/拍），对应 120 BPM
+DEFAULT_TEMPO = 500000
+# 默认拍号 4/4
+DEFAULT_TIME_SIGNATURE = (4, 4)
+
+
+class TempoMap:
+    """
+    速度与拍号映射表，支持 tick / 微秒 / 小节:拍 之间的互相转换。
+    tempo 与拍号都按分段存储，并对每段起点做前缀和，
+    任意位置的转换只需一次二分查找，复杂度 O(log n)。
+    标量与 numpy 数组输入均可。
+    """
+
+    def __init__(
+        self,
+        ticks_per_beat: int,
+        tempo_events: np.ndarray | None = None,
+        time_signatures: np.ndarray | None = None,
+    ):
+        """
+        tempo_events    : (n, 2) 的 [tick, tempo]
+        time_signatures : (m, 3) 的 [tick, 分子, 分母]
+        """
+        self.ticks_per_beat = ticks_per_beat
+        self._build_tempo_segments(tempo_events)
+        self._build_bar_segments(time_signatures)
+
+    # --- 构建 ---
+    @staticmethod
+    def _dedup_sorted(events: np.ndarray, default_row: tuple) -> np.ndarray:
+        """按 tick 稳定排序，同一 tick 上的多个事件以最后一个为准，并保证从 tick 0 开始"""
+        if events is None or len(events) == 0:
+            return np.asarray([default_row], dtype=np.int64)
+        events = np.asarray(events, dtype=np.int64)
+        events = events[np.argsort(events[:, 0], kind="stable")]
+        # 保留每个 tick 的最后一个事件
+        keep = np.append(events[1:, 0] != events[:-1, 0], True)
+        events = events[keep]
+        if events[0, 0] != 0:
+            events = np.vstack([np.asarray([default_row], dtype=np.int64), events])
+        return events
+
+    def _build_tempo_segments(self, tempo_events):
+        segs = self._dedup_sorted(tempo_events, (0, DEFAULT_TEMPO))
+        self.seg_ticks = segs[:, 0].copy()
+        # 损坏文件中的 tempo=0 会让 微秒 -> tick 除零，按 1 微秒/拍处理
+        self.seg_tempos = np.maximum(segs[:, 1], 1)
+        # 每段起点的绝对微秒数（前缀和）
+        self.seg_micros = np.zeros(len(self.seg_ticks), dtype=np.int64)
+        if len(self.seg_ticks) > 1:
+            self.seg_micros[1:] = np.cumsum(
+                np.diff(self.seg_ticks) * self.seg_tempos[:-1] // self.ticks_per_beat
+            )
+
+    def _build_bar_segments(self, time_signatures):
+        segs = self._dedup_sorted(time_signatures, (0, *DEFAULT_TIME_SIGNATURE))
+        self.sig_ticks = segs[:, 0].copy()
+        self.sig_numerators = segs[:, 1].copy()
+        # 一拍的 tick 数由拍号分母决定（4 分音符 = ticks_per_beat）
+        self.sig_beat_ticks = np.maximum(
+            self.ticks_per_beat * 4 // np.maximum(segs[:, 2], 1), 1
+        )
+        self.sig_bar_ticks = self.sig_beat_ticks * np.maximum(self.sig_numerators, 1)
+        # 每段起点所在的小节序号（0 基），拍号变化视为新小节开始
+        self.sig_bars = np.zeros(len(self.sig_ticks), dtype=np.int64)
+        if len(self.sig_ticks) > 1:
+            bars_per_seg = -(-np.diff(self.sig_ticks) // self.sig_bar_ticks[:-1])
+            self.sig_bars[1:] = np.cumsum(bars_per_seg)
+
+    # --- tick <-> 微秒 ---
+    def tick_to_us(self, ticks):
+        idx = np.searchsorted(self.seg_ticks, ticks, side="right") - 1
+        return (
+            self.seg_micros[idx]
+            + (ticks - self.seg_ticks[idx]) * self.seg_tempos[idx] // self.ticks_per_beat
+        )
+
+    def us_to_tick(self, micros):
+        idx = np.searchsorted(self.seg_micros, micros, side="right") - 1
+        return (
+            self.seg_ticks[idx]
+            + (np.asarray(micros, dtype=np.int64) - self.seg_micros[idx])
+            * self.ticks_per_beat
+            // self.seg_tempos[idx]
+        )
+
+    # --- tick <-> 小节:拍 ---
+    def tick_to_bar_beat(self, tick: int) -> tuple[int, int]:
+        """返回 (小节, 拍)，均为 1 基"""
+        idx = int(np.searchsorted(self.sig_ticks, tick, side="right")) - 1
+        offset = int(tick) - int(self.sig_ticks[idx])
+        bar_ticks = int(self.sig_bar_ticks[idx])
+        bar = int(self.sig_bars[idx]) + offset // bar_ticks
+        beat = (offset % bar_ticks) // int(self.sig_beat_ticks[idx])
+        return bar + 1, beat + 1
+
+    def bar_beat_to_tick(self, bar: int, beat: int = 1) -> int:
+        """(小节, 拍)，均为 1 基 -> tick"""
+        bar0 = max(bar - 1, 0)
+        idx = int(np.searchsorted(self.sig_bars, bar0, side="right")) - 1
+        return (
+            int(self.sig_ticks[idx])
+            + (bar0 - int(self.sig_bars[idx])) * int(self.sig_bar_ticks[idx])
+            + max(beat - 1, 0) * int(self.sig_beat_ticks[idx])
+        )
+
+    # --- 微秒 <-> 小节:拍 ---
+    def us_to_bar_beat(self, micros: int) -> tuple[int, int]:
+        return self.tick_to_bar_beat(int(self.us_to_tick(max(int(micros), 0))))
+
+    def bar_beat_to_us(self, bar: int, beat: int = 1) -> int:
+        return int(self.tick_to_us(self.bar_beat_to_tick(bar, beat)))
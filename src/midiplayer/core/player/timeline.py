@@ -0,0 +1,75 @@
+import numpy as np
+
+from midiplayer.core.player.tempo_map import TempoMap
+
+# 事件类型编码（uint8）
+EVENT_NOTE_OFF = 0
+EVENT_NOTE_ON = 1
+
+
+class EventTimeline:
+    """
+    列式存储的事件时间线：
+    - times  : int64  事件绝对时间（微秒）
+    - codes  : uint8  事件类型（EVENT_NOTE_ON / EVENT_NOTE_OFF）
+    - notes  : uint8  MIDI 音符编号
+    - tracks : uint16 所属音轨 index
+    所有数组按时间升序排列，长度一致。
+    """
+
+    __slots__ = ("times", "codes", "notes", "tracks")
+
+    def __init__(
+        self,
+        times: np.ndarray,
+        codes: np.ndarray,
+        notes: np.ndarray,
+        tracks: np.ndarray,
+    ):
+        self.times = times
+        self.codes = codes
+        self.notes = notes
+        self.tracks = tracks
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    @staticmethod
+    def empty() -> "EventTimeline":
+        return EventTimeline(
+            np.empty(0, dtype=np.int64),
+            np.empty(0, dtype=np.uint8),
+            np.empty(0, dtype=np.uint8),
+            np.empty(0, dtype=np.uint16),
+        )
+
+    def find_index(self, time_us: int) -> int:
+        """二分查找第一个时间戳 >= time_us 的事件"""
+        return int(np.searchsorted(self.times, time_us, side="left"))
+
+    def find_due_end(self, time_us: int, start: int = 0) -> int:
+        """二分查找第一个时间戳 > time_us 的事件（即 [start, end) 均已到期）"""
+        return start + int(
+            np.searchsorted(self.times[start:], time_us, side="right")
+        )
+
+
+def build_timeline(
+    ticks: np.ndarray,
+    codes: np.ndarray,
+    notes: np.ndarray,
+    tracks: np.ndarray,
+    tempo_map: TempoMap,
+) -> EventTimeline:
+    """按 tick 稳定排序，并通过 tempo 映射表向量化转换为微秒，生成列式时间线"""
+    if len(ticks) == 0:
+        return EventTimeline.empty()
+
+    order = np.argsort(ticks, kind="stable")
+    times = tempo_map.tick_to_us(ticks[order])
+    return EventTimeline(
+        times.astype(np.int64, copy=False),
+        codes[order],
+        notes[order],
+        tracks[order],
+    )
@@ -0,0 +1,155 @@
+# 调度线程的等待策略
+# 长等待交给 Event.wait（可被唤醒、不占 CPU），最后一小段用自旋补足精度。
+# 自旋窗口 = 本机 Event.wait 的超时误差（启动时校准 + 运行中在线更新），
+# 并受 CPU 预算约束：自旋占用超出预算时收缩窗口，以少量延迟换取 CPU。
+
+import os
+import platform
+import sys
+import threading
+import time
+
+from midiplayer.core.player.clock import SystemClock
+
+# 校准参数
+CALIBRATION_TIMEOUTS_US = (500, 1000, 2000, 5000)
+CALIBRATION_ROUNDS = 12
+PROFILE_VERSION = 1
+
+# 自旋窗口上下限（微秒）
+MIN_SPIN_WINDOW_US = 50
+MAX_SPIN_WINDOW_US = 4000
+# 在误差估计之上额外留出的余量
+SPIN_MARGIN_US = 100
+# 响应式轮询时间（微秒）：距下个事件较远时，最多睡这么久就苏醒检查状态
+RESPONSIVE_LOOP_TIME_US = 20000
+# CPU 预算统计窗口
+BUDGET_WINDOW_NS = 1_000_000_000
+# 在线误差估计的衰减系数（每次超时唤醒）
+OVERSHOOT_DECAY = 0.995
+
+
+def machine_key() -> str:
+    """用于判断校准结果是否属于本机"""
+    parts = (platform.node(), platform.machine(), os.cpu_count(), sys.version_info[:2])
+    return "|".join(map(str, parts))
+
+
+def calibrate_wait_overshoot(
+    timeouts_us=CALIBRATION_TIMEOUTS_US, rounds: int = CALIBRATION_ROUNDS
+) -> dict:
+    """
+    测量本机 Event.wait(timeout) 的实际超时误差（微秒）。
+    返回可持久化的 profile：{version, machine, p50_us, p99_us, max_us}
+    """
+    event = threading.Event()
+    overshoots = []
+    for _ in range(rounds):
+        for timeout_us in timeouts_us:
+            start = time.perf_counter_ns()
+            event.wait(timeout_us / 1_000_000)
+            elapsed_us = (time.perf_counter_ns() - start) / 1000
+            overshoots.append(max(0.0, elapsed_us - timeout_us))
+    overshoots.sort()
+    n = len(overshoots)
+    return {
+        "version": PROFILE_VERSION,
+        "machine": machine_key(),
+        "p50_us": round(overshoots[n // 2], 1),
+        "p99_us": round(overshoots[min(n - 1, int(n * 0.99))], 1),
+        "max_us": round(overshoots[-1], 1),
+    }
+
+
+def is_profile_valid(profile: dict | None) -> bool:
+    return (
+        isinstance(profile, dict)
+        and profile.get("version") == PROFILE_VERSION
+        and profile.get("machine") == machine_key()
+        and "p99_us" in profile
+    )
+
+
+class WaitStrategy:
+    """
+    自适应的混合等待策略，仅由调度线程使用（非线程安全）。
+    plan() 给出本轮等待方式，wait_event()/spin_until() 执行并反馈实际误差与自旋耗时。
+    """
+
+    def __init__(self, profile: dict, cpu_budget_percent: int, clock=SystemClock):
+        self.clock = clock
+        self.calibrated_overshoot_us = float(profile.get("p99_us", 1000))
+        # 在线误差估计：取最近误差的衰减最大值
+        self.overshoot_estimate_us = self.calibrated_overshoot_us
+        self.cpu_budget = cpu_budget_percent / 100
+        # 预算控制得到的窗口缩放系数 (0, 1]
+        self.budget_scale = 1.0
+
+        self._window_start_ns = clock.now_ns()
+        self._window_spin_ns = 0
+
+    def set_cpu_budget(self, cpu_budget_percent: int):
+        self.cpu_budget = cpu_budget_percent / 100
+
+    @property
+    def spin_window_us(self) -> float:
+        """当前自旋窗口（微秒）：不超过该时长的等待直接自旋"""
+        if self.cpu_budget <= 0:
+            return 0
+        window = min(
+            MAX_SPIN_WINDOW_US, self.overshoot_estimate_us + SPIN_MARGIN_US
+        )
+        return max(MIN_SPIN_WINDOW_US, window * self.budget_scale)
+
+    def plan(self, wait_us: float) -> tuple[bool, float]:
+        """
+        根据距下一个事件的真实等待时间给出策略。
+        返回 (是否自旋, 睡眠秒数)；睡眠后由调用方重新计算，进入自旋窗口后再自旋。
+        """
+        if wait_us <= 1:
+            return False, 0
+        spin_window_us = self.spin_window_us
+        if wait_us <= spin_window_us:
+            return True, 0
+        # 睡到窗口边缘即醒来，唤醒误差由自旋窗口吸收
+        sleep_us = min(wait_us - spin_window_us, RESPONSIVE_LOOP_TIME_US)
+        return False, sleep_us / 1_000_000
+
+    def wait_event(self, event: threading.Event, timeout_sec: float | None) -> bool:
+        """带超时等待事件，并在超时唤醒时更新误差估计"""
+        clock = self.clock
+        if timeout_sec is None or timeout_sec <= 0:
+            return clock.wait(event, timeout_sec)
+        start = clock.now_ns()
+        woken = clock.wait(event, timeout_sec)
+        if not woken:
+            overshoot_us = (clock.now_ns() - start) / 1000 - timeout_sec * 1e6
+            self.overshoot_estimate_us = max(
+                min(overshoot_us, MAX_SPIN_WINDOW_US),
+                self.overshoot_estimate_us * OVERSHOOT_DECAY,
+                # 不低于校准值的一半，避免短时间内过度收缩
+                self.calibrated_overshoot_us * 0.5,
+            )
+        return woken
+
+    def spin_until(self, target_ns: int):
+        """自旋到目标时间，并统计自旋耗时用于 CPU 预算控制"""
+        start = self.clock.now_ns()
+        self._account_spin(start, self.clock.spin_until(target_ns))
+
+    def _account_spin(self, start_ns: int, end_ns: int):
+        self._window_spin_ns += end_ns - start_ns
+        elapsed_ns = end_ns - self._window_start_ns
+        if elapsed_ns < BUDGET_WINDOW_NS:
+            return
+        usage = self._window_spin_ns / elapsed_ns
+        if usage > self.cpu_budget:
+            # 超出预算：按比例收缩窗口
+            self.budget_scale = max(
+                0.05, self.budget_scale * self.cpu_budget / usage
+            )
+        elif usage < self.cpu_budget * 0.5:
+            # 预算充足：逐步恢复
+            self.budget_scale = min(1.0, self.budget_scale * 1.25)
+        self._window_start_ns = end_ns
+        self._window_spin_ns = 0
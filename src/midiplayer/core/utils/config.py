@@ -2,6 +2,8 @@ from qfluentwidgets import (
     BoolValidator,
     ConfigItem,
     FolderValidator,
+    OptionsConfigItem,
+    OptionsValidator,
     QConfig,
     RangeConfigItem,
     RangeValidator,
@@ -53,6 +55,74 @@ class AppConfig(QConfig):
     player_play_key_press_and_up = ConfigItem(
         "player", "play_key_press_and_up", False, BoolValidator()
     )
+    # 时间相差在此范围内（微秒）的音符合并为和弦一次发送，0 表示只合并完全同时的音符
+    player_chord_tolerance_us = RangeConfigItem(
+        "player", "chord_tolerance_us", 1000, RangeValidator(0, 20000)
+    )
+    # 密集 midi 精简：一个和弦内最多按下的音符数，0 表示不限制
+    player_max_polyphony = RangeConfigItem(
+        "player", "max_polyphony", 0, RangeValidator(0, 32)
+    )
+    # 密集 midi 精简：任意 1 秒内最多按下的键数（含控制键），0 表示不限制
+    player_max_keys_per_second = RangeConfigItem(
+        "player", "max_keys_per_second", 0, RangeValidator(0, 2000)
+    )
+    # 编译后歌曲磁盘缓存的大小上限（MB），0 表示关闭缓存
+    player_song_cache_size_mb = RangeConfigItem(
+        "player", "song_cache_size_mb", 256, RangeValidator(0, 2048)
+    )
+    # 后台预加载接下来的歌曲数量，用于无缝切歌，0 表示关闭
+    player_prefetch_count = RangeConfigItem(
+        "player", "prefetch_count", 1, RangeValidator(0, 2)
+    )
+    # 调度线程自旋等待可占用的单核 CPU 百分比，0 表示只睡眠不自旋
+    player_spin_cpu_budget = RangeConfigItem(
+        "player", "spin_cpu_budget", 25, RangeValidator(0, 100)
+    )
+    # 本机 Event.wait 超时误差的校准结果（按机器记录，变化后自动重新校准）
+    player_timing_profile = ConfigItem(
+        "player", "timing_profile", {}, serializer=JsonSerializer()
+    )
+    # 按输出延迟提前派发按键，使按键落在乐谱时刻上
+    player_latency_compensation = ConfigItem(
+        "player", "latency_compensation", True, BoolValidator()
+    )
+    # 本机各输出后端的延迟补偿量（校准后随播放实测修正，机器变化后自动重新校准）
+    player_output_latency = ConfigItem(
+        "player", "output_latency", {}, serializer=JsonSerializer()
+    )
+    # 附加输出通道：[{"name", "preset", "tracks", "backend"}]，同一首歌按各自的预设与音轨
+    # 子集（tracks 省略为全部）同步发送到各自的输出后端
+    player_output_channels = ConfigItem(
+        "player", "output_channels", [], serializer=JsonSerializer()
+    )
+    # 在独立进程中调度并发送按键，不与界面及后台任务共享 GIL
+    player_process_engine = ConfigItem(
+        "player", "process_engine", False, BoolValidator()
+    )
+    # 播放优先模式：播放期间暂停索引构建、限制后台线程池、推迟数据库写入、降低子进程优先级
+    player_playback_priority = ConfigItem(
+        "player", "playback_priority", True, BoolValidator()
+    )
+    # 在播放条上显示按键延迟统计
+    player_show_jitter_overlay = ConfigItem(
+        "player", "show_jitter_overlay", False, BoolValidator()
+    )
+    # 在播放页显示钢琴卷帘（音符及其拟合状态）
+    player_show_piano_roll = ConfigItem(
+        "player", "show_piano_roll", True, BoolValidator()
+    )
+    # 按键输出后端：sendinput（批量注入）/ pydirectinput（逐键）/ null（不发送按键）
+    player_output_backend = OptionsConfigItem(
+        "player",
+        "output_backend",
+        "sendinput",
+        OptionsValidator(["sendinput", "pydirectinput", "null"]),
+    )
+    # 每首歌结束时写入时序报告
+    player_jitter_report = ConfigItem(
+        "player", "jitter_report", False, BoolValidator()
+    )
 
 
 cfg = AppConfig()
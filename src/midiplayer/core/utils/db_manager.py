@@ -4,6 +4,7 @@ from typing import Optional
 
 from loguru import logger
 
+from midiplayer.core.utils.resource_governor import governor
 from midiplayer.core.utils.utils import Utils
 
 # --- 数据库管理器 ---
@@ -16,6 +17,9 @@ class DBManager:
         self.db_name = db_name
         self.conn = sqlite3.connect(self.db_name)
         self.create_table()
+        # 播放优先模式下推迟写入的音轨配置 {路径: 音轨列表}，解除后一次写入
+        self._pending_tracks: dict[str, list[int]] = {}
+        governor.add_release_hook(self.flush_pending_writes)
 
     def create_table(self):
         with self.conn:
@@ -189,6 +193,8 @@ class DBManager:
 
     def get_active_tracks(self, file_path: str) -> list[int] | None:
         """获取某首歌的激活音轨列表，如果没有记录返回 None"""
+        if file_path in self._pending_tracks:
+            return list(self._pending_tracks[file_path])
         try:
             cursor = self.conn.cursor()
             cursor.execute(
@@ -204,20 +210,39 @@ class DBManager:
         return None
 
     def save_active_tracks(self, file_path: str, tracks: list[int]):
-        """保存或更新音轨配置"""
+        """保存或更新音轨配置（播放期间推迟到播放停止后写入）"""
+        if governor.active:
+            self._pending_tracks[file_path] = list(tracks)
+            return
+        self._write_active_tracks([(file_path, tracks)])
+
+    def flush_pending_writes(self):
+        """写入播放期间推迟的音轨配置"""
+        if not self._pending_tracks:
+            return
+        pending = list(self._pending_tracks.items())
+        self._pending_tracks.clear()
+        self._write_active_tracks(pending)
+
+    def _write_active_tracks(self, items: list[tuple[str, list[int]]]):
         try:
-            tracks_json = json.dumps(tracks)
             with self.conn:
                 # INSERT OR REPLACE: 如果路径存在就更新，不存在就插入
-                self.conn.execute(
+                self.conn.executemany(
                     """
                     INSERT OR REPLACE INTO track_settings (file_path, active_tracks)
                     VALUES (?, ?)
                 """,
-                    (file_path, tracks_json),
+                    [(path, json.dumps(tracks)) for path, tracks in items],
                 )
         except Exception as e:
             logger.error(f"保存音轨配置失败: {e}")
 
+    def close(self):
+        """程序退出：写入推迟的音轨配置并关闭数据库"""
+        governor.remove_release_hook(self.flush_pending_writes)
+        self.flush_pending_writes()
+        self.conn.close()
+
     def __del__(self):
         self.conn.close()
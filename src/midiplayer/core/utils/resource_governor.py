@@ -0,0 +1,232 @@
+# 播放优先模式：播放期间集中压制后台工作（索引构建、解析线程池、子进程、数据库写入），
+# 暂停 / 停止后恢复。由播放器按播放状态切换，后台任务只需在合适的位置询问或等待。
+
+import inspect
+import os
+import sys
+import threading
+import weakref
+from contextlib import contextmanager
+
+from loguru import logger
+from PySide6.QtCore import QObject, QThread, QThreadPool, QTimer, Signal, Slot
+
+from midiplayer.core.utils.config import cfg
+
+# 停止播放后延迟解除压制，自动切到下一首时不来回切换
+RELEASE_DELAY_MS = 2000
+# 压制期间的 GIL 切换间隔（秒）：后台线程占着 GIL 时，调度线程最多等这么久
+THROTTLED_SWITCH_INTERVAL = 0.0005
+# 压制期间新建的 Whoosh 索引写入器：单进程、小内存
+THROTTLED_INDEX_LIMIT_MB = 32
+# 子进程降低到的优先级（POSIX nice 值）
+THROTTLED_NICE = 10
+
+# Windows 进程优先级
+_PROCESS_SET_INFORMATION = 0x0200
+_NORMAL_PRIORITY_CLASS = 0x0020
+_BELOW_NORMAL_PRIORITY_CLASS = 0x4000
+
+
+def _set_process_low_priority(pid: int, low: bool) -> bool:
+    """降低 / 恢复子进程的调度优先级，失败（进程已退出、无权限）时返回 False"""
+    try:
+        if sys.platform == "win32":
+            import ctypes
+
+            kernel32 = ctypes.windll.kernel32
+            handle = kernel32.OpenProcess(_PROCESS_SET_INFORMATION, False, pid)
+            if not handle:
+                return False
+            try:
+                priority = (
+                    _BELOW_NORMAL_PRIORITY_CLASS if low else _NORMAL_PRIORITY_CLASS
+                )
+                return bool(kernel32.SetPriorityClass(handle, priority))
+            finally:
+                kernel32.CloseHandle(handle)
+        # 非特权进程在 POSIX 上只能调低优先级，恢复失败时保持低优先级继续运行
+        os.setpriority(os.PRIO_PROCESS, pid, THROTTLED_NICE if low else 0)
+        return True
+    except OSError as e:
+        logger.debug(f"调整进程 {pid} 优先级失败: {e}")
+        return False
+
+
+class ResourceGovernor(QObject):
+    """
+    播放优先模式的集中开关。只在主线程切换；后台线程通过 active 查询，
+    或在 wait_released 处暂停到解除压制。
+    """
+
+    # 压制状态变化：(是否压制中)
+    signal_active_changed = Signal(bool)
+
+    def __init__(self):
+        super().__init__()
+        self._playing = False
+        self._shutdown = False
+        # 置位表示未压制，后台任务在其上等待
+        self._released = threading.Event()
+        self._released.set()
+        self._lock = threading.Lock()
+        # 受控线程池：[池的弱引用, 压制时的线程上限, 正常的线程上限]，
+        # 不延长池（及其所属播放器）的生命周期
+        self._pools: list[list] = []
+        # 受控子进程 pid
+        self._processes: set[int] = set()
+        # 解除压制时在主线程执行的回调（例如补写推迟的数据库写入）。
+        # 绑定方法以弱引用保存，不延长其所属对象的生命周期
+        self._release_hooks: list = []
+        self._switch_interval = sys.getswitchinterval()
+
+        self._release_timer = QTimer(self)
+        self._release_timer.setSingleShot(True)
+        self._release_timer.setInterval(RELEASE_DELAY_MS)
+        self._release_timer.timeout.connect(lambda: self._apply(False))
+        cfg.player_playback_priority.valueChanged.connect(self._on_enabled_change)
+
+    @property
+    def active(self) -> bool:
+        return not self._released.is_set()
+
+    ### 注册 ###
+    def register_pool(self, pool: QThreadPool, throttled_max: int = 1):
+        """压制期间把线程池的并发上限降到 throttled_max"""
+        if self._find_pool(pool) is not None:
+            return
+        entry = [weakref.ref(pool), throttled_max, pool.maxThreadCount()]
+        self._pools.append(entry)
+        if self.active:
+            pool.setMaxThreadCount(min(throttled_max, entry[2]))
+
+    def unregister_pool(self, pool: QThreadPool):
+        """不再管理线程池，压制中时恢复其正常上限"""
+        entry = self._find_pool(pool)
+        if entry is None:
+            return
+        self._pools.remove(entry)
+        if self.active:
+            pool.setMaxThreadCount(entry[2])
+
+    def _find_pool(self, pool: QThreadPool) -> list | None:
+        for entry in self._pools:
+            if entry[0]() is pool:
+                return entry
+        return None
+
+    def register_process(self, pid: int):
+        """登记后台子进程，压制期间降低其优先级"""
+        with self._lock:
+            self._processes.add(pid)
+            if self.active:
+                _set_process_low_priority(pid, True)
+
+    def unregister_process(self, pid: int):
+        with self._lock:
+            self._processes.discard(pid)
+
+    def add_release_hook(self, hook):
+        if inspect.ismethod(hook):
+            self._release_hooks.append(weakref.WeakMethod(hook))
+        else:
+            # 普通函数强引用保存，取值方式与弱引用一致
+            self._release_hooks.append(lambda: hook)
+
+    def remove_release_hook(self, hook):
+        self._release_hooks = [ref for ref in self._release_hooks if ref() != hook]
+
+    ### 后台任务使用 ###
+    def wait_released(self, timeout: float | None = None) -> bool:
+        """压制期间阻塞，直到解除压制（或超时），返回是否已解除"""
+        return self._released.wait(timeout)
+
+    def index_writer_args(self, limitmb: int, procs: int) -> dict:
+        """Whoosh 写入器参数：压制期间改为单进程、小内存"""
+        if self.active:
+            return {"limitmb": min(limitmb, THROTTLED_INDEX_LIMIT_MB), "procs": 1}
+        return {"limitmb": limitmb, "procs": procs}
+
+    @contextmanager
+    def background_priority(self):
+        """压制期间以最低优先级运行当前线程中的这段工作"""
+        thread = QThread.currentThread()
+        if not self.active or thread is None:
+            yield
+            return
+        previous = thread.priority()
+        if previous == QThread.Priority.InheritPriority:
+            previous = QThread.Priority.NormalPriority
+        thread.setPriority(QThread.Priority.LowestPriority)
+        try:
+            yield
+        finally:
+            thread.setPriority(previous)
+
+    ### 切换 ###
+    @Slot(bool)
+    def set_playing(self, playing: bool):
+        """播放器状态变化：播放时立即压制，停止 / 暂停后延迟解除"""
+        self._playing = playing
+        if playing:
+            self._release_timer.stop()
+            self._apply(cfg.get(cfg.player_playback_priority))
+        elif self.active:
+            self._release_timer.start()
+
+    def shutdown(self):
+        """程序退出：立即解除压制，让暂停中的后台任务结束"""
+        self._shutdown = True
+        self._release_timer.stop()
+        self._apply(False)
+
+    def _on_enabled_change(self, enabled: bool):
+        self._release_timer.stop()
+        self._apply(enabled and self._playing)
+
+    def _apply(self, active: bool):
+        active = active and not self._shutdown
+        if active == self.active:
+            return
+        if active:
+            self._released.clear()
+            self._switch_interval = sys.getswitchinterval()
+            sys.setswitchinterval(
+                min(self._switch_interval, THROTTLED_SWITCH_INTERVAL)
+            )
+        else:
+            sys.setswitchinterval(self._switch_interval)
+        for entry in list(self._pools):
+            pool_ref, throttled_max, normal_max = entry
+            pool = pool_ref()
+            try:
+                if pool is None:
+                    raise RuntimeError("线程池已释放")
+                if active:
+                    entry[2] = normal_max = pool.maxThreadCount()
+                    pool.setMaxThreadCount(min(throttled_max, normal_max))
+                else:
+                    pool.setMaxThreadCount(normal_max)
+            except RuntimeError:
+                # 池已被回收（Python 对象或底层 Qt 对象），不再管理
+                self._pools.remove(entry)
+        with self._lock:
+            for pid in list(self._processes):
+                _set_process_low_priority(pid, active)
+        if not active:
+            self._released.set()
+            for ref in list(self._release_hooks):
+                hook = ref()
+                if hook is None:
+                    # 所属对象已回收，不再保留
+                    self._release_hooks.remove(ref)
+                    continue
+                try:
+                    hook()
+                except Exception as e:
+                    logger.opt(exception=e).error(f"解除播放优先模式回调失败: {e}")
+        logger.debug(f"播放优先模式: {'开启' if active else '解除'}")
+        self.signal_active_changed.emit(active)
+
+
+governor = ResourceGovernor()
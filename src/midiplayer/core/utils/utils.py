@@ -2,16 +2,22 @@ import json
 import os
 import shlex
 import sys
-import winreg
 from pathlib import Path
 
 import platformdirs
 from loguru import logger
 from pypinyin import Style, pinyin
 from PySide6.QtCore import Qt
+from PySide6.QtGui import QGuiApplication
 from PySide6.QtWidgets import QLabel, QWidget
 from qfluentwidgets import InfoBar, InfoBarPosition
 
+if sys.platform == "win32":
+    import winreg
+else:
+    # 非 Windows（例如 Linux 上无界面运行基准测试）没有注册表
+    winreg = None
+
 
 class Utils:
     # --- 信息栏辅助函数 ---
@@ -125,6 +131,13 @@ class Utils:
             base_path = current_script_path.parent.parent.parent
         return Path.joinpath(base_path, relative_path)
 
+    @staticmethod
+    def frame_interval_ms() -> int:
+        """主屏幕一帧的时长（毫秒），取不到刷新率时按 60Hz"""
+        screen = QGuiApplication.primaryScreen()
+        refresh_rate = screen.refreshRate() if screen else 0
+        return max(1, round(1000 / (refresh_rate if refresh_rate > 0 else 60)))
+
     @staticmethod
     def right_elide_label(label: QLabel) -> None:
         ori_text = label.text()
@@ -291,6 +304,8 @@ class Utils:
 
     @staticmethod
     def get_audiveris_by_file_omr_ext():
+        if winreg is None:
+            return None
         try:
             # 1. 查 .omr 对应什么类型 (ProgID)
             # 路径: HKCR\.omr
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# 源码位于 src/ 下（未安装为包），测试直接从源码导入
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
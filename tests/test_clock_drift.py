@@ -0,0 +1,95 @@
+import threading
+from fractions import Fraction
+
+import pytest
+
+from midiplayer.core.player.clock import SimulatedClock, playback_time_us, real_time_ns
+
+# 播放时钟允许的漂移（微秒）
+DRIFT_BOUND_US = 1.0
+# 调度线程的响应窗口：离下一个步骤更远时先带超时等待，进入窗口后自旋
+SPIN_WINDOW_US = 2000
+# 稀疏步骤的间隔（微秒，播放时间），不整除 1 秒，也不落在整毫秒上
+STEP_US = 487_301
+
+
+class _ExactClock:
+    """以分数精确计算的播放时刻，作为漂移的参照"""
+
+    def __init__(self, now_ns: int, speed: float):
+        self.anchor_ns = now_ns
+        self.anchor_us = Fraction(0)
+        self.speed = Fraction(speed)
+
+    def position_us(self, now_ns: int) -> Fraction:
+        return self.anchor_us + (now_ns - self.anchor_ns) * self.speed / 1000
+
+    def reanchor(self, now_ns: int, speed: float):
+        self.anchor_us = self.position_us(now_ns)
+        self.anchor_ns = now_ns
+        self.speed = Fraction(speed)
+
+
+def _play(hours: float, speeds: list[float]) -> float:
+    """
+    按调度线程的方式在模拟时钟上播放 hours 小时的稀疏步骤：
+    每个步骤先带超时等待到自旋窗口，再自旋到由锚点反算的真实时刻，
+    醒来后用锚点换算播放时刻。播放过程中按 speeds 均分的时段依次变速并重新锚定。
+    返回醒来时的播放时刻与精确参照、以及与步骤乐谱时刻之间的最大偏差（微秒）。
+    """
+    clock = SimulatedClock()
+    event = threading.Event()
+    anchor = (clock.now_ns(), 0.0, speeds[0])
+    exact = _ExactClock(clock.now_ns(), speeds[0])
+    total_us = hours * 3600 * 1_000_000
+    change_every_us = total_us / len(speeds)
+    next_change = 1
+    next_us = STEP_US
+    max_drift_us = 0.0
+    wakeups = 0
+    # 每个步骤一次带超时的等待、一次自旋；远多于此说明调度在原地空转
+    max_wakeups = 8 * total_us // STEP_US
+    while next_us <= total_us and wakeups < max_wakeups:
+        now_ns = clock.now_ns()
+        position_us = playback_time_us(now_ns, *anchor)
+        max_drift_us = max(
+            max_drift_us, abs(float(Fraction(position_us) - exact.position_us(now_ns)))
+        )
+        wakeups += 1
+        if next_change < len(speeds) and position_us >= next_change * change_every_us:
+            # 与 QMidiPlayer.set_speed 相同：以旧速度推进到当前时刻后重新锚定
+            speed = speeds[next_change]
+            anchor = (now_ns, position_us, speed)
+            exact.reanchor(now_ns, speed)
+            next_change += 1
+        if position_us >= next_us:
+            # 醒来的时刻不晚于步骤的乐谱时刻（自旋落在反算的真实时刻上）
+            max_drift_us = max(max_drift_us, position_us - next_us)
+            next_us += STEP_US
+            continue
+        target_ns = real_time_ns(next_us, *anchor)
+        wait_us = (target_ns - now_ns) / 1000
+        if wait_us > SPIN_WINDOW_US:
+            clock.wait(event, (wait_us - SPIN_WINDOW_US) / 1e6)
+        else:
+            clock.spin_until(target_ns)
+    assert next_us > total_us, "调度在同一时刻原地空转"
+    return max_drift_us
+
+
+@pytest.mark.parametrize("speed", [1.0, 0.75, 1.1, 2.0])
+def test_no_drift_over_an_hour(speed):
+    assert _play(1.0, [speed]) <= DRIFT_BOUND_US
+
+
+@pytest.mark.parametrize("speeds", [[1.0, 1.5], [1.3, 0.7, 1.0]])
+def test_no_drift_after_speed_change(speeds):
+    assert _play(1.0, speeds) <= DRIFT_BOUND_US
+
+
+def test_anchor_round_trip_lands_on_step():
+    # 由锚点反算的真实时刻向上取整：换算回的播放时刻已到期，且只晚不到 1 纳秒
+    anchor = (123_456_789, 3_600_000_000.0, 1.1)
+    for playback_us in (3_600_000_001, 3_600_487_301, 7_199_999_999):
+        now_ns = real_time_ns(playback_us, *anchor)
+        assert playback_us <= playback_time_us(now_ns, *anchor) < playback_us + 0.0011
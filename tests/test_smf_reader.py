@@ -0,0 +1,51 @@
+import mido
+import numpy as np
+import pytest
+
+from midiplayer.core.player.compiled_song import compile_song
+from midiplayer.core.player.smf_reader import read_smf
+
+
+def _assert_same_as_mido(path):
+    fast = read_smf(str(path))
+    reference = compile_song(mido.MidiFile(str(path)))
+    for name in ("times", "codes", "notes", "tracks"):
+        assert np.array_equal(
+            getattr(fast.events, name), getattr(reference.events, name)
+        ), name
+    assert fast.track_sizes == reference.track_sizes
+
+
+def _note_track(notes, extra=()):
+    track = mido.MidiTrack()
+    for note in notes:
+        track.append(mido.Message("note_on", note=note, velocity=80, time=10))
+        track.extend(extra)
+        track.append(mido.Message("note_off", note=note, time=10))
+    return track
+
+
+@pytest.mark.parametrize(
+    "message",
+    [
+        mido.Message("songpos", pos=1000, time=5),
+        mido.Message("song_select", song=3, time=5),
+        mido.Message("quarter_frame", frame_type=1, frame_value=2, time=5),
+    ],
+    ids=["songpos", "song_select", "quarter_frame"],
+)
+def test_system_common_message_in_track_matches_mido(tmp_path, message):
+    midi = mido.MidiFile()
+    midi.tracks.append(_note_track([60, 62, 64], extra=[message]))
+    midi.tracks.append(_note_track([48, 50]))
+    path = tmp_path / "system_common.mid"
+    midi.save(path)
+    _assert_same_as_mido(path)
+
+
+def test_plain_file_matches_mido(tmp_path):
+    midi = mido.MidiFile()
+    midi.tracks.append(_note_track(range(60, 72)))
+    path = tmp_path / "plain.mid"
+    midi.save(path)
+    _assert_same_as_mido(path)
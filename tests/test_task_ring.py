@@ -0,0 +1,63 @@
+import time
+
+import pytest
+
+from midiplayer.core.player.clock import SystemClock
+from midiplayer.core.player.task_ring import TaskRing
+
+
+def test_flush_publishes_position_and_epoch_together():
+    ring = TaskRing(8)
+    ring.push("a", 0)
+    ring.push("b", 1)
+    ring.flush()
+    assert ring.flush_state == (2, 1)
+    ring.push("c", 2)
+    # flush 之前写入的槽位属于旧 epoch，之后写入的属于新 epoch
+    assert [ring.epochs[i] for i in range(3)] == [0, 0, 1]
+    assert ring.skip_flushed(ring.flush_state[0]) == 2
+    assert ring.head == 2
+
+
+class _FlushOnceRing(TaskRing):
+    """消费者读取 flush 状态之后、释放按键之前，插入一次生产者的 flush + 恢复按键"""
+
+    def __init__(self, on_skip):
+        super().__init__(8)
+        self.on_skip = on_skip
+
+    def skip_flushed(self, flush_to: int) -> int:
+        on_skip, self.on_skip = self.on_skip, None
+        if on_skip is not None:
+            on_skip()
+        return super().skip_flushed(flush_to)
+
+
+def test_restore_after_flush_runs_after_release():
+    pytest.importorskip("pynput")
+    from midiplayer.core.player.key_output import RecordingOutput
+    from midiplayer.core.player.key_steps import make_key_step
+    from midiplayer.core.player.output_channel import OutputChannel
+
+    clock = SystemClock()
+    output = RecordingOutput(clock)
+    channel = OutputChannel("test", output, clock)
+    press = make_key_step((("a", True),))
+
+    def flush_and_restore():
+        ring.flush()
+        ring.push(press, 0)
+
+    ring = channel.task_ring = _FlushOnceRing(flush_and_restore)
+    channel.pressed_keys.add("a")
+    channel.start()
+    try:
+        while ring.on_skip is not None or ring.head < ring.tail:
+            time.sleep(0.001)
+    finally:
+        channel.stop()
+    # 先释放旧的按键，再重新按下应按住的键
+    assert [(down, key) for _, down, key in output.records][:2] == [
+        (False, "a"),
+        (True, "a"),
+    ]
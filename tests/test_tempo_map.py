@@ -0,0 +1,26 @@
+import mido
+import numpy as np
+
+from midiplayer.core.player.tempo_map import TempoMap
+
+
+def test_round_trip_with_tempo_change():
+    tempo_map = TempoMap(480, np.array([[0, 500000], [960, 250000]]))
+    ticks = np.array([0, 480, 960, 1440])
+    micros = tempo_map.tick_to_us(ticks)
+    assert micros.tolist() == [0, 500000, 1000000, 1250000]
+    assert tempo_map.us_to_tick(micros).tolist() == ticks.tolist()
+
+
+def test_zero_tempo_event_does_not_divide_by_zero():
+    # 损坏文件：tempo=0 之后不再有 tempo 事件，之后的位置都落在这一段内
+    tempo_map = TempoMap(480, np.array([[0, 500000], [480, 0]]))
+    with np.errstate(all="raise"):
+        micros = tempo_map.tick_to_us(np.array([0, 480, 960]))
+        ticks = tempo_map.us_to_tick(np.array([0, 250000, 500000, 500001]))
+    # 与 mido 一致：tempo=0 的一段（几乎）不占时间
+    expected_us = round(mido.tick2second(480, 480, 500000) * 1e6)
+    assert micros[:2].tolist() == [0, expected_us]
+    assert micros[2] - expected_us <= 1
+    assert ticks[:3].tolist() == [0, 240, 480]
+    assert ticks[3] > 480